@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stage_key(stage, params, input_hashes=()):
+    """
+    Cache key for one stage run: the stage name, its parameters and the
+    content hashes of its inputs.
+    """
+    payload = json.dumps({'stage': stage, 'params': params, 'inputs': list(input_hashes)},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ArtifactCache:
+    """
+    Local content-addressed cache of stage outputs with size-bounded LRU eviction.
+
+    Each entry is a directory named by its key. A small JSON index keeps the
+    entry sizes and last access times.
+    """
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(cache_dir, 'index.json')
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_file):
+            return {}
+        try:
+            with open(self.index_file, 'r') as f:
+                index = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            print(f"Warning: Cache index at {self.index_file} is unreadable, starting empty")
+            return {}
+        # Drop entries whose directory disappeared
+        return {key: entry for key, entry in index.items() if os.path.isdir(self._entry_dir(key))}
+
+    def _save_index(self):
+        tmp_file = self.index_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(self._index, f, indent=2)
+        os.replace(tmp_file, self.index_file)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key):
+        """Returns {name: path} of a cached entry (and marks it used), or None."""
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+        entry['last_access'] = time.time()
+        self._save_index()
+        return {name: os.path.join(self._entry_dir(key), name) for name in entry['files']}
+
+    def put(self, key, produce, meta=None):
+        """
+        Runs produce(output_dir), which must write the stage outputs into
+        output_dir, and stores them under key. Returns {name: path}.
+        """
+        staging = tempfile.mkdtemp(prefix='stage_', dir=self.cache_dir)
+        try:
+            produce(staging)
+            files = sorted(os.listdir(staging))
+            if not files:
+                raise ValueError(f"Stage produced no outputs for key {key}")
+            size = sum(os.path.getsize(os.path.join(staging, name)) for name in files)
+
+            target = self._entry_dir(key)
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            os.replace(staging, target)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        self._index[key] = {'files': files, 'size': size, 'last_access': time.time(), 'meta': meta or {}}
+        self._evict(keep=key)
+        self._save_index()
+        return {name: os.path.join(target, name) for name in files}
+
+    def get_or_create(self, key, produce, meta=None):
+        """Returns (paths, hit)."""
+        paths = self.get(key)
+        if paths is not None:
+            return paths, True
+        return self.put(key, produce, meta), False
+
+    def total_bytes(self):
+        return sum(entry['size'] for entry in self._index.values())
+
+    def _evict(self, keep=None):
+        """Removes least recently used entries until the cache fits in max_bytes."""
+        total = self.total_bytes()
+        for key in sorted(self._index, key=lambda k: self._index[k]['last_access']):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self._index[key]['size']
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            del self._index[key]
@@ -0,0 +1,319 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Batched versions of the `ta` indicators used by the processed price CSVs.
+# Every function takes 2-D (time, symbol) float arrays and works on all symbols
+# in one pass. Results match `ta` with fillna=True, which is how
+# preprocess_price_data.py calls ta.add_all_ta_features.
+
+
+def _as_2d(x):
+    x = np.asarray(x, dtype=np.float64)
+    return x[:, None] if x.ndim == 1 else x
+
+
+def _ffill(x, value):
+    """
+    Replaces inf with NaN, forward-fills NaN along time and fills what is left
+    with value (ta's _check_fillna).
+    """
+    x = np.where(np.isfinite(x), x, np.nan)
+    valid = ~np.isnan(x)
+    if valid.all():
+        return x
+    idx = np.where(valid, np.arange(len(x))[:, None], 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    filled = np.take_along_axis(x, idx, axis=0)
+    filled[np.isnan(filled)] = value
+    return filled
+
+
+def _shift(x, periods=1, fill_value=np.nan):
+    out = np.empty_like(x)
+    out[:periods] = fill_value
+    out[periods:] = x[:-periods]
+    return out
+
+
+def _rolling_sum(x, window):
+    """Rolling sum with an expanding start (min_periods=0)."""
+    csum = np.cumsum(x, axis=0)
+    out = csum.copy()
+    out[window:] -= csum[:-window]
+    return out
+
+
+def _rolling_extreme(x, window, func):
+    """Rolling max/min with an expanding start; the edge is padded with the first row."""
+    padded = np.concatenate([np.repeat(x[:1], window - 1, axis=0), x], axis=0)
+    return func(sliding_window_view(padded, window, axis=0), axis=-1)
+
+
+def _ewm(x, alpha):
+    """pandas ewm(alpha, adjust=False).mean() along time."""
+    out = np.empty_like(x)
+    out[0] = x[0]
+    for t in range(1, len(x)):
+        out[t] = out[t - 1] + alpha * (x[t] - out[t - 1])
+    return out
+
+
+def _wilder(x, window, start):
+    """
+    Wilder smoothing used by ta's ATR: seeded with the mean of the first
+    `window` values at row start, zeros before it.
+    """
+    out = np.zeros_like(x)
+    if len(x) <= start:
+        return out
+    out[start] = x[start - window + 1:start + 1].mean(axis=0)
+    for t in range(start + 1, len(x)):
+        out[t] = (out[t - 1] * (window - 1) + x[t]) / window
+    return out
+
+
+# --- Trend --- #
+
+def sma(close, window):
+    close = _as_2d(close)
+    counts = np.minimum(np.arange(1, len(close) + 1), window)[:, None]
+    return _rolling_sum(close, window) / counts
+
+
+def ema(close, window):
+    return _ewm(_as_2d(close), 2.0 / (window + 1))
+
+
+def macd(close, window_slow=26, window_fast=12, window_sign=9):
+    """Returns (macd, signal, diff)."""
+    close = _as_2d(close)
+    line = ema(close, window_fast) - ema(close, window_slow)
+    signal = ema(line, window_sign)
+    return line, signal, line - signal
+
+
+def adx(high, low, close, window=14):
+    """
+    Returns (adx, adx_pos, adx_neg), reproducing ta's ADXIndicator including
+    its offsets (the last smoothed value is left at zero).
+    """
+    high, low, close = _as_2d(high), _as_2d(low), _as_2d(close)
+    n = len(close)
+    if n <= window + 1:
+        zeros = np.zeros_like(close)
+        return zeros, zeros.copy(), zeros.copy()
+
+    close_shift = _shift(close)
+    true_move = np.fmax(high, close_shift) - np.fmin(low, close_shift)
+    true_move[0] = np.nan
+
+    diff_up = high - _shift(high)
+    diff_down = _shift(low) - low
+    pos = np.where((diff_up > diff_down) & (diff_up > 0), diff_up, 0.0)
+    neg = np.where((diff_down > diff_up) & (diff_down > 0), diff_down, 0.0)
+
+    length = n - (window - 1)
+    smoothed = []
+    for series in (true_move, pos, neg):
+        s = np.zeros((length, close.shape[1]))
+        s[0] = series[1:window + 1].sum(axis=0)
+        for i in range(1, length - 1):
+            s[i] = s[i - 1] - s[i - 1] / window + series[window + i]
+        smoothed.append(s)
+    trs, dip, din = smoothed
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        di_pos = np.where(trs != 0, 100 * dip / trs, 0.0)
+        di_neg = np.where(trs != 0, 100 * din / trs, 0.0)
+        di_sum = di_pos + di_neg
+        dx = np.where(di_sum != 0, 100 * np.abs((di_pos - di_neg) / di_sum), 0.0)
+
+    adx_values = np.zeros((length, close.shape[1]))
+    if length > window:
+        adx_values[window] = dx[:window].mean(axis=0)
+        for i in range(window + 1, length):
+            adx_values[i] = (adx_values[i - 1] * (window - 1) + dx[i - 1]) / window
+    adx_values = np.concatenate([np.zeros((window - 1, close.shape[1])), adx_values], axis=0)
+
+    adx_pos = np.zeros_like(close)
+    adx_neg = np.zeros_like(close)
+    adx_pos[window + 1:window + length - 1] = di_pos[1:length - 1]
+    adx_neg[window + 1:window + length - 1] = di_neg[1:length - 1]
+    return adx_values, adx_pos, adx_neg
+
+
+def ichimoku(high, low, window1=9, window2=26, window3=52, visual=False):
+    """Returns (conversion, base, span_a, span_b)."""
+    high, low = _as_2d(high), _as_2d(low)
+    conv = 0.5 * (_rolling_extreme(high, window1, np.max) + _rolling_extreme(low, window1, np.min))
+    base = 0.5 * (_rolling_extreme(high, window2, np.max) + _rolling_extreme(low, window2, np.min))
+    span_a = 0.5 * (conv + base)
+    span_b = 0.5 * (_rolling_extreme(high, window3, np.max) + _rolling_extreme(low, window3, np.min))
+    if visual:
+        # ta shifts the spans forward and fills the gap with their mean
+        span_a = _shift(span_a, window2, span_a.mean(axis=0))
+        span_b = _shift(span_b, window2, span_b.mean(axis=0))
+    return conv, base, span_a, span_b
+
+
+# --- Momentum --- #
+
+def rsi(close, window=14):
+    close = _as_2d(close)
+    diff = np.diff(close, axis=0, prepend=close[:1])
+    ema_up = _ewm(np.maximum(diff, 0.0), 1.0 / window)
+    ema_down = _ewm(np.maximum(-diff, 0.0), 1.0 / window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = np.where(ema_down == 0, 100.0, 100.0 - 100.0 / (1.0 + ema_up / ema_down))
+    return _ffill(values, 50)
+
+
+def stochastic(high, low, close, window=14, smooth_window=3):
+    """Returns (stoch_k, stoch_signal)."""
+    high, low, close = _as_2d(high), _as_2d(low), _as_2d(close)
+    lowest = _rolling_extreme(low, window, np.min)
+    highest = _rolling_extreme(high, window, np.max)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k = 100 * (close - lowest) / (highest - lowest)
+
+    # Rolling mean of k that ignores NaN, like pandas with min_periods=0
+    valid = np.isfinite(k)
+    k_sum = _rolling_sum(np.where(valid, k, 0.0), smooth_window)
+    k_count = _rolling_sum(valid.astype(np.float64), smooth_window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        signal = k_sum / k_count
+    return _ffill(k, 50), _ffill(signal, 50)
+
+
+# --- Volatility --- #
+
+def bollinger(close, window=20, window_dev=2):
+    """Returns (mavg, hband, lband, wband, pband)."""
+    close = _as_2d(close)
+    mavg = sma(close, window)
+
+    mstd = np.empty_like(close)
+    head = min(window - 1, len(close))
+    for t in range(head):
+        mstd[t] = close[:t + 1].std(axis=0)
+    if len(close) >= window:
+        windows = sliding_window_view(close, window, axis=0)
+        mstd[window - 1:] = np.sqrt(((windows - mavg[window - 1:, :, None]) ** 2).mean(axis=-1))
+
+    hband = mavg + window_dev * mstd
+    lband = mavg - window_dev * mstd
+    with np.errstate(divide='ignore', invalid='ignore'):
+        wband = (hband - lband) / mavg * 100
+        pband = (close - lband) / np.where(hband != lband, hband - lband, np.nan)
+    return mavg, hband, lband, _ffill(wband, 0), _ffill(pband, 0)
+
+
+def atr(high, low, close, window=14):
+    high, low, close = _as_2d(high), _as_2d(low), _as_2d(close)
+    prev_close = _shift(close)
+    true_range = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+    return _wilder(true_range, window, window - 1)
+
+
+# --- Volume --- #
+
+def obv(close, volume):
+    close, volume = _as_2d(close), _as_2d(volume)
+    signed = np.where(close < _shift(close), -volume, volume)
+    return np.cumsum(signed, axis=0)
+
+
+def cmf(high, low, close, volume, window=20):
+    high, low, close, volume = _as_2d(high), _as_2d(low), _as_2d(close), _as_2d(volume)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mfv = ((close - low) - (high - close)) / (high - low)
+        mfv = np.where(np.isnan(mfv), 0.0, mfv) * volume
+        values = _rolling_sum(mfv, window) / _rolling_sum(volume, window)
+    return _ffill(values, 0)
+
+
+# --- All indicators at once --- #
+
+INDICATOR_COLUMNS = [
+    'volume_obv', 'volume_cmf',
+    'volatility_bbm', 'volatility_bbh', 'volatility_bbl', 'volatility_bbw', 'volatility_bbp',
+    'volatility_atr',
+    'trend_macd', 'trend_macd_signal', 'trend_macd_diff',
+    'trend_sma_fast', 'trend_sma_slow', 'trend_ema_fast', 'trend_ema_slow',
+    'trend_ichimoku_conv', 'trend_ichimoku_base', 'trend_ichimoku_a', 'trend_ichimoku_b',
+    'trend_adx', 'trend_adx_pos', 'trend_adx_neg',
+    'momentum_rsi', 'momentum_stoch', 'momentum_stoch_signal'
+]
+
+
+def compute_indicators(high, low, close, volume):
+    """
+    Computes every indicator in INDICATOR_COLUMNS for a (time, symbol) universe.
+    Parameters are the ones ta.add_all_ta_features uses, and the returned dict
+    is keyed by the same column names.
+    """
+    high, low, close, volume = _as_2d(high), _as_2d(low), _as_2d(close), _as_2d(volume)
+
+    out = {}
+    out['volume_obv'] = obv(close, volume)
+    out['volume_cmf'] = cmf(high, low, close, volume, window=20)
+
+    (out['volatility_bbm'], out['volatility_bbh'], out['volatility_bbl'],
+     out['volatility_bbw'], out['volatility_bbp']) = bollinger(close, window=20, window_dev=2)
+    out['volatility_atr'] = atr(high, low, close, window=10)
+
+    out['trend_macd'], out['trend_macd_signal'], out['trend_macd_diff'] = macd(close, 26, 12, 9)
+    out['trend_sma_fast'] = sma(close, 12)
+    out['trend_sma_slow'] = sma(close, 26)
+    out['trend_ema_fast'] = ema(close, 12)
+    out['trend_ema_slow'] = ema(close, 26)
+    (out['trend_ichimoku_conv'], out['trend_ichimoku_base'],
+     out['trend_ichimoku_a'], out['trend_ichimoku_b']) = ichimoku(high, low, 9, 26, 52)
+    out['trend_adx'], out['trend_adx_pos'], out['trend_adx_neg'] = adx(high, low, close, window=14)
+
+    out['momentum_rsi'] = rsi(close, window=14)
+    out['momentum_stoch'], out['momentum_stoch_signal'] = stochastic(high, low, close, 14, 3)
+    return out
+
+
+def stack_frames(frames, columns=('open', 'high', 'low', 'close', 'volume')):
+    """
+    Stacks equally long per-symbol DataFrames into {column: (time, symbol) array}.
+    """
+    return {col: np.column_stack([frame[col].to_numpy(dtype=np.float64) for frame in frames])
+            for col in columns}
+
+
+# --- Main Execution --- #
+if __name__ == '__main__':
+    import time
+    import pandas as pd
+    import ta
+
+    n_bars, n_symbols, n_reference = 1258, 2000, 20
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (n_bars, n_symbols)), axis=0))
+    open_ = close * np.exp(rng.normal(0, 0.005, close.shape))
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, 0.01, close.shape)))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, 0.01, close.shape)))
+    volume = np.round(np.exp(rng.normal(15, 0.5, close.shape)))
+
+    start = time.perf_counter()
+    batch = compute_indicators(high, low, close, volume)
+    batch_time = time.perf_counter() - start
+    print(f"Batch: {n_symbols} symbols in {batch_time:.2f}s")
+
+    start = time.perf_counter()
+    max_error = 0.0
+    for s in range(n_reference):
+        df = pd.DataFrame({'open': open_[:, s], 'high': high[:, s], 'low': low[:, s],
+                           'close': close[:, s], 'volume': volume[:, s]})
+        df = ta.add_all_ta_features(df, open='open', high='high', low='low', close='close',
+                                    volume='volume', fillna=True)
+        for col in INDICATOR_COLUMNS:
+            reference = df[col].to_numpy()
+            scale = max(1.0, np.abs(reference).max())
+            max_error = max(max_error, np.abs(batch[col][:, s] - reference).max() / scale)
+    loop_time = (time.perf_counter() - start) / n_reference * n_symbols
+    print(f"Per-symbol ta loop (extrapolated from {n_reference}): {loop_time:.2f}s")
+    print(f"Speedup: {loop_time / batch_time:.1f}x, max relative error vs ta: {max_error:.2e}")
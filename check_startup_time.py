@@ -0,0 +1,65 @@
+import os
+import subprocess
+import sys
+
+# בדיקת זמן עלייה קר של מודולי הסביבה והסוכן
+# התקציב נמדד ביחס לייבוא הבסיסי (NumPy + Gymnasium) כדי שלא יהיה תלוי במהירות המכונה
+
+CORE_MODULES = ['trading_env', 'rl_agent']
+BASELINE_MODULES = ['numpy', 'gymnasium']
+
+# מודולים כבדים שאסור שייטענו בעת ייבוא הקוד המרכזי
+FORBIDDEN_MODULES = ['pandas', 'matplotlib', 'seaborn', 'ta', 'pandas_ta']
+
+BUDGET_MS = 50.0
+REPEATS = 5
+
+
+def measure_import(modules):
+    """
+    מודד זמן ייבוא (במילישניות) בתהליך פייתון חדש ומחזיר גם את רשימת המודולים שנטענו
+    """
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        f"for name in {modules!r}: __import__(name)\n"
+        "elapsed = (time.perf_counter() - start) * 1000\n"
+        "print(elapsed)\n"
+        "print(','.join(sorted(sys.modules)))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code], capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    elapsed, loaded = result.stdout.strip().split('\n')
+    return float(elapsed), set(loaded.split(','))
+
+
+def check_startup(budget_ms=BUDGET_MS, repeats=REPEATS):
+    """
+    מחזיר True אם הקוד המרכזי עומד בתקציב ואינו טוען מודולים כבדים
+    """
+    baseline = min(measure_import(BASELINE_MODULES)[0] for _ in range(repeats))
+    runs = [measure_import(CORE_MODULES) for _ in range(repeats)]
+    core = min(elapsed for elapsed, _ in runs)
+    loaded = runs[0][1]
+
+    overhead = core - baseline
+    heavy = [name for name in FORBIDDEN_MODULES if name in loaded]
+
+    print(f"Baseline import (numpy + gymnasium): {baseline:.1f} ms")
+    print(f"Core import ({', '.join(CORE_MODULES)}): {core:.1f} ms")
+    print(f"Overhead: {overhead:.1f} ms (budget {budget_ms:.1f} ms)")
+
+    ok = True
+    if heavy:
+        print(f"Error: heavy modules loaded at import time: {heavy}")
+        ok = False
+    if overhead > budget_ms:
+        print("Error: cold-start budget exceeded")
+        ok = False
+    return ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if check_startup() else 1)
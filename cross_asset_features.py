@@ -0,0 +1,268 @@
+import numpy as np
+
+# Per-symbol features against each benchmark; columns are named cross_{feature}_{benchmark}
+CROSS_FEATURES = ('beta', 'corr', 'rel_strength', 'residual')
+# 'mkt' is the index (^GSPC), 'univ' the equal-weight return of the rest of the universe
+BENCHMARKS = ('mkt', 'univ')
+CROSS_COLUMNS = [f'cross_{feature}_{benchmark}' for benchmark in BENCHMARKS for feature in CROSS_FEATURES]
+
+# Rolling sums kept per (symbol, benchmark): pair count, Σx, Σy, Σx², Σy², Σxy
+N_SUMS = 6
+
+
+class RollingCrossAsset:
+    """
+    Rolling beta, correlation, relative strength and residual return of every
+    symbol against the market index and against the rest of the universe.
+
+    State is the window's running sums plus a ring of the last `window` return
+    rows, so each new row costs O(n_symbols) whatever the history length.
+    Rows are (time, symbol) log returns with NaN where a symbol has no bar;
+    a (symbol, benchmark) pair only enters the sums when both returns exist.
+    """
+
+    def __init__(self, n_symbols, market_index, window=60, min_periods=20, chunk_size=256):
+        self.n_symbols = n_symbols
+        self.market_index = market_index
+        self.window = window
+        self.min_periods = max(min_periods, 2)
+        self.chunk_size = chunk_size
+        # The index is not part of the universe benchmark
+        self._in_universe = np.ones(n_symbols, dtype=bool)
+        self._in_universe[market_index] = False
+        self.reset()
+
+    def reset(self):
+        self._history = np.full((self.window, self.n_symbols), np.nan)
+        self._sums = np.zeros((N_SUMS, self.n_symbols, len(BENCHMARKS)))
+        self._since_refresh = 0
+        self.n_rows = 0
+
+    def _pairs(self, returns):
+        """(rows, symbol, benchmark) symbol and benchmark returns; NaN where the pair is incomplete."""
+        market = returns[:, self.market_index][:, None]
+        members = np.where(self._in_universe, returns, np.nan)
+        valid = np.isfinite(members)
+        total = np.where(valid, members, 0.0).sum(axis=1, keepdims=True)
+        count = valid.sum(axis=1, keepdims=True)
+        # Leave-one-out mean: a member's own return is taken out of its benchmark
+        own = valid.astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            universe = (total - np.where(valid, members, 0.0)) / (count - own)
+        universe[~np.isfinite(universe)] = np.nan
+
+        x = np.repeat(returns[:, :, None], len(BENCHMARKS), axis=2)
+        y = np.stack([np.broadcast_to(market, returns.shape), universe], axis=2)
+        incomplete = ~(np.isfinite(x) & np.isfinite(y))
+        x[incomplete] = np.nan
+        y[incomplete] = np.nan
+        return x, y
+
+    @staticmethod
+    def _contributions(x, y):
+        """What each row adds to the rolling sums, shape (rows, N_SUMS, symbol, benchmark)."""
+        valid = np.isfinite(x)
+        x = np.where(valid, x, 0.0)
+        y = np.where(valid, y, 0.0)
+        return np.stack([valid.astype(np.float64), x, y, x * x, y * y, x * y], axis=1)
+
+    def _features(self, sums, x, y):
+        """Features from the window sums and the current row's returns."""
+        count, sx, sy, sxx, syy, sxy = (sums[:, i] for i in range(N_SUMS))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_x, mean_y = sx / count, sy / count
+            cxx = np.maximum(sxx - sx * mean_x, 0.0)
+            cyy = np.maximum(syy - sy * mean_y, 0.0)
+            cxy = sxy - sx * mean_y
+            beta = cxy / cyy
+            corr = np.clip(cxy / np.sqrt(cxx * cyy), -1.0, 1.0)
+            # Window log return of the symbol minus the benchmark's over the same bars
+            rel_strength = sx - sy
+            residual = (x - mean_x) - beta * (y - mean_y)
+
+        enough = (count >= self.min_periods) & (cyy > 1e-18)
+        out = {}
+        for b, benchmark in enumerate(BENCHMARKS):
+            for feature, values in zip(CROSS_FEATURES, (beta, corr, rel_strength, residual)):
+                out[f'cross_{feature}_{benchmark}'] = np.where(enough[..., b], values[..., b], np.nan)
+        return out
+
+    def _refresh(self):
+        """Recomputes the sums from the ring buffer, so rounding error never accumulates."""
+        x, y = self._pairs(self._history)
+        self._sums = self._contributions(x, y).sum(axis=0)
+        self._since_refresh = 0
+
+    def extend(self, returns):
+        """
+        Appends (rows, n_symbols) log returns and returns {column: (rows, n_symbols)}
+        features, each row computed from the `window` rows ending at it.
+        """
+        returns = np.atleast_2d(np.asarray(returns, dtype=np.float64))
+        if returns.shape[1] != self.n_symbols:
+            raise ValueError(f"Expected {self.n_symbols} symbols per row, got {returns.shape[1]}")
+        parts = []
+        for start in range(0, len(returns), self.chunk_size):
+            parts.append(self._extend_chunk(returns[start:start + self.chunk_size]))
+        if not parts:
+            return {col: np.zeros((0, self.n_symbols)) for col in CROSS_COLUMNS}
+        return {col: np.concatenate([part[col] for part in parts]) for col in CROSS_COLUMNS}
+
+    def update(self, returns):
+        """Appends one row of returns; returns {column: (n_symbols,)} features."""
+        return {col: values[0] for col, values in self.extend(np.asarray(returns)[None]).items()}
+
+    def _extend_chunk(self, returns):
+        k = len(returns)
+        # Row j enters the window as combined[window + j] and pushes out combined[j]
+        combined = np.concatenate([self._history, returns])
+        x, y = self._pairs(combined)
+        contributions = self._contributions(x, y)
+        delta = contributions[self.window:] - contributions[:k]
+        sums = self._sums + np.cumsum(delta, axis=0)
+
+        self._history = combined[-self.window:]
+        self._sums = sums[-1]
+        self.n_rows += k
+        self._since_refresh += k
+        if self._since_refresh >= self.window:
+            self._refresh()
+        return self._features(sums, x[self.window:], y[self.window:])
+
+
+def return_matrix(frames, price_column='adj_close'):
+    """
+    Aligns {symbol: DataFrame with a datetime index} on the union of their
+    timestamps. Returns (timestamps, symbols, (time, symbol) log returns) with
+    NaN where a symbol has no bar; a return spans back to the symbol's previous bar.
+    """
+    symbols = list(frames)
+    timestamps = np.unique(np.concatenate([df.index.values.astype('datetime64[ns]') for df in frames.values()]))
+    returns = np.full((len(timestamps), len(symbols)), np.nan)
+    for j, df in enumerate(frames.values()):
+        prices = df[price_column].to_numpy(dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_prices = np.log(np.where(prices > 0, prices, np.nan))
+        rows = np.searchsorted(timestamps, df.index.values.astype('datetime64[ns]'))
+        returns[rows[1:], j] = np.diff(log_prices)
+    return timestamps, symbols, returns
+
+
+def add_cross_asset_features(frames, benchmark='^GSPC', window=60, min_periods=20, price_column='adj_close'):
+    """
+    Adds the CROSS_COLUMNS to every frame of {symbol: DataFrame}; the benchmark
+    symbol must be one of the frames. Rows without enough history get 0, like
+    the indicators computed with fillna=True. Returns a new dict of frames.
+    """
+    if benchmark not in frames:
+        raise ValueError(f"Benchmark {benchmark} is not among the symbols {list(frames)}")
+    timestamps, symbols, returns = return_matrix(frames, price_column)
+    features = RollingCrossAsset(len(symbols), symbols.index(benchmark), window, min_periods).extend(returns)
+
+    out = {}
+    for j, (symbol, df) in enumerate(frames.items()):
+        rows = np.searchsorted(timestamps, df.index.values.astype('datetime64[ns]'))
+        df = df.copy()
+        for col in CROSS_COLUMNS:
+            df[col] = np.nan_to_num(features[col][rows, j], nan=0.0, posinf=0.0, neginf=0.0).astype(np.float32)
+        out[symbol] = df
+    return out
+
+
+class CrossAssetStream:
+    """
+    Keeps a universe's RollingCrossAsset state between updates, so newly arrived
+    bars get their cross-asset features from one O(n_symbols) step instead of a
+    recomputation over the whole history. Matches add_cross_asset_features on
+    the same bars.
+    """
+
+    def __init__(self, frames, benchmark='^GSPC', window=60, min_periods=20, price_column='adj_close'):
+        if benchmark not in frames:
+            raise ValueError(f"Benchmark {benchmark} is not among the symbols {list(frames)}")
+        timestamps, self.symbols, returns = return_matrix(frames, price_column)
+        self.price_column = price_column
+        self.tracker = RollingCrossAsset(len(self.symbols), self.symbols.index(benchmark), window, min_periods)
+        self.tracker.extend(returns)
+        self.last_timestamp = timestamps[-1]
+        # Each symbol's last log price; a return spans back to the symbol's previous bar
+        self._log_prices = np.full(len(self.symbols), np.nan)
+        for j, df in enumerate(frames.values()):
+            if len(df):
+                self._log_prices[j] = self._log(df[price_column].to_numpy(dtype=np.float64)[-1])
+        self._latest = None
+
+    @staticmethod
+    def _log(prices):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.log(np.where(prices > 0, prices, np.nan))
+
+    def update(self, timestamp, prices):
+        """
+        Advances the universe to timestamp with {symbol: price}; symbols without
+        a bar are left out. Returns {symbol: {column: value}}, 0 where there is not
+        enough history. Repeating the latest timestamp returns the same features,
+        so the learners of several symbols can share one stream.
+        """
+        timestamp = np.datetime64(timestamp, 'ns')
+        if self._latest is not None and timestamp == self._latest[0]:
+            return self._latest[1]
+        if timestamp <= self.last_timestamp:
+            raise ValueError(f"Timestamp {timestamp} is not after the last one in the stream ({self.last_timestamp})")
+
+        unknown = [symbol for symbol in prices if symbol not in self.symbols]
+        if unknown:
+            raise ValueError(f"Symbols not in the stream's universe: {unknown}")
+        present = np.array([symbol in prices for symbol in self.symbols])
+        log_prices = self._log(np.array([float(prices.get(symbol, np.nan)) for symbol in self.symbols]))
+        row = np.where(present, log_prices - self._log_prices, np.nan)
+        self._log_prices = np.where(present, log_prices, self._log_prices)
+
+        features = self.tracker.update(row)
+        out = {symbol: {col: float(np.nan_to_num(features[col][j], nan=0.0, posinf=0.0, neginf=0.0))
+                        for col in CROSS_COLUMNS}
+               for j, symbol in enumerate(self.symbols)}
+        self.last_timestamp = timestamp
+        self._latest = (timestamp, out)
+        return out
+
+
+# --- Main Execution --- #
+if __name__ == '__main__':
+    import os
+    import time
+    import pandas as pd
+    from market_data import load_processed_frame
+
+    window = 60
+    data_dir = os.path.join('rl_trading_system', 'data', 'processed')
+    frames = {symbol: load_processed_frame(os.path.join(data_dir, f'{symbol}_processed_prices.csv'))
+              for symbol in ['AAPL', 'GOOG', 'NVDA', '^GSPC']}
+
+    # Batch vs one row at a time vs pandas rolling statistics on the real universe
+    timestamps, symbols, returns = return_matrix(frames)
+    batch = RollingCrossAsset(len(symbols), symbols.index('^GSPC'), window).extend(returns)
+    stepper = RollingCrossAsset(len(symbols), symbols.index('^GSPC'), window)
+    steps = [stepper.update(row) for row in returns]
+    step_error = max(np.nanmax(np.abs(np.array([s[col] for s in steps]) - batch[col])) for col in CROSS_COLUMNS)
+
+    market = pd.Series(returns[:, symbols.index('^GSPC')])
+    reference_error = 0.0
+    for j, symbol in enumerate(symbols):
+        series = pd.Series(returns[:, j])
+        beta = series.rolling(window, min_periods=20).cov(market) / market.rolling(window, min_periods=20).var()
+        corr = series.rolling(window, min_periods=20).corr(market)
+        for ours, reference in ((batch['cross_beta_mkt'][:, j], beta), (batch['cross_corr_mkt'][:, j], corr)):
+            both = np.isfinite(ours) & np.isfinite(reference.to_numpy())
+            reference_error = max(reference_error, np.abs(ours[both] - reference.to_numpy()[both]).max())
+    print(f"Incremental vs batch max error: {step_error:.2e}, vs pandas rolling: {reference_error:.2e}")
+    print(pd.DataFrame({col: batch[col][-1] for col in CROSS_COLUMNS}, index=symbols).round(3).to_string())
+
+    # Throughput on a synthetic universe
+    n_bars, n_symbols = 1258, 2000
+    rng = np.random.default_rng(0)
+    market_returns = rng.normal(0, 0.01, (n_bars, 1))
+    synthetic = rng.uniform(0.5, 1.5, n_symbols) * market_returns + rng.normal(0, 0.015, (n_bars, n_symbols))
+    start = time.perf_counter()
+    RollingCrossAsset(n_symbols, 0, window).extend(synthetic)
+    print(f"\n{n_symbols} symbols x {n_bars} bars in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,252 @@
+import numpy as np
+
+# Row-level checks; rows failing any of them are quarantined
+ROW_CHECKS = (
+    'missing_values',       # NaN/inf in any OHLCV column
+    'non_positive_price',   # open/high/low/close <= 0
+    'inconsistent_range',   # high < max(open, close), low > min(open, close) or high < low
+    'negative_volume',
+    'duplicate_timestamp',  # same timestamp as an earlier row (the first one is kept)
+    'out_of_order',         # timestamp earlier than a previous row
+    'return_spike',         # outlier return that reverts on the next bar (a bad tick)
+)
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+# Relative tolerance for the high/low consistency checks (float32 rounding)
+RANGE_TOLERANCE = 1e-6
+
+
+def _sorted_unique(values):
+    """np.unique through one sort (faster than the hash path for large integer/date arrays)."""
+    values = np.sort(values)
+    return values[np.r_[True, values[1:] != values[:-1]]] if len(values) else values
+
+
+def _group_median(values, groups, n_groups):
+    """
+    Median of values per group id (NaN values ignored; NaN for empty groups).
+    Groups are scattered into a NaN-padded (n_groups, longest) matrix and sorted row-wise.
+    """
+    valid = np.isfinite(values)
+    values, groups = values[valid], groups[valid]
+    counts = np.bincount(groups, minlength=n_groups)
+    medians = np.full(n_groups, np.nan)
+    if len(values) == 0:
+        return medians
+    order = np.argsort(groups, kind='stable')
+    starts = np.r_[0, np.cumsum(counts)[:-1]]
+    padded = np.full((n_groups, counts.max()), np.nan)
+    padded[groups[order], np.arange(len(order)) - starts[groups[order]]] = values[order]
+    padded.sort(axis=1)
+    has = np.flatnonzero(counts > 0)
+    lo = (counts[has] - 1) // 2
+    hi = counts[has] // 2
+    medians[has] = (padded[has, lo] + padded[has, hi]) / 2
+    return medians
+
+
+def check_bars(timestamps, open_, high, low, close, volume, symbol_ids, n_symbols,
+               spike_threshold=10.0, min_spike=0.1):
+    """
+    Runs every row-level check over concatenated bar arrays of many symbols
+    (rows of one symbol contiguous, in file order). Returns {check: bool array}
+    plus 'return_jump' (non-reverting outlier returns, reported but kept).
+    """
+    n = len(timestamps)
+    first = np.r_[True, symbol_ids[1:] != symbol_ids[:-1]] if n else np.zeros(0, dtype=bool)
+    flags = {}
+
+    prices = np.stack([open_, high, low, close])
+    flags['missing_values'] = ~np.isfinite(prices).all(axis=0) | ~np.isfinite(volume)
+    with np.errstate(invalid='ignore'):
+        flags['non_positive_price'] = (prices <= 0).any(axis=0)
+        upper = np.maximum(open_, close) * (1 - RANGE_TOLERANCE)
+        lower = np.minimum(open_, close) * (1 + RANGE_TOLERANCE)
+        flags['inconsistent_range'] = (high < upper) | (low > lower) | (high < low)
+        flags['negative_volume'] = volume < 0
+
+    # Timestamps as dense ranks offset by symbol, so one running maximum covers all symbols
+    _, rank = np.unique(timestamps, return_inverse=True)
+    key = symbol_ids.astype(np.int64) * (n + 1) + rank.reshape(-1)
+    running_max = np.maximum.accumulate(key) if n else key
+    previous_max = np.r_[-1, running_max[:-1]] if n else key
+    flags['duplicate_timestamp'] = ~first & (key == previous_max)
+    flags['out_of_order'] = ~first & (key < previous_max)
+
+    # Log returns between consecutive rows of a symbol, only where both rows are otherwise sound
+    sound = ~(flags['missing_values'] | flags['non_positive_price'] | flags['duplicate_timestamp']
+              | flags['out_of_order'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_close = np.log(np.where(sound, close, np.nan))
+    returns = np.full(n, np.nan)
+    if n:
+        returns[1:] = log_close[1:] - log_close[:-1]
+        returns[first] = np.nan
+
+    # Robust per-symbol scale: median absolute deviation of the returns
+    median = _group_median(returns, symbol_ids, n_symbols)[symbol_ids]
+    deviation = np.abs(returns - median)
+    scale = 1.4826 * _group_median(deviation, symbol_ids, n_symbols)[symbol_ids]
+    with np.errstate(invalid='ignore'):
+        outlier = (deviation > spike_threshold * scale) & (np.abs(returns) > min_spike)
+        next_returns = np.r_[returns[1:], np.nan]
+        next_outlier = np.r_[outlier[1:], False] & ~np.r_[first[1:], True]
+        reverts = next_outlier & (np.sign(next_returns) == -np.sign(returns))
+    flags['return_spike'] = outlier & reverts
+    flags['return_jump'] = outlier & ~reverts & ~np.r_[False, flags['return_spike'][:-1]]
+    return flags
+
+
+def missing_sessions(timestamps, symbol_ids, n_symbols, calendar=None, max_listed=5):
+    """
+    Trading days missing per symbol between its first and last bar.
+    calendar: array of session dates; by default the union of all symbols' dates
+    (a universe that includes the index then acts as the exchange calendar).
+    Returns (counts, list with up to max_listed missing dates per symbol).
+    """
+    dates = np.asarray(timestamps).astype('datetime64[D]')
+    calendar = _sorted_unique(dates if calendar is None else np.asarray(calendar).astype('datetime64[D]'))
+    counts = np.zeros(n_symbols, dtype=np.int64)
+    missing = [calendar[:0]] * n_symbols
+    if len(dates) == 0:
+        return counts, missing
+
+    # Distinct calendar sessions present per symbol vs sessions spanned by its first and last bar
+    position = np.searchsorted(calendar, dates)
+    in_calendar = (position < len(calendar)) & (calendar[np.minimum(position, len(calendar) - 1)] == dates)
+    present = _sorted_unique(symbol_ids[in_calendar] * len(calendar) + position[in_calendar])
+    n_present = np.bincount(present // len(calendar), minlength=n_symbols)
+
+    has = np.bincount(symbol_ids, minlength=n_symbols) > 0
+    first = np.full(n_symbols, len(calendar))
+    last = np.full(n_symbols, -1)
+    np.minimum.at(first, symbol_ids, position)
+    np.maximum.at(last, symbol_ids, np.searchsorted(calendar, dates, side='right') - 1)
+    counts[has] = np.maximum(last[has] - first[has] + 1 - n_present[has], 0)
+
+    # Dates are listed only for symbols with gaps
+    for i in np.flatnonzero(counts):
+        sessions = present[(present >= i * len(calendar)) & (present < (i + 1) * len(calendar))] % len(calendar)
+        window = np.arange(first[i], last[i] + 1)
+        missing[i] = calendar[window[~np.isin(window, sessions, assume_unique=True)][:max_listed]]
+    return counts, missing
+
+
+def validate_bars(frames, calendar=None, spike_threshold=10.0, min_spike=0.1):
+    """
+    Validates {symbol: OHLCV DataFrame with a datetime index} in one vectorized pass.
+    Returns (clean_frames, quarantined_frames, report): quarantined rows carry a
+    'reason' column, and report is a DataFrame with one row per symbol.
+    """
+    import pandas as pd
+
+    symbols = list(frames)
+    lengths = np.array([len(df) for df in frames.values()], dtype=np.int64)
+    symbol_ids = np.repeat(np.arange(len(symbols), dtype=np.int64), lengths)
+
+    def column(name):
+        return np.concatenate([df[name].to_numpy(dtype=np.float64) for df in frames.values()]) \
+            if symbols else np.zeros(0)
+
+    timestamps = np.concatenate([df.index.values.astype('datetime64[ns]') for df in frames.values()]) \
+        if symbols else np.zeros(0, dtype='datetime64[ns]')
+    flags = check_bars(timestamps, column('open'), column('high'), column('low'), column('close'),
+                       column('volume'), symbol_ids, len(symbols), spike_threshold, min_spike)
+    bad = np.zeros(len(timestamps), dtype=bool)
+    for name in ROW_CHECKS:
+        bad |= flags[name]
+
+    gap_counts, gaps = missing_sessions(timestamps[~bad], symbol_ids[~bad], len(symbols), calendar)
+
+    report = pd.DataFrame({'symbol': symbols, 'rows': lengths})
+    for name in ROW_CHECKS + ('return_jump',):
+        report[name] = np.bincount(symbol_ids[flags[name]], minlength=len(symbols))
+    report['quarantined'] = np.bincount(symbol_ids[bad], minlength=len(symbols))
+    report['missing_sessions'] = gap_counts
+    report['first_missing'] = [', '.join(str(d) for d in g) for g in gaps]
+
+    clean, quarantined = {}, {}
+    offsets = np.r_[0, np.cumsum(lengths)]
+    for i, (symbol, df) in enumerate(frames.items()):
+        rows = bad[offsets[i]:offsets[i + 1]]
+        clean[symbol] = df[~rows]
+        if rows.any():
+            reasons = np.array([', '.join(name for name in ROW_CHECKS if flags[name][offsets[i] + j])
+                                for j in np.flatnonzero(rows)])
+            quarantined[symbol] = df[rows].assign(reason=reasons)
+    return clean, quarantined, report
+
+
+def load_calendar(file_path):
+    """
+    Session dates of a raw price file (normally the index, e.g. ^GSPC), for use as
+    the exchange calendar. Reads both the {date: bar} layout and Yahoo chart JSON.
+    """
+    import json
+
+    with open(file_path, 'r') as f:
+        data = json.load(f)
+    if 'chart' in data:
+        stamps = np.asarray(data['chart']['result'][0].get('timestamp', []), dtype='datetime64[s]')
+    else:
+        stamps = np.array([np.datetime64(key[:10]) for key in data])
+    return _sorted_unique(stamps.astype('datetime64[D]'))
+
+
+def validate_universe(frames, quarantine_dir=None, calendar=None, **kwargs):
+    """
+    Validates {symbol: bars} in one validate_bars call, prints a summary line per
+    symbol with problems and writes quarantined rows to
+    {quarantine_dir}/{symbol}_quarantine.csv. Returns {symbol: clean frame}.
+    """
+    import os
+
+    clean, quarantined, report = validate_bars(frames, calendar=calendar, **kwargs)
+    for _, row in report.iterrows():
+        failed = [f"{name}: {row[name]}" for name in ROW_CHECKS + ('return_jump',) if row[name]]
+        if failed or row['missing_sessions']:
+            print(f"Validation for {row['symbol']}: {row['quarantined']} of {row['rows']} rows quarantined "
+                  f"({', '.join(failed) or 'no row errors'}), {row['missing_sessions']} missing sessions"
+                  + (f" (first: {row['first_missing']})" if row['missing_sessions'] else ''))
+    if quarantine_dir:
+        for symbol, rows in quarantined.items():
+            os.makedirs(quarantine_dir, exist_ok=True)
+            rows.to_csv(os.path.join(quarantine_dir, f"{symbol}_quarantine.csv"))
+    return clean
+
+
+def validate_frame(symbol, df, quarantine_dir=None, calendar=None, **kwargs):
+    """
+    Validates one symbol's bars (see validate_universe). Missing sessions are only
+    found against a calendar (e.g. load_calendar of the index file): on its own, a
+    symbol's dates are its calendar and gaps cannot be seen.
+    """
+    return validate_universe({symbol: df}, quarantine_dir, calendar, **kwargs)[symbol]
+
+
+def format_report(report):
+    columns = ['symbol', 'rows', 'quarantined', 'missing_sessions', 'return_jump'] + \
+              [name for name in ROW_CHECKS if report[name].any()]
+    return report[columns].to_string(index=False)
+
+
+if __name__ == '__main__':
+    import os
+    import sys
+    import time
+    import pandas as pd
+
+    # Validates the raw daily files of the whole universe in one pass
+    data_dir = os.path.join('rl_trading_system', 'data')
+    selected = sys.argv[1:] or ['AAPL', 'GOOG', 'NVDA', '^GSPC']
+    frames = {}
+    for symbol in selected:
+        raw = pd.read_json(os.path.join(data_dir, f'{symbol}_5y_1d.json'), orient='index')
+        frames[symbol] = raw.rename(columns=str.lower)
+
+    start = time.perf_counter()
+    clean, quarantined, report = validate_bars(frames)
+    print(format_report(report))
+    print(f"\nValidated {report['rows'].sum()} bars of {len(frames)} symbols in "
+          f"{(time.perf_counter() - start) * 1000:.1f} ms")
@@ -0,0 +1,393 @@
+import copy
+import os
+import queue
+import time
+import threading
+import traceback
+import multiprocessing as mp
+from multiprocessing.connection import Listener, Client, wait
+
+import numpy as np
+
+
+class QueueTransport:
+    """
+    תעבורה בתורים של multiprocessing: תור מעברים ותור פרמטרים נפרדים לכל עובד
+    (עובד שנהרג באמצע כתיבה פוגע רק בתור שלו, ולא נועל את האחרים)
+    """
+
+    def __init__(self, n_workers):
+        self._ctx = mp.get_context()
+        self._to_learner = [self._ctx.Queue() for _ in range(n_workers)]
+        self._to_worker = [self._ctx.Queue() for _ in range(n_workers)]
+        self._next = 0
+
+    def start(self, is_alive, timeout=30.0):
+        pass
+
+    def endpoint(self, worker_id):
+        return QueueEndpoint(self._to_learner[worker_id], self._to_worker[worker_id])
+
+    def receive(self, worker_ids, timeout=0.1):
+        """
+        הודעה אחת מאחד העובדים (סבב הוגן בין התורים), או None אם לא הגיע דבר עד timeout
+        """
+        deadline = time.perf_counter() + timeout
+        worker_ids = list(worker_ids)
+        while worker_ids:
+            for i in range(len(worker_ids)):
+                worker_id = worker_ids[(self._next + i) % len(worker_ids)]
+                try:
+                    message = self._to_learner[worker_id].get_nowait()
+                except queue.Empty:
+                    continue
+                self._next = (self._next + i + 1) % len(worker_ids)
+                return message
+            if time.perf_counter() >= deadline:
+                break
+            time.sleep(0.0005)
+        return None
+
+    def send(self, worker_id, message):
+        self._to_worker[worker_id].put(message)
+
+    def close(self):
+        for q in self._to_learner + self._to_worker:
+            q.cancel_join_thread()
+            q.close()
+
+
+class QueueEndpoint:
+    """
+    צד העובד של QueueTransport
+    """
+
+    def __init__(self, outbox, inbox):
+        self.outbox = outbox
+        self.inbox = inbox
+
+    def connect(self, worker_id):
+        pass
+
+    def send(self, message):
+        self.outbox.put(message)
+
+    def receive(self, block=False, timeout=None):
+        try:
+            return self.inbox.get(block=block, timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class SocketTransport:
+    """
+    תעבורה בסוקטים על localhost (multiprocessing.connection עם מפתח אימות)
+    הלומד מאזין בפורט פנוי; כל עובד מתחבר ומזדהה במספר שלו
+    """
+
+    def __init__(self, n_workers, host='127.0.0.1', port=0):
+        self.n_workers = n_workers
+        self._authkey = os.urandom(16)
+        self._listener = Listener((host, port), authkey=self._authkey)
+        self.address = self._listener.address
+        self._connections = {}
+
+    def start(self, is_alive, timeout=30.0):
+        """
+        קבלת חיבורים ברקע, והמתנה עד שכל עובד חי התחבר
+        """
+        threading.Thread(target=self._accept, daemon=True).start()
+        deadline = time.perf_counter() + timeout
+        while any(is_alive(w) and w not in self._connections for w in range(self.n_workers)):
+            if time.perf_counter() > deadline:
+                raise RuntimeError(f"Workers did not connect within {timeout}s")
+            time.sleep(0.01)
+
+    def _accept(self):
+        while True:
+            try:
+                connection = self._listener.accept()
+                self._connections[connection.recv()] = connection
+            except (OSError, EOFError):
+                return
+
+    def endpoint(self, worker_id):
+        return SocketEndpoint(self.address, self._authkey)
+
+    def receive(self, worker_ids, timeout=0.1):
+        connections = [c for w, c in list(self._connections.items()) if w in worker_ids]
+        for connection in wait(connections, timeout):
+            try:
+                return connection.recv()
+            except (EOFError, OSError):
+                # העובד נסגר - החיבור שלו יוצא מהסבב
+                worker_id = next(w for w, c in list(self._connections.items()) if c is connection)
+                del self._connections[worker_id]
+        return None
+
+    def send(self, worker_id, message):
+        connection = self._connections.get(worker_id)
+        if connection is None:
+            return
+        try:
+            connection.send(message)
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            del self._connections[worker_id]
+
+    def close(self):
+        self._listener.close()
+        for connection in list(self._connections.values()):
+            connection.close()
+
+
+class SocketEndpoint:
+    """
+    צד העובד של SocketTransport
+    """
+
+    def __init__(self, address, authkey):
+        self.address = address
+        self.authkey = authkey
+        self.connection = None
+
+    def connect(self, worker_id):
+        self.connection = Client(self.address, authkey=self.authkey)
+        self.connection.send(worker_id)
+
+    def send(self, message):
+        self.connection.send(message)
+
+    def receive(self, block=False, timeout=None):
+        if not self.connection.poll(None if block and timeout is None else (timeout or 0)):
+            return None
+        return self.connection.recv()
+
+
+TRANSPORTS = {'queue': QueueTransport, 'socket': SocketTransport}
+
+
+def _rollout_worker(worker_id, endpoint, price_files, discretizer, env_kwargs, batch_size, seed):
+    """
+    תהליך עובד: מריץ אפיזודות של TradingEnvironment עם עותק הטבלה האחרון שקיבל
+    ושולח ללומד אצוות מעברים כמזהי מצב - (מצב, פעולה, תגמול, מצב הבא, סיום)
+    ממשיך עד שהלומד שולח עצירה
+    """
+    from trading_env import TradingEnvironment
+    from market_data import load_processed_frame
+
+    endpoint.connect(worker_id)
+    try:
+        rng = np.random.default_rng(seed)
+        envs = [TradingEnvironment(load_processed_frame(path), **env_kwargs) for _, path in price_files]
+        discretizers = [copy.deepcopy(discretizer).bind(env.feature_names) for env in envs]
+
+        # מאגרי האצווה - מוקצים פעם אחת; לכל שליחה יוצא עותק
+        state_keys = np.zeros(batch_size, dtype=np.int64)
+        next_state_keys = np.zeros(batch_size, dtype=np.int64)
+        actions = np.zeros(batch_size, dtype=np.int64)
+        rewards = np.zeros(batch_size)
+        dones = np.zeros(batch_size, dtype=bool)
+
+        def flush(n, episodes):
+            endpoint.send(('batch', worker_id, {
+                'state_keys': state_keys[:n].copy(), 'actions': actions[:n].copy(),
+                'rewards': rewards[:n].copy(), 'next_state_keys': next_state_keys[:n].copy(),
+                'dones': dones[:n].copy(),
+            }, episodes))
+
+        params = endpoint.receive(block=True)
+        episode = 0
+        while True:
+            # הפרמטרים העדכניים ביותר שהגיעו (הודעות ישנות יותר נזרקות)
+            message = endpoint.receive()
+            while message is not None:
+                params = message
+                message = endpoint.receive()
+            _, _, q_table, exploration_rate, stop = params
+            if stop:
+                break
+
+            k = (worker_id + episode) % len(envs)
+            env, discretizer = envs[k], discretizers[k]
+            state, _ = env.reset()
+            state_key = int(discretizer.transform(state))
+            episode_reward = 0.0
+            n = 0
+            done = False
+            while not done:
+                if rng.random() < exploration_rate:
+                    action = int(rng.integers(env.action_space.n))
+                else:
+                    action = int(np.argmax(q_table[state_key]))
+                state, reward, done, _, info = env.step(action)
+                next_state_key = int(discretizer.transform(state))
+
+                state_keys[n], actions[n], rewards[n] = state_key, action, reward
+                next_state_keys[n], dones[n] = next_state_key, done
+                n += 1
+                episode_reward += reward
+                state_key = next_state_key
+                if n == batch_size and not done:
+                    flush(n, [])
+                    n = 0
+
+            flush(n, [{'worker': worker_id, 'symbol': price_files[k][0], 'reward': episode_reward,
+                       'profit_percent': info['total_profit_percent']}])
+            episode += 1
+        endpoint.send(('done', worker_id, None, []))
+    except Exception:
+        endpoint.send(('error', worker_id, traceback.format_exc(), []))
+
+
+class DistributedTrainer:
+    """
+    חלוקת אימון לעובדי rollout ולומד מרכזי
+    העובדים (תהליכים נפרדים) מריצים אפיזודות ושולחים אצוות מעברים; הלומד מעדכן את
+    טבלת ה-Q של הסוכן ומשדר לעובדים את הטבלה ושיעור האקספלורציה כל broadcast_interval אצוות
+    האפיזודות לא מחולקות מראש: כל עובד רץ עד שהלומד מגיע ליעד, כך שעובד שמת
+    רק מאט את האימון והאחרים ממשיכים (שגיאה רק אם כל העובדים מתו)
+    """
+
+    def __init__(self, agent, price_files, n_workers=2, transport='queue', batch_size=256,
+                 broadcast_interval=4, env_kwargs=None, seed=0, worker_timeout=60.0):
+        self.agent = agent
+        # price_files: רשימת (סמל, נתיב לקובץ מעובד); כל עובד מסתובב בין כל הסמלים
+        self.price_files = list(price_files.items()) if isinstance(price_files, dict) else list(price_files)
+        self.n_workers = n_workers
+        self.transport_name = transport
+        self.batch_size = batch_size
+        self.broadcast_interval = broadcast_interval
+        self.env_kwargs = dict(env_kwargs or {})
+        self.seed = seed
+        self.worker_timeout = worker_timeout
+        self.processes = {}
+        self.stats = None
+
+    def _broadcast(self, transport, live, stop=False):
+        self._version += 1
+        # עותק אחד לכל שידור - תור multiprocessing מסדר את ההודעה ברקע, אחרי שהטבלה כבר ממשיכה להשתנות
+        message = ('params', self._version, self.agent.q_table.copy(), self.agent.exploration_rate, stop)
+        for worker_id in live:
+            transport.send(worker_id, message)
+
+    def train(self, episodes=100, render_interval=10, on_start=None):
+        """
+        אימון עד episodes אפיזודות שהושלמו (בכל העובדים יחד)
+        on_start: קריאה אופציונלית עם מילון התהליכים אחרי ההפעלה (למשל להרוג עובד בבדיקה)
+        מחזיר את רשימת התגמולים המצטברים לפי סדר סיום האפיזודות
+        """
+        transport = TRANSPORTS[self.transport_name](self.n_workers) \
+            if isinstance(self.transport_name, str) else self.transport_name
+        ctx = mp.get_context()
+        for worker_id in range(self.n_workers):
+            process = ctx.Process(target=_rollout_worker, daemon=True, args=(
+                worker_id, transport.endpoint(worker_id), self.price_files, self.agent.discretizer,
+                self.env_kwargs, self.batch_size, self.seed + worker_id))
+            process.start()
+            self.processes[worker_id] = process
+        transport.start(lambda worker_id: self.processes[worker_id].is_alive())
+
+        live = set(self.processes)
+        dead, errors = [], {}
+        transitions = {worker_id: 0 for worker_id in self.processes}
+        episode_rewards = []
+        self._version = 0
+        self._broadcast(transport, live)
+        if on_start is not None:
+            on_start(self.processes)
+
+        start = time.perf_counter()
+        batches = 0
+        stopping = False
+        last_check = last_message = start
+        try:
+            while live:
+                message = transport.receive(live)
+                now = time.perf_counter()
+                if message is not None:
+                    last_message = now
+                    kind, worker_id, payload, finished = message
+                    if kind == 'batch':
+                        if not stopping:
+                            self.agent.update_q_table_keys(**payload)
+                            transitions[worker_id] += len(payload['actions'])
+                            batches += 1
+                        for info in finished:
+                            if stopping:
+                                break
+                            episode_rewards.append(info['reward'])
+                            episode = len(episode_rewards)
+                            if episode % render_interval == 0:
+                                print(f"אפיזודה {episode}/{episodes} (עובד {info['worker']}, {info['symbol']}), "
+                                      f"תגמול: {info['reward']:.2f}, אקספלורציה: {self.agent.exploration_rate:.4f}, "
+                                      f"רווח: {info['profit_percent']:.2f}%")
+                        if not stopping and len(episode_rewards) >= episodes:
+                            stopping = True
+                            self._broadcast(transport, live, stop=True)
+                        elif not stopping and batches % self.broadcast_interval == 0:
+                            self._broadcast(transport, live)
+                    else:
+                        if kind == 'error':
+                            errors[worker_id] = payload
+                            dead.append(worker_id)
+                            print(f"עובד {worker_id} נכשל:\n{payload}")
+                        live.discard(worker_id)
+
+                # בדיקת עובדים שמתו בלי להודיע (למשל נהרגו) - פעם בחצי שנייה
+                if now - last_check > 0.5:
+                    last_check = now
+                    for worker_id in list(live):
+                        if not self.processes[worker_id].is_alive():
+                            live.discard(worker_id)
+                            dead.append(worker_id)
+                            print(f"עובד {worker_id} הפסיק לפעול (קוד יציאה {self.processes[worker_id].exitcode}), "
+                                  f"ממשיך עם {len(live)} עובדים")
+                    if now - last_message > self.worker_timeout:
+                        raise RuntimeError(f"No message from workers {sorted(live)} in {self.worker_timeout}s")
+        finally:
+            elapsed = time.perf_counter() - start
+            for process in self.processes.values():
+                process.join(timeout=1.0)
+                if process.is_alive():
+                    process.terminate()
+            transport.close()
+
+        if len(episode_rewards) < episodes:
+            raise RuntimeError(f"All workers stopped after {len(episode_rewards)} of {episodes} episodes")
+
+        total = sum(transitions.values())
+        self.stats = {'episodes': len(episode_rewards), 'transitions': total, 'seconds': elapsed,
+                      'transitions_per_second': total / elapsed if elapsed > 0 else 0.0,
+                      'per_worker': transitions, 'dead_workers': dead, 'errors': errors,
+                      'broadcasts': self._version}
+        return episode_rewards
+
+
+# --- Main Execution --- #
+if __name__ == '__main__':
+    import sys
+    from market_data import load_processed_frame
+    from trading_env import TradingEnvironment
+    from rl_agent import RLTradingAgent
+
+    data_dir = os.path.join('rl_trading_system', 'data', 'processed')
+    price_files = {symbol: os.path.join(data_dir, f'{symbol}_processed_prices.csv')
+                   for symbol in ['AAPL', 'GOOG', 'NVDA', '^GSPC']}
+    episodes = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    print(f"מעבדים זמינים: {os.cpu_count()}")
+
+    for transport in ('queue', 'socket'):
+        for n_workers in (1, 2, 4):
+            agent = RLTradingAgent(TradingEnvironment(load_processed_frame(price_files['AAPL'])))
+            trainer = DistributedTrainer(agent, price_files, n_workers=n_workers, transport=transport)
+            trainer.train(episodes=episodes, render_interval=episodes)
+            stats = trainer.stats
+            print(f"{transport:>6}, {n_workers} עובדים: {stats['transitions_per_second']:,.0f} מעברים/שנייה, "
+                  f"{stats['broadcasts']} שידורים, לפי עובד: {stats['per_worker']}\n")
+
+    # עמידות: הריגת עובד אחד מיד אחרי ההפעלה - האחרים משלימים את כל האפיזודות
+    agent = RLTradingAgent(TradingEnvironment(load_processed_frame(price_files['AAPL'])))
+    trainer = DistributedTrainer(agent, price_files, n_workers=3, transport='socket')
+    rewards = trainer.train(episodes=episodes, render_interval=episodes,
+                            on_start=lambda processes: processes[0].kill())
+    print(f"אחרי הריגת עובד 0: {len(rewards)} אפיזודות הושלמו, עובדים שמתו: {trainer.stats['dead_workers']}")
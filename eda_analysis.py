@@ -1,87 +1,219 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
+import sys
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 
 # Define directories
 processed_data_dir = r'C:\Users\Oriel\FinAlgoTrading\FinTech\rl_trading_system\data\processed'
 results_dir = r'C:\Users\Oriel\FinAlgoTrading\FinTech\rl_trading_system\results\eda_plots'
-os.makedirs(results_dir, exist_ok=True)
-
-# Symbol to analyze
-symbol = "^GSPC" # Can be changed to AAPL, GOOG, or NVDA
-
-# Load processed price data
-price_file = os.path.join(processed_data_dir, f"{symbol}_processed_prices.csv")
-print(f"Loading processed data from {price_file}...")
-
-try:
-    df = pd.read_csv(price_file, index_col='timestamp', parse_dates=True)
-    print("Data loaded successfully.")
-
-    # --- Exploratory Data Analysis --- 
-
-    # 1. Plot Adjusted Close Price
-    plt.figure(figsize=(14, 7))
-    plt.plot(df.index, df['adj_close'], label=f"{symbol} Adjusted Close Price")
-    plt.title(f"{symbol} Adjusted Close Price Over 5 Years")
-    plt.xlabel("Date")
-    plt.ylabel("Adjusted Close Price (USD)")
-    plt.legend()
-    plt.grid(True)
-    plot_path_close = os.path.join(results_dir, f"{symbol}_adj_close_price.png")
-    plt.savefig(plot_path_close)
-    plt.close()
-    print(f"Saved adjusted close price plot to {plot_path_close}")
-
-    # 2. Plot Trading Volume
-    plt.figure(figsize=(14, 7))
-    plt.bar(df.index, df['volume'], label=f"{symbol} Volume")
-    plt.title(f"{symbol} Trading Volume Over 5 Years")
-    plt.xlabel("Date")
-    plt.ylabel("Volume")
-    plt.legend()
-    plt.grid(True)
-    plot_path_volume = os.path.join(results_dir, f"{symbol}_volume.png")
-    plt.savefig(plot_path_volume)
-    plt.close()
-    print(f"Saved volume plot to {plot_path_volume}")
-
-    # 3. Plot a Moving Average (e.g., SMA 12 and SMA 26 from the 'ta' library)
-    plt.figure(figsize=(14, 7))
-    plt.plot(df.index, df['adj_close'], label="Adj Close")
+
+# Symbols to analyze (can be overridden on the command line)
+symbols = ["AAPL", "GOOG", "NVDA", "^GSPC"]
+
+# Long histories are aggregated to at most this many points per plot
+max_points = 500
+
+# Columns each plot needs; only these are read from the processed CSV
+PLOT_COLUMNS = {
+    'adj_close_price': ['adj_close'],
+    'volume': ['volume'],
+    'sma': ['adj_close', 'trend_sma_fast', 'trend_sma_slow'],
+    'daily_returns_dist': ['adj_close'],
+}
+
+# Bump when the plotting code changes so cached figures are regenerated
+PLOT_VERSION = 2
+
+
+def _bucket(values, n_buckets, how='mean'):
+    """Aggregates a 1-D array into at most n_buckets equal buckets."""
+    size = -(-len(values) // n_buckets)
+    if size <= 1:
+        return values
+    padded = np.full(size * -(-len(values) // size), np.nan)
+    padded[:len(values)] = values
+    buckets = padded.reshape(-1, size)
+    return np.nansum(buckets, axis=1) if how == 'sum' else np.nanmean(buckets, axis=1)
+
+
+def _downsample(index, values, how='mean'):
+    """Downsamples (index, values) for plotting; the index keeps each bucket's first date."""
+    size = -(-len(values) // max_points)
+    if size <= 1:
+        return index, values
+    return index[::size], _bucket(values, max_points, how)
+
+
+def _gaussian_kde(samples, grid):
+    """Small Gaussian KDE (Scott's rule) evaluated on grid, scaled to histogram counts."""
+    bandwidth = samples.std() * len(samples) ** (-1 / 5)
+    if bandwidth == 0:
+        return np.zeros_like(grid)
+    z = (grid[:, None] - samples[None, :]) / bandwidth
+    return np.exp(-0.5 * z * z).sum(axis=1) / (bandwidth * np.sqrt(2 * np.pi))
+
+
+def _new_axes(figsize):
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize)
+    return fig, fig.subplots()
+
+
+def _plot_adj_close_price(symbol, df, path):
+    fig, ax = _new_axes((14, 7))
+    x, y = _downsample(df.index, df['adj_close'].to_numpy())
+    ax.plot(x, y, label=f"{symbol} Adjusted Close Price")
+    ax.set_title(f"{symbol} Adjusted Close Price Over 5 Years")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Adjusted Close Price (USD)")
+    ax.legend()
+    ax.grid(True)
+    fig.savefig(path)
+
+
+def _plot_volume(symbol, df, path):
+    # Aggregated volume drawn as one filled step series instead of a bar per day
+    fig, ax = _new_axes((14, 7))
+    x, y = _downsample(df.index, df['volume'].to_numpy(dtype=np.float64), how='sum')
+    ax.fill_between(x, y, step='post', label=f"{symbol} Volume")
+    ax.set_title(f"{symbol} Trading Volume Over 5 Years")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Volume")
+    ax.legend()
+    ax.grid(True)
+    fig.savefig(path)
+
+
+def _plot_sma(symbol, df, path):
+    fig, ax = _new_axes((14, 7))
+    ax.plot(*_downsample(df.index, df['adj_close'].to_numpy()), label="Adj Close")
     # Check if the columns exist before plotting
-    if 'trend_sma_fast' in df.columns: # Assuming 'trend_sma_fast' is the 12-day SMA from ta
-        plt.plot(df.index, df['trend_sma_fast'], label="SMA 12")
-    if 'trend_sma_slow' in df.columns: # Assuming 'trend_sma_slow' is the 26-day SMA from ta
-        plt.plot(df.index, df['trend_sma_slow'], label="SMA 26")
-    plt.title(f"{symbol} Adjusted Close Price and Moving Averages")
-    plt.xlabel("Date")
-    plt.ylabel("Price (USD)")
-    plt.legend()
-    plt.grid(True)
-    plot_path_sma = os.path.join(results_dir, f"{symbol}_sma.png")
-    plt.savefig(plot_path_sma)
-    plt.close()
-    print(f"Saved moving average plot to {plot_path_sma}")
-
-    # 4. Plot Distribution of Daily Returns
-    df['daily_return'] = df['adj_close'].pct_change()
-    plt.figure(figsize=(10, 6))
-    sns.histplot(df['daily_return'].dropna(), bins=100, kde=True)
-    plt.title(f"{symbol} Distribution of Daily Returns")
-    plt.xlabel("Daily Return")
-    plt.ylabel("Frequency")
-    plt.grid(True)
-    plot_path_returns = os.path.join(results_dir, f"{symbol}_daily_returns_dist.png")
-    plt.savefig(plot_path_returns)
-    plt.close()
-    print(f"Saved daily returns distribution plot to {plot_path_returns}")
-
-    print(f"\nFinished EDA for {symbol}.")
-
-except FileNotFoundError:
-    print(f"Error: Processed file not found at {price_file}")
-except Exception as e:
-    print(f"An error occurred during EDA for {symbol}: {e}")
+    if 'trend_sma_fast' in df.columns:  # 12-day SMA from ta
+        ax.plot(*_downsample(df.index, df['trend_sma_fast'].to_numpy()), label="SMA 12")
+    if 'trend_sma_slow' in df.columns:  # 26-day SMA from ta
+        ax.plot(*_downsample(df.index, df['trend_sma_slow'].to_numpy()), label="SMA 26")
+    ax.set_title(f"{symbol} Adjusted Close Price and Moving Averages")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Price (USD)")
+    ax.legend()
+    ax.grid(True)
+    fig.savefig(path)
+
+
+def _plot_daily_returns_dist(symbol, df, path):
+    close = df['adj_close'].to_numpy()
+    returns = close[1:] / close[:-1] - 1
+    returns = returns[np.isfinite(returns)]
+
+    fig, ax = _new_axes((10, 6))
+    counts, edges, _ = ax.hist(returns, bins=100, alpha=0.6)
+    grid = np.linspace(edges[0], edges[-1], 200)
+    ax.plot(grid, _gaussian_kde(returns, grid) * (edges[1] - edges[0]))
+    ax.set_title(f"{symbol} Distribution of Daily Returns")
+    ax.set_xlabel("Daily Return")
+    ax.set_ylabel("Frequency")
+    ax.grid(True)
+    fig.savefig(path)
+
+
+PLOTTERS = {
+    'adj_close_price': _plot_adj_close_price,
+    'volume': _plot_volume,
+    'sma': _plot_sma,
+    'daily_returns_dist': _plot_daily_returns_dist,
+}
+
+
+def _load_columns(price_file, columns):
+    """Reads only the index and the requested columns that exist in the file."""
+    import pandas as pd
+
+    header = pd.read_csv(price_file, nrows=0).columns
+    wanted = [header[0]] + [col for col in columns if col in header]
+    return pd.read_csv(price_file, usecols=wanted, index_col=0, parse_dates=True)
+
+
+def _signature(df, columns):
+    digest = hashlib.sha1(str(PLOT_VERSION).encode())
+    digest.update(df.index.asi8.tobytes())
+    for col in columns:
+        if col in df.columns:
+            digest.update(col.encode())
+            digest.update(df[col].to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def generate_eda_report(symbol, data_dir=None, out_dir=None, force=False):
+    """
+    Renders the EDA figures for one symbol, skipping figures whose input
+    columns have not changed since the last run. Returns the list of plots rendered.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+
+    data_dir = data_dir or processed_data_dir
+    out_dir = out_dir or results_dir
+    price_file = os.path.join(data_dir, f"{symbol}_processed_prices.csv")
+    manifest_file = os.path.join(out_dir, f"{symbol}_eda_manifest.json")
+    if not os.path.exists(price_file):
+        print(f"Error: Processed file not found at {price_file}")
+        return []
+
+    manifest = {}
+    if os.path.exists(manifest_file) and not force:
+        with open(manifest_file, 'r') as f:
+            manifest = json.load(f)
+
+    # Fast path: file untouched and every figure still on disk
+    stat = os.stat(price_file)
+    file_key = f"{stat.st_size}:{stat.st_mtime_ns}:{PLOT_VERSION}"
+    outputs = {name: os.path.join(out_dir, f"{symbol}_{name}.png") for name in PLOTTERS}
+    if manifest.get('file') == file_key and all(os.path.exists(p) for p in outputs.values()):
+        print(f"{symbol}: inputs unchanged, skipping")
+        return []
+
+    needed = sorted({col for cols in PLOT_COLUMNS.values() for col in cols})
+    df = _load_columns(price_file, needed)
+
+    rendered = []
+    plots = manifest.get('plots', {})
+    for name, plotter in PLOTTERS.items():
+        signature = _signature(df, PLOT_COLUMNS[name])
+        if plots.get(name) == signature and os.path.exists(outputs[name]):
+            continue
+        plotter(symbol, df, outputs[name])
+        plots[name] = signature
+        rendered.append(name)
+        print(f"Saved {name} plot to {outputs[name]}")
+
+    with open(manifest_file, 'w') as f:
+        json.dump({'file': file_key, 'plots': plots}, f, indent=2)
+    return rendered
+
+
+def generate_eda_reports(symbol_list, max_workers=None, force=False):
+    """Generates reports for all symbols in parallel worker processes."""
+    os.makedirs(results_dir, exist_ok=True)
+    results = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # Directories are passed explicitly so spawned workers (Windows) see overrides
+        futures = {symbol: executor.submit(generate_eda_report, symbol, processed_data_dir, results_dir, force)
+                   for symbol in symbol_list}
+        for symbol, future in futures.items():
+            try:
+                results[symbol] = future.result()
+            except Exception as e:
+                print(f"An error occurred during EDA for {symbol}: {e}")
+                results[symbol] = None
+    return results
+
 
+if __name__ == '__main__':
+    selected = sys.argv[1:] or symbols
+    reports = generate_eda_reports(selected)
+    rendered = sum(len(r) for r in reports.values() if r)
+    print(f"\nFinished EDA for {len(selected)} symbols ({rendered} figures rendered).")
@@ -0,0 +1,251 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from trading_env import PORTFOLIO_FEATURES
+from performance_metrics import StreamingMetrics
+from resampler import periods_per_year
+
+# אסטרטגיות הבסיס שמושוות לסוכן
+BASELINES = ['buy_and_hold', 'sma_crossover', 'random']
+
+
+def make_periods(n_rows, period_length=None, step=None, window_size=30):
+    """
+    חלוקת סדרה לתקופות (התחלה, סוף) בשורות; ללא period_length - כל הסדרה כתקופה אחת
+    """
+    if period_length is None or period_length >= n_rows:
+        return [(0, n_rows)]
+    if period_length < window_size + 2:
+        raise ValueError(f"period_length must be at least window_size + 2 ({window_size + 2})")
+    step = step or period_length
+    return [(start, start + period_length) for start in range(0, n_rows - period_length + 1, step)]
+
+
+def normalized_last_rows(values, window_size):
+    """
+    הערך האחרון של כל חלון [s-window, s) אחרי נרמול מינימום-מקסימום, כמו ב-_normalize_frame
+    מחזיר מערך (n_rows, n_columns) שבו שורה s היא מה שהסוכן רואה בצעד s (NaN לפני החלון הראשון)
+    """
+    out = np.full(values.shape, np.nan, dtype=np.float32)
+    windows = sliding_window_view(values, window_size, axis=0)[:-1]
+    min_value = np.nanmin(windows, axis=-1)
+    value_range = np.nanmax(windows, axis=-1) - min_value
+    constant = value_range == 0
+    last = values[window_size - 1:-1]
+    normalized = (last - min_value) / np.where(constant, np.float32(1), value_range)
+    out[window_size:] = np.where(constant, np.float32(0), normalized)
+    return out
+
+
+def _sma_trend(prices, fast, slow):
+    """
+    האם הממוצע הנע המהיר מעל האיטי בכל צעד (בסיס לפעולות חציית הממוצעים)
+    ההחלטה בצעד s משתמשת רק במחירים שלפני s, כמו הסוכן
+    """
+    cumulative = np.r_[0.0, np.cumsum(prices)]
+    index = np.arange(len(prices))
+    with np.errstate(invalid='ignore'):
+        fast_sma = np.where(index >= fast, (cumulative[index] - cumulative[np.maximum(index - fast, 0)]) / fast, np.nan)
+        slow_sma = np.where(index >= slow, (cumulative[index] - cumulative[np.maximum(index - slow, 0)]) / slow, np.nan)
+        return fast_sma > slow_sma
+
+
+def market_state_ids(discretizer, normalized, market_names):
+    """
+    החלק של מזהה המצב שמגיע מתכונות השוק, לכל הצעדים והמסלולים בבת אחת
+    normalized: מערך (..., len(market_names)) של ערכים מנורמלים (ראו normalized_last_rows)
+    """
+    market_ids = np.zeros(normalized.shape[:-1], dtype=np.int64)
+    for column, name in enumerate(market_names):
+        j = discretizer.feature_names.index(name)
+        market_ids += np.digitize(normalized[..., column], discretizer.bin_edges[j]) * discretizer.radix[j]
+    return market_ids
+
+
+def simulate_policy(q_table, discretizer, prices, market_ids, actions=None, policy=None, lengths=None,
+                    initial_balance=10000, fee=0.001, slippage=0.0, interval='1d'):
+    """
+    כללי המסחר של הסביבה בצעדים וקטוריים על מסלולים רבים יחד: קנייה ב-90% מהמזומן, מכירת הכל,
+    עמלה fee, וההחלקה מזיזה את מחיר הביצוע נגד הסוחר
+    prices, market_ids: (צעד, מסלול) - מחיר הביצוע וחלק השוק של מזהה המצב בכל צעד
+    actions: פעולות קבועות (צעד, מסלול) למסלולים שאינם של הסוכן; policy: מסכת המסלולים שבהם
+    פועלת המדיניות החמדנית של q_table (ברירת מחדל: כולם); lengths: מספר הצעדים של כל מסלול
+    fee, slippage: סקלר או מערך לכל מסלול
+    מחזיר מילון מדדים (מערך לכל מסלול) כולל final_value ו-total_return_pct
+    """
+    n_steps, n_paths = prices.shape
+    policy = np.ones(n_paths, dtype=bool) if policy is None else np.asarray(policy, dtype=bool)
+    agent_paths = np.flatnonzero(policy)
+    actions = np.zeros((n_steps, n_paths), dtype=np.int64) if actions is None else actions
+
+    portfolio_positions = {name: PORTFOLIO_FEATURES.index(name) for name in discretizer.feature_names
+                           if name in PORTFOLIO_FEATURES}
+
+    balance = np.full(n_paths, float(initial_balance))
+    shares = np.zeros(n_paths)
+    current_value = balance.copy()
+    metrics = StreamingMetrics(n_envs=n_paths, periods_per_year=periods_per_year(interval))
+    metrics.update(current_value)
+
+    for t in range(n_steps):
+        price = prices[t]
+        active = None if lengths is None else t < lengths
+
+        # פעולות הסוכן: מזהה מצב מקודי השוק ומתכונות התיק לפני הפעולה
+        step_actions = actions[t].copy()
+        state_ids = market_ids[t, agent_paths].copy()
+        if portfolio_positions:
+            features = [balance / initial_balance, shares * price / initial_balance, current_value / initial_balance]
+            for name, position in portfolio_positions.items():
+                j = discretizer.feature_names.index(name)
+                values = features[position][agent_paths].astype(np.float32)
+                state_ids += np.digitize(values, discretizer.bin_edges[j]) * discretizer.radix[j]
+        step_actions[agent_paths] = np.argmax(q_table[state_ids], axis=1)
+        if active is not None:
+            step_actions[~active] = 0
+
+        shares_before = shares
+
+        # קנייה ב-90% מהמזומן במחיר עם החלקה
+        buy_price = price * (1 + slippage)
+        shares_bought = np.floor(balance * 0.9 / buy_price)
+        buy = (step_actions == 1) & (shares_bought > 0)
+        balance = np.where(buy, balance - shares_bought * buy_price * (1 + fee), balance)
+        shares = np.where(buy, shares + shares_bought, shares)
+
+        # מכירת כל המניות
+        sell = (step_actions == 2) & (shares > 0)
+        balance = np.where(sell, balance + shares * price * (1 - slippage) * (1 - fee), balance)
+        shares = np.where(sell, 0.0, shares)
+
+        value = balance + shares * price
+        current_value = value if active is None else np.where(active, value, current_value)
+        metrics.update(current_value, shares * price, np.abs(shares - shares_before) * price, mask=active)
+
+    results = metrics.summary()
+    results['final_value'] = current_value
+    results['total_return_pct'] = (current_value / initial_balance - 1) * 100
+    return results
+
+
+def evaluate(agent, frames, periods=None, window_size=30, initial_balance=10000, transaction_fee_percent=0.001,
+             sma_fast=10, sma_slow=50, random_seeds=10, seed=0, interval='1d'):
+    """
+    הערכה דטרמיניסטית של המדיניות החמדנית של הסוכן מול אסטרטגיות בסיס, בריצה וקטורית אחת
+    frames: {סמל: DataFrame מעובד}; periods: רשימת (התחלה, סוף) בשורות, או מילון {סמל: רשימה}
+    כל (סמל, תקופה, אסטרטגיה) הוא מסלול נפרד; כולם מתקדמים יחד צעד אחר צעד
+    עם אותם כללי מסחר כמו סביבת המסחר (90% מהמזומן בקנייה, מכירת הכל, עמלה)
+    מחזיר DataFrame עם שורה לכל (סמל, תקופה, אסטרטגיה)
+    """
+    import pandas as pd
+
+    discretizer = agent.discretizer
+    strategies = ['agent', 'buy_and_hold', 'sma_crossover'] + [f'random_{i}' for i in range(random_seeds)]
+    n_strategies = len(strategies)
+    market_names = [name for name in discretizer.feature_names if name not in PORTFOLIO_FEATURES]
+
+    # איסוף המסלולים: לכל (סמל, תקופה) - מחירים, קודי מצב שוק ופעולות הבסיס לכל צעד
+    paths = []
+    for symbol, df in frames.items():
+        prices = df['adj_close'].to_numpy(dtype=np.float64)
+        market = df[market_names].to_numpy(dtype=np.float32)
+        normalized = normalized_last_rows(market, window_size)
+        sma_up = _sma_trend(prices, sma_fast, sma_slow)
+        symbol_periods = periods.get(symbol) if isinstance(periods, dict) else periods
+        for start, end in symbol_periods or make_periods(len(df), window_size=window_size):
+            steps = np.arange(start + window_size, end - 1)
+            if len(steps) == 0:
+                continue
+            paths.append({'symbol': symbol, 'start': df.index[start], 'end': df.index[end - 1],
+                          'prices': prices[steps], 'normalized': normalized[steps], 'sma_up': sma_up[steps]})
+    if not paths:
+        raise ValueError("No evaluation period is longer than window_size + 1 rows")
+
+    n_paths = len(paths)
+    n_steps = max(len(p['prices']) for p in paths)
+    lengths = np.array([len(p['prices']) for p in paths])
+
+    # מטריצות (צעד, מסלול) מרופדות עד המסלול הארוך ביותר
+    prices = np.ones((n_steps, n_paths))
+    normalized = np.zeros((n_steps, n_paths, len(market_names)), dtype=np.float32)
+    sma_up = np.zeros((n_steps, n_paths), dtype=bool)
+    for j, p in enumerate(paths):
+        prices[:lengths[j], j] = p['prices']
+        normalized[:lengths[j], j] = p['normalized']
+        sma_up[:lengths[j], j] = p['sma_up']
+
+    # קודי התאים של תכונות השוק ומזהה המצב החלקי שלהן - מחושבים פעם אחת לכל הצעדים
+    market_ids = market_state_ids(discretizer, normalized, market_names)
+
+    # פעולות הבסיס: קנייה והחזקה, חציית ממוצעים, אקראי
+    baseline_actions = np.zeros((n_steps, n_paths, n_strategies), dtype=np.int64)
+    baseline_actions[0, :, 1] = 1
+    previous_up = np.vstack([np.zeros((1, n_paths), dtype=bool), sma_up[:-1]])
+    baseline_actions[:, :, 2] = np.where(sma_up & ~previous_up, 1, np.where(~sma_up & previous_up, 2, 0))
+    rng = np.random.default_rng(seed)
+    baseline_actions[:, :, 3:] = rng.integers(0, 3, size=(n_steps, n_paths, random_seeds))
+
+    # כל (מסלול, אסטרטגיה) הוא מסלול של הליבה; הסוכן פועל רק באסטרטגיה הראשונה
+    shape = (n_paths, n_strategies)
+    summary = simulate_policy(
+        agent.q_table, discretizer, np.repeat(prices, n_strategies, axis=1),
+        np.repeat(market_ids, n_strategies, axis=1), actions=baseline_actions.reshape(n_steps, -1),
+        policy=np.tile(np.arange(n_strategies) == 0, n_paths), lengths=np.repeat(lengths, n_strategies),
+        initial_balance=initial_balance, fee=transaction_fee_percent, interval=interval)
+    summary = {name: values.reshape(shape) for name, values in summary.items()}
+    current_value = summary['final_value']
+
+    rows = []
+    for j, p in enumerate(paths):
+        for k, strategy in enumerate(strategies):
+            rows.append({
+                'symbol': p['symbol'], 'start': p['start'], 'end': p['end'],
+                'strategy': 'random' if strategy.startswith('random_') else strategy,
+                'total_return_pct': (current_value[j, k] / initial_balance - 1) * 100,
+                'sharpe': summary['sharpe'][j, k], 'sortino': summary['sortino'][j, k],
+                'max_drawdown': summary['max_drawdown'][j, k], 'turnover': summary['turnover'][j, k],
+                'exposure': summary['exposure'][j, k], 'final_value': current_value[j, k],
+            })
+
+    # הבסיס האקראי מדווח כממוצע על כל הזרעים
+    results = pd.DataFrame(rows)
+    results = results.groupby(['symbol', 'start', 'end', 'strategy'], sort=False, as_index=False).mean()
+    return results
+
+
+def comparison_table(results, metric='total_return_pct'):
+    """
+    טבלת השוואה: שורה לכל סמל, עמודה לכל אסטרטגיה (ממוצע על התקופות)
+    """
+    table = results.pivot_table(index='symbol', columns='strategy', values=metric, aggfunc='mean', sort=False)
+    return table[[col for col in ['agent'] + BASELINES if col in table.columns]]
+
+
+# --- Main Execution --- #
+if __name__ == '__main__':
+    import os
+    import time
+    from market_data import load_processed_frame
+    from trading_env import TradingEnvironment
+    from rl_agent import RLTradingAgent
+
+    data_dir = os.path.join('rl_trading_system', 'data', 'processed')
+    results_dir = os.path.join('rl_trading_system', 'results')
+    frames = {symbol: load_processed_frame(os.path.join(data_dir, f'{symbol}_processed_prices.csv'))
+              for symbol in ['AAPL', 'GOOG', 'NVDA', '^GSPC']}
+
+    agent = RLTradingAgent(TradingEnvironment(frames['AAPL']), exploration_rate=0.0)
+    model_file = os.path.join(results_dir, 'AAPL_q_table.npz')
+    if os.path.exists(model_file):
+        agent.load(model_file)
+
+    # תקופות של שנה (252 ימים) בצעדים של חודש
+    start_time = time.perf_counter()
+    results = evaluate(agent, frames, periods={s: make_periods(len(df), 252, 21) for s, df in frames.items()})
+    elapsed = time.perf_counter() - start_time
+
+    print(f"{results.groupby(['symbol', 'start']).ngroups} paths evaluated in {elapsed:.2f}s\n")
+    for metric in ('total_return_pct', 'sharpe', 'max_drawdown'):
+        print(f'--- {metric} ---')
+        print(comparison_table(results, metric).round(3).to_string())
+        print()
@@ -0,0 +1,302 @@
+import numpy as np
+
+# סוגי פקודות וכיווני מסחר
+MARKET = 0
+LIMIT = 1
+BUY = 1
+SELL = -1
+
+
+class ExecutionSimulator:
+    """
+    סימולטור ביצוע פקודות מבוסס אירועים (נר אחרי נר)
+    תומך בפקודות שוק ולימיט, החלקה לפי נפח ומילוי חלקי מול נפח המסחר של הנר.
+    ספר הפקודות הממתינות נשמר במערכים דחוסים ומעובד וקטורית לכל הסמלים יחד
+    """
+
+    def __init__(self, n_symbols=1, max_participation=0.1, impact_coefficient=0.1,
+                 impact_exponent=0.5, half_spread=0.0, capacity=256):
+        self.n_symbols = n_symbols
+
+        # חלק מקסימלי מנפח הנר שניתן לבצע (מעבר לכך - מילוי חלקי)
+        self.max_participation = max_participation
+
+        # החלקה: impact_coefficient * (כמות / נפח) ** impact_exponent, בנוסף לחצי מרווח קבוע
+        self.impact_coefficient = impact_coefficient
+        self.impact_exponent = impact_exponent
+        self.half_spread = half_spread
+
+        self._capacity = capacity
+        self.reset()
+
+    def reset(self):
+        """
+        ריקון ספר הפקודות
+        """
+        capacity = self._capacity
+        self.order_id = np.zeros(capacity, dtype=np.int64)
+        self.symbol = np.zeros(capacity, dtype=np.int32)
+        self.side = np.zeros(capacity, dtype=np.int8)
+        self.order_type = np.zeros(capacity, dtype=np.int8)
+        self.limit_price = np.zeros(capacity, dtype=np.float64)
+        self.remaining = np.zeros(capacity, dtype=np.float64)
+        self.n_orders = 0
+        self._next_id = 0
+
+    # --- ניהול פקודות --- #
+
+    def submit(self, symbol, side, quantity, order_type=MARKET, limit_price=np.nan):
+        """
+        הוספת פקודה לספר. מחזיר את מזהה הפקודה
+        """
+        if quantity <= 0:
+            return -1
+        if order_type == LIMIT and not np.isfinite(limit_price):
+            raise ValueError("Limit orders require a limit price")
+
+        if self.n_orders == len(self.order_id):
+            self._compact()
+            if self.n_orders == len(self.order_id):
+                self._grow()
+
+        i = self.n_orders
+        self.order_id[i] = self._next_id
+        self.symbol[i] = symbol
+        self.side[i] = side
+        self.order_type[i] = order_type
+        self.limit_price[i] = limit_price
+        self.remaining[i] = quantity
+        self.n_orders += 1
+        self._next_id += 1
+        return self._next_id - 1
+
+    def cancel(self, order_id=None, symbol=None, side=None):
+        """
+        ביטול פקודות לפי מזהה, או כל הפקודות של סמל/כיוון
+        """
+        mask = self.remaining[:self.n_orders] > 0
+        if order_id is not None:
+            mask &= self.order_id[:self.n_orders] == order_id
+        if symbol is not None:
+            mask &= self.symbol[:self.n_orders] == symbol
+        if side is not None:
+            mask &= self.side[:self.n_orders] == side
+        self.remaining[:self.n_orders][mask] = 0.0
+
+    def pending_quantity(self, symbol, side):
+        """
+        כמות שעוד ממתינה לביצוע עבור סמל וכיוון
+        """
+        n = self.n_orders
+        mask = (self.symbol[:n] == symbol) & (self.side[:n] == side)
+        return float(self.remaining[:n][mask].sum())
+
+    def _grow(self):
+        for name in ('order_id', 'symbol', 'side', 'order_type', 'limit_price', 'remaining'):
+            array = getattr(self, name)
+            grown = np.zeros(len(array) * 2, dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+
+    def _compact(self):
+        """
+        הסרת פקודות שבוצעו או בוטלו, תוך שמירה על סדר ההגעה
+        """
+        n = self.n_orders
+        keep = np.flatnonzero(self.remaining[:n] > 0)
+        for name in ('order_id', 'symbol', 'side', 'order_type', 'limit_price', 'remaining'):
+            array = getattr(self, name)
+            array[:len(keep)] = array[keep]
+        self.n_orders = len(keep)
+
+    # --- ביצוע --- #
+
+    def process_bar(self, price, high, low, volume, cash=None, holdings=None, fee=0.0):
+        """
+        ביצוע הפקודות הממתינות מול נר אחד לכל הסמלים
+        price/high/low/volume: מערכים בגודל n_symbols (price - מחיר הייחוס לביצוע)
+        cash/holdings (אופציונלי, לכל סמל): המילויים נחתכים למה שהחשבון יכול לקחת - קניות עד
+        המזומן כולל עמלה fee, מכירות עד המניות המוחזקות - לפני שהספר מתעדכן; יתרת פקודה
+        שנחתכה נדחית, כך שהספר והתיק לא נפרדים
+        מחזיר מילון של מערכים: order_id, symbol, side, quantity, price
+        """
+        price = np.atleast_1d(np.asarray(price, dtype=np.float64))
+        high = np.atleast_1d(np.asarray(high, dtype=np.float64))
+        low = np.atleast_1d(np.asarray(low, dtype=np.float64))
+        volume = np.atleast_1d(np.asarray(volume, dtype=np.float64))
+
+        n = self.n_orders
+        active = np.flatnonzero(self.remaining[:n] > 0)
+        if len(active) == 0:
+            return self._empty_fills()
+
+        symbol = self.symbol[active]
+        side = self.side[active]
+        limit = self.limit_price[active]
+        remaining = self.remaining[active]
+
+        # פקודות לימיט מתבצעות רק אם הנר נגע במחיר הלימיט
+        is_limit = self.order_type[active] == LIMIT
+        marketable = ~is_limit | np.where(side == BUY, low[symbol] <= limit, high[symbol] >= limit)
+
+        # נזילות משותפת לכל סמל, מחולקת לפי סדר הגעה (FIFO)
+        order = np.lexsort((active, symbol))
+        sorted_symbol = symbol[order]
+        first = np.searchsorted(sorted_symbol, sorted_symbol, side='left')
+        demand = np.where(marketable, remaining, 0.0)
+        before = self._fifo_before(demand, order, first)
+
+        available = self.max_participation * volume[symbol]
+        filled = np.floor(np.clip(available - before, 0.0, demand))
+        fill_price = self._fill_price(filled, symbol, side, is_limit, limit, price, volume)
+
+        # חיתוך לפי החשבון: קניות לפי סדר ההגעה עד שהמזומן נגמר, מכירות עד המניות המוחזקות
+        rejected = np.zeros(len(active), dtype=bool)
+        if cash is not None:
+            unit_cost = fill_price * (1 + fee)
+            cost = np.where(side == BUY, filled * unit_cost, 0.0)
+            budget = np.atleast_1d(np.asarray(cash, dtype=np.float64))[symbol] - self._fifo_before(cost, order, first)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                funded = np.clip(np.floor(budget / unit_cost), 0.0, filled)
+            rejected |= (side == BUY) & (funded < filled)
+            filled = np.where(side == BUY, funded, filled)
+        if holdings is not None:
+            sold = np.where(side == SELL, filled, 0.0)
+            held = np.atleast_1d(np.asarray(holdings, dtype=np.float64))[symbol] - self._fifo_before(sold, order, first)
+            covered = np.clip(held, 0.0, filled)
+            rejected |= (side == SELL) & (covered < filled)
+            filled = np.where(side == SELL, covered, filled)
+        if rejected.any():
+            # כמות קטנה יותר - החלקה קטנה יותר, כך שהמחיר רק משתפר והעלות נשארת בתקציב
+            fill_price = self._fill_price(filled, symbol, side, is_limit, limit, price, volume)
+
+        self.remaining[active] = np.where(rejected, 0.0, remaining - filled)
+        done = filled > 0
+        if not done.any():
+            return self._empty_fills()
+
+        fills = {
+            'order_id': self.order_id[active][done],
+            'symbol': symbol[done],
+            'side': side[done],
+            'quantity': filled[done],
+            'price': fill_price[done],
+        }
+
+        # דחיסה כאשר רוב הספר כבר מולא
+        if (self.remaining[:self.n_orders] > 0).sum() * 2 < self.n_orders:
+            self._compact()
+
+        return fills
+
+    @staticmethod
+    def _fifo_before(values, order, first):
+        """
+        סכום הערכים של הפקודות הקודמות באותו סמל (לפי סדר ההגעה), לכל פקודה
+        """
+        cumulative = np.cumsum(values[order])
+        before_sorted = cumulative - values[order] - (cumulative[first] - values[order][first])
+        before = np.empty_like(before_sorted)
+        before[order] = before_sorted
+        return before
+
+    def _fill_price(self, filled, symbol, side, is_limit, limit, price, volume):
+        """
+        מחיר הביצוע: החלקה לפי שיעור ההשתתפות בנפח, ולימיט לא מתבצע במחיר גרוע מהלימיט
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            participation = np.where(volume[symbol] > 0, filled / volume[symbol], 0.0)
+        slippage = self.half_spread + self.impact_coefficient * participation ** self.impact_exponent
+        fill_price = price[symbol] * (1 + side * slippage)
+        fill_price = np.where(is_limit & (side == BUY), np.minimum(fill_price, limit), fill_price)
+        return np.where(is_limit & (side == SELL), np.maximum(fill_price, limit), fill_price)
+
+    def _empty_fills(self):
+        return {
+            'order_id': np.zeros(0, dtype=np.int64),
+            'symbol': np.zeros(0, dtype=np.int32),
+            'side': np.zeros(0, dtype=np.int8),
+            'quantity': np.zeros(0),
+            'price': np.zeros(0),
+        }
+
+
+class SimulatedFillModel:
+    """
+    מודל מילוי לסביבת המסחר שמבוסס על ExecutionSimulator
+    פעולת קנייה/מכירה הופכת לפקודה, ויתרה שלא בוצעה נשארת ממתינה לנרות הבאים
+    """
+
+    def __init__(self, simulator=None, order_type=MARKET, limit_offset=0.0, buy_fraction=0.9):
+        self.simulator = simulator or ExecutionSimulator(n_symbols=1)
+        self.order_type = order_type
+
+        # מרחק מחיר הלימיט ממחיר הייחוס (חלק יחסי; קנייה מתחת, מכירה מעל)
+        self.limit_offset = limit_offset
+
+        # חלק המזומן שמוקצה לקנייה, כמו ב-90% של מודל ברירת המחדל
+        self.buy_fraction = buy_fraction
+
+    def reset(self, env):
+        """
+        ריקון ספר הפקודות ושמירת מערכי הנרות של הסביבה
+        """
+        self.simulator.reset()
+        self._high = env.df['high'].to_numpy(dtype=np.float64)
+        self._low = env.df['low'].to_numpy(dtype=np.float64)
+        self._volume = env.df['volume'].to_numpy(dtype=np.float64)
+
+    def on_step(self, env, action, price):
+        """
+        תרגום הפעולה לפקודה וביצוע מול הנר הנוכחי. מחזיר (כיוון, כמות, מחיר) לכל מילוי
+        """
+        simulator = self.simulator
+
+        if action == 1:  # קנייה
+            simulator.cancel(side=SELL)
+            budget = env.balance * self.buy_fraction
+            quantity = int(budget / (price * (1 + env.transaction_fee_percent)))
+            quantity -= int(simulator.pending_quantity(0, BUY))
+            if quantity > 0:
+                simulator.submit(0, BUY, quantity, self.order_type, self._limit(BUY, price))
+
+        elif action == 2:  # מכירה
+            simulator.cancel(side=BUY)
+            quantity = env.shares_held - int(simulator.pending_quantity(0, SELL))
+            if quantity > 0:
+                simulator.submit(0, SELL, quantity, self.order_type, self._limit(SELL, price))
+
+        step = env.current_step
+        fills = simulator.process_bar(price, self._high[step], self._low[step], self._volume[step],
+                                      cash=env.balance, holdings=env.shares_held, fee=env.transaction_fee_percent)
+        return list(zip(fills['side'].tolist(), fills['quantity'].tolist(), fills['price'].tolist()))
+
+    def _limit(self, side, price):
+        if self.order_type != LIMIT:
+            return np.nan
+        return price * (1 - side * self.limit_offset)
+
+
+# --- Main Execution --- #
+if __name__ == '__main__':
+    import time
+
+    n_bars, n_symbols = 1258 * 4, 500
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (n_bars, n_symbols)), axis=0))
+    high = close * 1.01
+    low = close * 0.99
+    volume = np.round(np.exp(rng.normal(13, 0.5, (n_bars, n_symbols))))
+
+    simulator = ExecutionSimulator(n_symbols=n_symbols)
+    start = time.perf_counter()
+    n_fills = 0
+    for t in range(n_bars):
+        # כמה פקודות חדשות בכל נר, חלקן גדולות מספיק למילוי חלקי
+        for s in rng.integers(0, n_symbols, size=20):
+            order_type = LIMIT if rng.random() < 0.3 else MARKET
+            simulator.submit(s, rng.choice([BUY, SELL]), rng.integers(1, 200000), order_type,
+                             close[t, s] * (1 + rng.normal(0, 0.01)))
+        n_fills += len(simulator.process_bar(close[t], high[t], low[t], volume[t])['quantity'])
+    elapsed = time.perf_counter() - start
+    print(f"{n_bars} bars x {n_symbols} symbols: {n_fills} fills in {elapsed:.2f}s")
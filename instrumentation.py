@@ -0,0 +1,143 @@
+import json
+import time
+from array import array
+import numpy as np
+
+
+class StepProfiler:
+    """
+    מדידת זמנים אופציונלית לשלבים החמים של הסביבה והסוכן
+    כאשר הפרופיילר לא מחובר, הקוד המקורי רץ ללא שינוי וללא תקורה
+    """
+
+    # שלבים שנמדדים: (שם האובייקט, שם המתודה)
+    PHASES = [
+        ('env', '_get_observation'),
+        ('env', '_normalize_frame'),
+        ('env', 'step'),
+        ('agent', '_get_state_key'),
+        ('agent', 'update_q_table'),
+    ]
+
+    def __init__(self, output_path=None):
+        self.output_path = output_path
+
+        # משך כל קריאה (כולל קריאות פנימיות) ומשך עצמי (ללא שלבים מקוננים)
+        self._total = {}
+        self._self = {}
+
+        # מחסנית זמני הילדים לחישוב זמן עצמי של שלבים מקוננים
+        self._child_time = []
+
+        self._episode_steps = array('q')
+        self._episode_seconds = array('d')
+
+    def attach(self, env=None, agent=None):
+        """
+        עוטף את מתודות השלבים במופעים הנתונים במדידת זמן
+        """
+        targets = {'env': env, 'agent': agent}
+        for owner, method_name in self.PHASES:
+            target = targets[owner]
+            if target is None or not hasattr(target, method_name):
+                continue
+            setattr(target, method_name, self._wrap(getattr(target, method_name), method_name))
+
+    def _wrap(self, method, phase):
+        total = self._total.setdefault(phase, array('d'))
+        self_time = self._self.setdefault(phase, array('d'))
+        child_time = self._child_time
+        clock = time.perf_counter
+
+        def timed(*args, **kwargs):
+            child_time.append(0.0)
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                nested = child_time.pop()
+                total.append(elapsed)
+                self_time.append(elapsed - nested)
+                if child_time:
+                    child_time[-1] += elapsed
+
+        timed.__wrapped__ = method
+        return timed
+
+    def record_episode(self, steps, seconds):
+        """
+        רישום תפוקה ברמת האפיזודה
+        """
+        self._episode_steps.append(int(steps))
+        self._episode_seconds.append(float(seconds))
+
+    def reset(self):
+        for samples in list(self._total.values()) + list(self._self.values()):
+            del samples[:]
+        del self._episode_steps[:]
+        del self._episode_seconds[:]
+
+    def summary(self):
+        """
+        מחזיר מילון עם ספירות, זמנים מצטברים ואחוזונים לכל שלב
+        """
+        phases = {}
+        for phase, samples in self._total.items():
+            if not samples:
+                continue
+            values = np.frombuffer(samples, dtype=np.float64)
+            self_values = np.frombuffer(self._self[phase], dtype=np.float64)
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            phases[phase] = {
+                'count': int(len(values)),
+                'total_seconds': float(values.sum()),
+                'self_seconds': float(self_values.sum()),
+                'mean_us': float(values.mean() * 1e6),
+                'p50_us': float(p50 * 1e6),
+                'p90_us': float(p90 * 1e6),
+                'p99_us': float(p99 * 1e6),
+                'max_us': float(values.max() * 1e6),
+            }
+
+        steps = int(sum(self._episode_steps))
+        seconds = float(sum(self._episode_seconds))
+        episodes = {
+            'count': len(self._episode_steps),
+            'steps': steps,
+            'seconds': seconds,
+            'steps_per_second': steps / seconds if seconds > 0 else 0.0,
+        }
+        return {'phases': phases, 'episodes': episodes}
+
+    def format_table(self, summary=None):
+        """
+        טבלת סיכום טקסטואלית
+        """
+        summary = summary or self.summary()
+        lines = [f"{'phase':<20}{'count':>10}{'total s':>10}{'self s':>10}"
+                 f"{'mean us':>10}{'p50 us':>10}{'p90 us':>10}{'p99 us':>10}"]
+        for phase, stats in sorted(summary['phases'].items(), key=lambda item: -item[1]['total_seconds']):
+            lines.append(f"{phase:<20}{stats['count']:>10}{stats['total_seconds']:>10.3f}"
+                         f"{stats['self_seconds']:>10.3f}{stats['mean_us']:>10.1f}"
+                         f"{stats['p50_us']:>10.1f}{stats['p90_us']:>10.1f}{stats['p99_us']:>10.1f}")
+        episodes = summary['episodes']
+        lines.append(f"episodes: {episodes['count']}, steps: {episodes['steps']}, "
+                     f"{episodes['steps_per_second']:.1f} steps/s")
+        return '\n'.join(lines)
+
+    def report(self, label):
+        """
+        מדפיס טבלת סיכום ושומר JSON (אם הוגדר נתיב) בסוף train() או test()
+        """
+        summary = self.summary()
+        summary['label'] = label
+        print(f"\n--- Profile: {label} ---")
+        print(self.format_table(summary))
+
+        if self.output_path:
+            path = self.output_path.format(label=label)
+            with open(path, 'w') as f:
+                json.dump(summary, f, indent=2)
+            print(f"Profile saved to {path}")
+        return summary
@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+
+# Every numeric column of a processed frame is stored and loaded as float32;
+# the index is a datetime64[ns] (int64) timestamp.
+FLOAT_DTYPE = np.float32
+
+
+def load_processed_frame(price_file, columns=None):
+    """
+    Loads a processed price CSV with float32 columns and a datetime index.
+    Parsing straight into float32 avoids materializing a float64 copy first.
+    """
+    import pandas as pd
+
+    header = pd.read_csv(price_file, nrows=0).columns
+    index_col = header[0]
+    names = [col for col in header[1:] if columns is None or col in columns]
+    df = pd.read_csv(price_file, usecols=[index_col] + names, index_col=0,
+                     dtype={col: FLOAT_DTYPE for col in names})
+    df.index = pd.to_datetime(df.index)
+    df.index.name = df.index.name or 'timestamp'
+    return df
+
+
+def memory_footprint(df):
+    """Bytes used by the frame: total, index, and per dtype."""
+    by_dtype = {}
+    for col in df.columns:
+        dtype = str(df[col].dtype)
+        by_dtype[dtype] = by_dtype.get(dtype, 0) + int(df[col].memory_usage(index=False, deep=True))
+    index_bytes = int(df.index.memory_usage(deep=True))
+    return {'rows': len(df), 'columns': df.shape[1], 'index_bytes': index_bytes,
+            'by_dtype': by_dtype, 'total_bytes': index_bytes + sum(by_dtype.values())}
+
+
+def format_footprint(symbol, footprint):
+    dtypes = ', '.join(f"{dtype}: {n / 1024 ** 2:.2f} MB" for dtype, n in footprint['by_dtype'].items())
+    return (f"{symbol}: {footprint['rows']} rows x {footprint['columns']} columns, "
+            f"{footprint['total_bytes'] / 1024 ** 2:.2f} MB ({dtypes})")
+
+
+def memory_report(price_files):
+    """
+    Loads each {symbol: price_file} with the float32 path and prints its
+    footprint next to the float64 equivalent. Returns {symbol: footprint}.
+    """
+    report = {}
+    for symbol, price_file in price_files.items():
+        if not os.path.exists(price_file):
+            print(f"Warning: Processed file not found at {price_file}")
+            continue
+        footprint = memory_footprint(load_processed_frame(price_file))
+        float64_bytes = footprint['index_bytes'] + 8 * footprint['rows'] * footprint['columns']
+        footprint['float64_bytes'] = float64_bytes
+        report[symbol] = footprint
+        print(f"{format_footprint(symbol, footprint)} vs {float64_bytes / 1024 ** 2:.2f} MB as float64")
+
+    total = sum(f['total_bytes'] for f in report.values())
+    total64 = sum(f['float64_bytes'] for f in report.values())
+    if report:
+        print(f"Universe: {total / 1024 ** 2:.2f} MB (float64: {total64 / 1024 ** 2:.2f} MB)")
+    return report
+
+
+if __name__ == '__main__':
+    import sys
+
+    data_dir = os.path.join('rl_trading_system', 'data', 'processed')
+    selected = sys.argv[1:] or ['AAPL', 'GOOG', 'NVDA', '^GSPC']
+    memory_report({symbol: os.path.join(data_dir, f"{symbol}_processed_prices.csv") for symbol in selected})
@@ -0,0 +1,284 @@
+import os
+import sys
+import time
+import numpy as np
+
+from trading_env import TradingEnvironment, INDICATOR_PREFIXES
+from evaluation import evaluate
+
+# שלב התכונות (preprocess_price_data) נמצא ב-rl_trading_system/src
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rl_trading_system', 'src'))
+
+
+class ReplayBuffer:
+    """
+    זיכרון מעברים אחרונים כמזהי מצב, במערכים מעגליים בגודל קבוע
+    כשהזיכרון מלא המעברים הישנים ביותר נדרסים - נשארים רק המעברים האחרונים
+    """
+
+    def __init__(self, capacity=50000):
+        self.capacity = capacity
+        self.state_keys = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity)
+        self.next_state_keys = np.zeros(capacity, dtype=np.int64)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.size = 0
+        self._position = 0
+
+    def add(self, state_keys, actions, rewards, next_state_keys, dones):
+        n = len(state_keys)
+        idx = (self._position + np.arange(n)) % self.capacity
+        self.state_keys[idx] = state_keys
+        self.actions[idx] = actions
+        self.rewards[idx] = rewards
+        self.next_state_keys[idx] = next_state_keys
+        self.dones[idx] = dones
+        self._position = (self._position + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+
+    def sample(self, batch_size, rng):
+        idx = rng.integers(0, self.size, size=batch_size)
+        return {'state_keys': self.state_keys[idx], 'actions': self.actions[idx], 'rewards': self.rewards[idx],
+                'next_state_keys': self.next_state_keys[idx], 'dones': self.dones[idx]}
+
+
+class OnlineLearner:
+    """
+    מצב למידה מקוונת: עדכון סוכן מאומן על נרות חדשים בלי אימון מחדש על כל ההיסטוריה
+    כל עדכון: הוספת הנרות עם תכונות מחושבות רק לזנב הסדרה, אפיזודות קצרות על
+    recent_bars הנרות שלפני holdout_bars הנרות האחרונים (אקספלורציה נמוכה), והרצה חוזרת
+    של מעברים אחרונים מהזיכרון.
+    אמצעי הגנה: קצב למידה חסום ב-max_learning_rate, חסימת שגיאת ה-TD, ונקודת שחזור -
+    אם התשואה החמדנית על holdout_bars הנרות החדשים ביותר (שלא נכנסו לאימון) ירדה ביותר
+    מ-max_degradation נקודות אחוז (או שהטבלה הכילה ערך לא סופי), הטבלה חוזרת למצב שלפני העדכון
+    תכונות cross_ מתעדכנות דרך cross_asset (CrossAssetStream של היקום) בצעד אחד לכל נר;
+    symbol הוא שם הסדרה ביקום, ונרות שאר הסימבולים מגיעים ל-update ב-universe_bars
+    """
+
+    def __init__(self, agent, df, indicator_set=None, lookback=300, recent_bars=252, holdout_bars=21,
+                 rollout_episodes=2,
+                 exploration_rate=0.05, replay_capacity=50000, replay_batches=20, batch_size=256,
+                 learning_rate=None, max_learning_rate=0.01, td_clip=1.0, max_degradation=1.0,
+                 reward_fn='cumulative', symbol=None, cross_asset=None, checkpoint_path=None, seed=0):
+        self.agent = agent
+        self.df = df
+        if cross_asset is not None and symbol not in cross_asset.symbols:
+            raise ValueError(f"Symbol {symbol} is not in the cross-asset universe {cross_asset.symbols}")
+        self.symbol = symbol
+        self.cross_asset = cross_asset
+        self.window_size = agent.env.window_size
+        self.interval = agent.env.interval
+        self.reward_fn = reward_fn
+
+        # סט האינדיקטורים של הקובץ המעובד: 'core' אם כל העמודות שייכות למנוע הווקטורי
+        if indicator_set is None:
+            from batch_indicators import INDICATOR_COLUMNS
+            extra = [col for col in df.columns if col.startswith(INDICATOR_PREFIXES)
+                     and not col.startswith('cross_') and col not in INDICATOR_COLUMNS]
+            indicator_set = 'all' if extra else 'core'
+        self.indicator_set = indicator_set
+        self.lookback = lookback
+
+        self.recent_bars = recent_bars
+        if holdout_bars < 1:
+            raise ValueError("holdout_bars must be at least 1 - the rollback gate needs bars outside the update")
+        self.holdout_bars = holdout_bars
+        self.rollout_episodes = rollout_episodes
+        self.exploration_rate = exploration_rate
+        self.replay = ReplayBuffer(replay_capacity)
+        self.replay_batches = replay_batches
+        self.batch_size = batch_size
+
+        # קצב הלמידה המקוון - לעולם לא מעל max_learning_rate
+        self.learning_rate = min(agent.learning_rate if learning_rate is None else learning_rate,
+                                 max_learning_rate)
+        self.td_clip = td_clip
+        self.max_degradation = max_degradation
+        self.checkpoint_path = checkpoint_path
+        self.rng = np.random.default_rng(seed)
+        self._checkpoint = None
+
+    def _recent_env(self):
+        """
+        סביבת האימון: recent_bars הנרות שלפני הזנב המוחזק (ועוד החלון שלפניהם)
+        """
+        end = len(self.df) - self.holdout_bars
+        segment = self.df.iloc[max(end - (self.recent_bars + self.window_size + 1), 0):end]
+        return TradingEnvironment(segment, window_size=self.window_size, interval=self.interval,
+                                  reward_fn=self.reward_fn)
+
+    def _holdout_env(self):
+        """
+        סביבת הבדיקה: holdout_bars הנרות החדשים ביותר (ועוד החלון שלפניהם, לתצפית בלבד)
+        """
+        segment = self.df.iloc[-(self.holdout_bars + self.window_size + 1):]
+        return TradingEnvironment(segment, window_size=self.window_size, interval=self.interval,
+                                  reward_fn=self.reward_fn)
+
+    def _greedy_return(self, env):
+        results = evaluate(self.agent, {'recent': env.df}, window_size=self.window_size, random_seeds=0,
+                           interval=self.interval)
+        return float(results.loc[results['strategy'] == 'agent', 'total_return_pct'].iloc[0])
+
+    def _rollout(self, env):
+        """
+        אפיזודות על התקופה האחרונה עם אקספלורציה נמוכה; המעברים נכנסים לזיכרון
+        """
+        agent = self.agent
+        n = 0
+        for _ in range(self.rollout_episodes):
+            state, _ = env.reset()
+            state_key = agent._get_state_key(state)
+            keys, actions, rewards, next_keys, dones = [], [], [], [], []
+            done = False
+            while not done:
+                if self.rng.random() < self.exploration_rate:
+                    action = int(self.rng.integers(env.action_space.n))
+                else:
+                    action = int(np.argmax(agent.q_table[state_key]))
+                state, reward, done, _, _ = env.step(action)
+                next_key = agent._get_state_key(state)
+                keys.append(state_key)
+                actions.append(action)
+                rewards.append(reward)
+                next_keys.append(next_key)
+                dones.append(done)
+                state_key = next_key
+            self.replay.add(np.array(keys), np.array(actions), np.array(rewards), np.array(next_keys),
+                            np.array(dones))
+            n += len(keys)
+        return n
+
+    def _with_cross_features(self, new_bars, universe_bars):
+        """
+        הוספת עמודות cross_ לנרות החדשים: צעד אחד של cross_asset לכל חותמת זמן,
+        עם המחירים של הסדרה ושל שאר היקום באותה חותמת
+        """
+        new_bars = new_bars.rename(columns=str.lower)
+        new_bars = new_bars[new_bars.index > self.df.index[-1]].sort_index()
+        price_column = self.cross_asset.price_column
+        if price_column not in new_bars.columns:
+            price_column = 'close'
+        universe_bars = {symbol: bars.rename(columns=str.lower) for symbol, bars in (universe_bars or {}).items()}
+
+        rows = []
+        for timestamp, price in new_bars[price_column].items():
+            prices = {self.symbol: price}
+            for symbol, bars in universe_bars.items():
+                if timestamp in bars.index:
+                    column = price_column if price_column in bars.columns else 'close'
+                    prices[symbol] = bars.at[timestamp, column]
+            rows.append(self.cross_asset.update(timestamp, prices)[self.symbol])
+        for col in (rows[0] if rows else {}):
+            new_bars[col] = [row[col] for row in rows]
+        return new_bars
+
+    def checkpoint(self):
+        """
+        שמירת נקודת שחזור (בזיכרון, ובקובץ אם הוגדר checkpoint_path)
+        """
+        self._checkpoint = (self.agent.q_table.copy(), self.agent.exploration_rate)
+        if self.checkpoint_path:
+            self.agent.save(self.checkpoint_path)
+
+    def rollback(self):
+        """
+        חזרה לנקודת השחזור האחרונה (מהזיכרון, או מהקובץ אחרי הפעלה מחדש)
+        """
+        if self._checkpoint is not None:
+            q_table, exploration_rate = self._checkpoint
+            self.agent.q_table = q_table.copy()
+            self.agent.exploration_rate = exploration_rate
+        elif self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            self.agent.load(self.checkpoint_path)
+        else:
+            raise ValueError("No checkpoint to roll back to")
+
+    def update(self, new_bars, universe_bars=None):
+        """
+        עדכון על נרות חדשים (DataFrame של OHLCV עם אינדקס זמן); נרות שכבר קיימים מדולגים
+        universe_bars: {סימבול: DataFrame} עם נרות שאר היקום באותן חותמות זמן (כשיש cross_asset)
+        מחזיר מילון עם סיכום העדכון
+        """
+        from preprocess_price_data import extend_processed_frame
+
+        start_time = time.perf_counter()
+        n_before = len(self.df)
+        if self.cross_asset is not None:
+            new_bars = self._with_cross_features(new_bars, universe_bars)
+        self.df = extend_processed_frame(self.df, new_bars, self.indicator_set, self.lookback)
+        report = {'new_bars': len(self.df) - n_before, 'transitions': 0, 'replayed': 0,
+                  'return_before': np.nan, 'return_after': np.nan, 'rolled_back': False}
+        if report['new_bars'] == 0:
+            report['seconds'] = time.perf_counter() - start_time
+            return report
+
+        env = self._recent_env()
+        holdout = self._holdout_env()
+        self.checkpoint()
+        report['return_before'] = self._greedy_return(holdout)
+
+        # שיעור האקספלורציה של הסוכן לא דועך בעדכון המקוון
+        exploration_rate = self.agent.exploration_rate
+        report['transitions'] = self._rollout(env)
+        for _ in range(self.replay_batches):
+            self.agent.update_q_table_keys(**self.replay.sample(self.batch_size, self.rng),
+                                           learning_rate=self.learning_rate, td_clip=self.td_clip)
+            report['replayed'] += self.batch_size
+        self.agent.exploration_rate = exploration_rate
+
+        report['return_after'] = self._greedy_return(holdout)
+        if not np.isfinite(self.agent.q_table).all() or \
+                report['return_after'] < report['return_before'] - self.max_degradation:
+            self.rollback()
+            report['rolled_back'] = True
+        report['seconds'] = time.perf_counter() - start_time
+        return report
+
+
+# --- Main Execution --- #
+if __name__ == '__main__':
+    from market_data import load_processed_frame
+    from rl_agent import RLTradingAgent
+    from cross_asset_features import CrossAssetStream, add_cross_asset_features
+
+    symbol = 'AAPL'
+    n_new = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    data_dir = os.path.join('rl_trading_system', 'data', 'processed')
+    results_dir = os.path.join('rl_trading_system', 'results')
+    universe = ['AAPL', 'GOOG', 'NVDA', '^GSPC']
+    frames = add_cross_asset_features({s: load_processed_frame(os.path.join(data_dir, f'{s}_processed_prices.csv'))
+                                       for s in universe})
+    full = frames[symbol]
+
+    # סימולציה: הסוכן מכיר את ההיסטוריה בלי n_new הימים האחרונים, שמגיעים אחד ביום
+    history = full.iloc[:-n_new]
+    cutoff = history.index[-1]
+    stream = CrossAssetStream({s: df[df.index <= cutoff] for s, df in frames.items()})
+    agent = RLTradingAgent(TradingEnvironment(history), exploration_rate=0.0)
+    model_file = os.path.join(results_dir, f'{symbol}_q_table.npz')
+    if os.path.exists(model_file):
+        agent.load(model_file)
+    else:
+        print(f"טבלת Q לא נמצאה ב-{model_file}, מאמן 5 אפיזודות על ההיסטוריה")
+        agent.exploration_rate = 1.0
+        agent.train(episodes=5, render_interval=5)
+
+    learner = OnlineLearner(agent, history, symbol=symbol, cross_asset=stream)
+    raw_columns = ['open', 'high', 'low', 'close', 'volume', 'adj_close']
+    times, kept = [], 0
+    for i in range(n_new):
+        day = full[raw_columns].iloc[len(history) + i:len(history) + i + 1]
+        others = {s: df.loc[df.index.isin(day.index), raw_columns] for s, df in frames.items() if s != symbol}
+        report = learner.update(day, others)
+        times.append(report['seconds'])
+        kept += not report['rolled_back']
+        print(f"{day.index[0].date()}: {report['transitions']} מעברים, {report['replayed']} מהזיכרון, "
+              f"תשואה {report['return_before']:.2f}% -> {report['return_after']:.2f}%"
+              f"{' (שוחזר)' if report['rolled_back'] else ''}, {report['seconds']:.2f} שניות")
+
+    error = (learner.df.iloc[-n_new:] - full.iloc[-n_new:]).abs().max() / full.abs().max().replace(0, 1)
+    cross_error = error[[col for col in full.columns if col.startswith('cross_')]].max()
+    print(f"\n{kept}/{n_new} עדכונים נשמרו; זמן עדכון ממוצע: {np.mean(times):.2f} שניות; "
+          f"סטייה יחסית מקסימלית של התכונות מחישוב מלא: {error.max():.2e} (cross_: {cross_error:.2e})")
@@ -0,0 +1,386 @@
+import copy
+import os
+import time
+import asyncio
+from array import array
+from collections import namedtuple
+
+import numpy as np
+
+from trading_env import PRICE_FEATURES, INDICATOR_PREFIXES, PORTFOLIO_FEATURES
+from execution_simulator import BUY, SELL
+from performance_metrics import StreamingMetrics
+from resampler import periods_per_year
+
+# אצוות נרות לחותמת זמן אחת: מזהי הסמלים שהתעדכנו, שורת תכונות השוק של כל אחד,
+# מחיר הייחוס (adj_close), high/low/volume, והזמן שבו הנר היה אמור להגיע
+BarBatch = namedtuple('BarBatch', ['timestamp', 'symbols', 'features', 'price', 'high', 'low',
+                                   'volume', 'scheduled_at'])
+
+
+class ReplayFeed:
+    """
+    מקור נרות שמשחזר קבצי נתונים היסטוריים כתחליף מקומי לפיד אמיתי
+    כל הסמלים ממוזגים מראש לציר זמן אחד, כך שכל אצווה היא פרוסה רציפה של מערכים.
+    bar_seconds: קצב ההשמעה (שניות לנר); 0 - מהר ככל האפשר
+    מקור אחר צריך לספק את אותו ממשק: symbols, feature_names ואיטרציה אסינכרונית של BarBatch
+    """
+
+    def __init__(self, frames, feature_names=None, bar_seconds=0.0):
+        self.symbols = list(frames)
+        self.bar_seconds = bar_seconds
+
+        # תכונות השוק: אותו סדר כמו בסביבה, רק עמודות שקיימות בכל הקבצים
+        if feature_names is None:
+            first = next(iter(frames.values())).columns
+            feature_names = PRICE_FEATURES + [col for col in first if col.startswith(INDICATOR_PREFIXES)]
+            feature_names = [f for f in feature_names if all(f in df.columns for df in frames.values())]
+        self.feature_names = list(feature_names)
+
+        timestamps, symbol_ids, features, prices, highs, lows, volumes = [], [], [], [], [], [], []
+        for i, df in enumerate(frames.values()):
+            timestamps.append(df.index.values.astype('datetime64[ns]').view(np.int64))
+            symbol_ids.append(np.full(len(df), i, dtype=np.int32))
+            features.append(df[self.feature_names].to_numpy(dtype=np.float32))
+            prices.append(df['adj_close'].to_numpy(dtype=np.float64))
+            highs.append(df['high'].to_numpy(dtype=np.float64))
+            lows.append(df['low'].to_numpy(dtype=np.float64))
+            volumes.append(df['volume'].to_numpy(dtype=np.float64))
+
+        # מיון לפי (זמן, סמל) - כל חותמת זמן הופכת לטווח רציף
+        timestamps = np.concatenate(timestamps)
+        symbol_ids = np.concatenate(symbol_ids)
+        order = np.lexsort((symbol_ids, timestamps))
+        self._timestamps = timestamps[order]
+        self._symbol_ids = symbol_ids[order]
+        self._features = np.concatenate(features)[order]
+        self._prices = np.concatenate(prices)[order]
+        self._highs = np.concatenate(highs)[order]
+        self._lows = np.concatenate(lows)[order]
+        self._volumes = np.concatenate(volumes)[order]
+        self._bounds = np.r_[np.flatnonzero(np.r_[True, np.diff(self._timestamps) != 0]), len(order)]
+
+    @classmethod
+    def from_files(cls, paths, **kwargs):
+        """
+        טעינה ממילון {סמל: נתיב}; קבצי CSV מעובדים או קבצי JSON גולמיים (תאריך -> OHLCV)
+        לקבצים גולמיים מחושבים אינדיקטורי הליבה (batch_indicators) - אותם שמות עמודות
+        כמו בקבצים המעובדים, כך שהדיסקרטייזר של הסוכן מוצא את התכונות שלו
+        """
+        import pandas as pd
+        from market_data import load_processed_frame
+        from batch_indicators import compute_indicators
+
+        frames = {}
+        for symbol, path in paths.items():
+            if path.endswith('.json'):
+                df = pd.read_json(path, orient='index').rename(columns=str.lower)
+                df = df.rename(columns={'adj close': 'adj_close'}).sort_index()
+                if 'adj_close' not in df.columns:
+                    df['adj_close'] = df['close']
+                indicators = compute_indicators(df['high'].values, df['low'].values, df['close'].values,
+                                                df['volume'].values)
+                for col, values in indicators.items():
+                    df[col] = values[:, 0]
+                frames[symbol] = df.astype(np.float32)
+            else:
+                frames[symbol] = load_processed_frame(path)
+        return cls(frames, **kwargs)
+
+    def __len__(self):
+        return len(self._bounds) - 1
+
+    async def __aiter__(self):
+        clock = time.perf_counter
+        start = clock()
+        for i in range(len(self)):
+            scheduled_at = start + i * self.bar_seconds
+            delay = scheduled_at - clock()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif not self.bar_seconds:
+                scheduled_at = clock()
+            a, b = self._bounds[i], self._bounds[i + 1]
+            yield BarBatch(self._timestamps[a], self._symbol_ids[a:b], self._features[a:b],
+                           self._prices[a:b], self._highs[a:b], self._lows[a:b], self._volumes[a:b],
+                           scheduled_at)
+
+
+class PaperTradingRuntime:
+    """
+    מסחר נייר אסינכרוני: צורך נרות ממקור, מחליט עם טבלת ה-Q של הסוכן (חמדני),
+    מבצע מילויים ומנהל תיק נפרד לכל סמל - כל הסמלים בלולאת אירועים אחת.
+    מצב כל הסמלים נשמר במערכים (חלונות טבעתיים, מזומן, מניות) ומעודכן וקטורית לכל אצווה.
+    היישור כמו בסביבת המסחר: כשנר t מגיע, ההחלטה רואה את החלון שמסתיים בנר t-1
+    ומבוצעת במחיר הסגירה של נר t (או דרך ExecutionSimulator עם החלקה ומילוי חלקי)
+    """
+
+    def __init__(self, agent, feed, window_size=30, initial_balance=10000, transaction_fee_percent=0.001,
+                 simulator=None, interval='1d', queue_size=16, max_lag=None):
+        self.feed = feed
+        self.q_table = agent.q_table
+        self.window_size = window_size
+        self.initial_balance = initial_balance
+        self.transaction_fee_percent = transaction_fee_percent
+
+        # מודל מילוי אופציונלי (ExecutionSimulator עם n_symbols כמספר הסמלים)
+        self.simulator = simulator
+
+        # תור חסום בין המקור למקבל ההחלטות; max_lag (שניות) - אצווה שמאחרת יותר מזה
+        # מעדכנת את החלונות והשווי אבל מדלגת על ההחלטה, כך שהשהיה נשארת חסומה
+        self.queue_size = queue_size
+        self.max_lag = max_lag
+
+        self.symbols = list(feed.symbols)
+        self.market_features = list(feed.feature_names)
+        self.feature_names = self.market_features + PORTFOLIO_FEATURES
+        # עותק של הדיסקרטייזר - הקשירה לעמודות הפיד לא משנה את הסוכן המאומן
+        self.discretizer = copy.deepcopy(agent.discretizer).bind(self.feature_names)
+
+        n_symbols, n_market = len(self.symbols), len(self.market_features)
+        self._windows = np.zeros((n_symbols, window_size, n_market), dtype=np.float32)
+        self._bars_seen = np.zeros(n_symbols, dtype=np.int64)
+        self._price = np.zeros(n_symbols)
+        self.balance = np.full(n_symbols, float(initial_balance))
+        self.shares_held = np.zeros(n_symbols, dtype=np.int64)
+        self.current_value = self.balance.copy()
+        self.metrics = StreamingMetrics(n_envs=n_symbols, periods_per_year=periods_per_year(interval))
+
+        # מדדי השהיה לכל אצווה (שניות)
+        self._feed_lag = array('d')
+        self._queue_wait = array('d')
+        self._processing = array('d')
+        self._latency = array('d')
+        self._batch_symbols = array('q')
+        self.stale_batches = 0
+        self.n_trades = 0
+
+    # --- לולאת האירועים --- #
+
+    async def _produce(self, queue):
+        async for batch in self.feed:
+            await queue.put((batch, time.perf_counter()))
+        await queue.put(None)
+
+    async def _consume(self, queue):
+        clock = time.perf_counter
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            batch, emitted_at = item
+            started = clock()
+            stale = self.max_lag is not None and started - batch.scheduled_at > self.max_lag
+            self.on_bar(batch, decide=not stale)
+            finished = clock()
+
+            self.stale_batches += stale
+            self._feed_lag.append(emitted_at - batch.scheduled_at)
+            self._queue_wait.append(started - emitted_at)
+            self._processing.append(finished - started)
+            self._latency.append(finished - batch.scheduled_at)
+            self._batch_symbols.append(len(batch.symbols))
+
+            # מסירת השליטה ללולאה כדי שהמקור לא יורעב
+            await asyncio.sleep(0)
+
+    async def run(self):
+        """
+        הרצת המקור והמקבל במקביל עד סוף הפיד. מחזיר את דוח ההשהיה
+        """
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        started = time.perf_counter()
+        await asyncio.gather(self._produce(queue), self._consume(queue))
+        self.wall_seconds = time.perf_counter() - started
+        return self.report()
+
+    # --- עיבוד אצווה --- #
+
+    def on_bar(self, batch, decide=True):
+        """
+        עדכון החלונות והשווי לסמלים שהתעדכנו, החלטה וביצוע
+        """
+        ids = batch.symbols
+        window = self.window_size
+        self._price[ids] = batch.price
+        shares_before = self.shares_held[ids].copy()
+
+        # ההחלטה לפני שהנר נכנס לחלון: תצפית עד t-1, ביצוע במחיר של t
+        if decide:
+            ready = ids[self._bars_seen[ids] >= window]
+            if len(ready):
+                actions = np.argmax(self.q_table[self.discretizer.transform(self._decision_rows(ready))], axis=1)
+                self._execute(ready, actions, batch)
+
+        # כתיבת הנר לחלון הטבעתי של כל סמל
+        self._windows[ids, self._bars_seen[ids] % window] = batch.features
+        self._bars_seen[ids] += 1
+
+        # שווי נוכחי ומדדים - רק לסמלים שקיבלו נר; המדדים מתחילים בנר שלפני ההחלטה
+        # הראשונה (כמו reset בסביבה), כך שנרות החימום לא נספרים כתשואות אפס
+        price = self._price[ids]
+        self.current_value[ids] = self.balance[ids] + self.shares_held[ids] * price
+        mask = np.zeros(len(self.symbols), dtype=bool)
+        mask[ids[self._bars_seen[ids] >= window]] = True
+        position_value = np.zeros(len(self.symbols))
+        traded_notional = np.zeros(len(self.symbols))
+        position_value[ids] = self.shares_held[ids] * price
+        traded_notional[ids] = np.abs(self.shares_held[ids] - shares_before) * price
+        self.metrics.update(self.current_value, position_value, traded_notional, mask=mask)
+
+    def _decision_rows(self, ids):
+        """
+        השורה האחרונה של התצפית (k, 1, features), מחושבת רק לעמודות שהדיסקרטייזר קורא,
+        כמו בסביבה: שוק - הנר האחרון בחלון אחרי נרמול; תיק - מזומן, אחזקות במחיר הנוכחי
+        ושווי התיק מהנר הקודם
+        """
+        n_market = len(self.market_features)
+        columns = self.discretizer.feature_indices
+        market_columns = columns[columns < n_market]
+
+        rows = np.zeros((len(ids), 1, len(self.feature_names)), dtype=np.float32)
+        if len(market_columns):
+            frames = self._windows[ids[:, None, None], np.arange(self.window_size)[None, :, None],
+                                   market_columns[None, None, :]]
+            last = self._windows[ids[:, None], ((self._bars_seen[ids] - 1) % self.window_size)[:, None],
+                                 market_columns[None, :]]
+            min_value = np.nanmin(frames, axis=1)
+            value_range = np.nanmax(frames, axis=1) - min_value
+            constant = value_range == 0
+            rows[:, 0, market_columns] = np.where(constant, 0, (last - min_value) / np.where(constant, 1, value_range))
+
+        price = self._price[ids]
+        rows[:, 0, n_market] = self.balance[ids] / self.initial_balance
+        rows[:, 0, n_market + 1] = self.shares_held[ids] * price / self.initial_balance
+        rows[:, 0, n_market + 2] = self.current_value[ids] / self.initial_balance
+        return rows
+
+    def _execute(self, ids, actions, batch):
+        """
+        ביצוע הפעולות: מילוי מיידי במחיר הסגירה, או פקודות דרך הסימולטור
+        """
+        fee = self.transaction_fee_percent
+        price = self._price[ids]
+
+        if self.simulator is None:
+            # קנייה ב-90% מהמזומן ומכירת כל המניות, כמו בסביבת המסחר
+            buy = ids[(actions == 1)]
+            buy_qty = (self.balance[buy] * 0.9 / self._price[buy]).astype(np.int64)
+            self.balance[buy] -= buy_qty * self._price[buy] * (1 + fee)
+            self.shares_held[buy] += buy_qty
+
+            sell = ids[(actions == 2) & (self.shares_held[ids] > 0)]
+            self.balance[sell] += self.shares_held[sell] * self._price[sell] * (1 - fee)
+            self.n_trades += int((buy_qty > 0).sum()) + len(sell)
+            self.shares_held[sell] = 0
+            return
+
+        simulator = self.simulator
+        for symbol, action, p in zip(ids[actions != 0].tolist(), actions[actions != 0].tolist(),
+                                     price[actions != 0].tolist()):
+            if action == 1:
+                simulator.cancel(symbol=symbol, side=SELL)
+                quantity = int(self.balance[symbol] * 0.9 / (p * (1 + fee)))
+                quantity -= int(simulator.pending_quantity(symbol, BUY))
+                if quantity > 0:
+                    simulator.submit(symbol, BUY, quantity)
+            else:
+                simulator.cancel(symbol=symbol, side=BUY)
+                quantity = int(self.shares_held[symbol]) - int(simulator.pending_quantity(symbol, SELL))
+                if quantity > 0:
+                    simulator.submit(symbol, SELL, quantity)
+
+        # נזילות רק לסמלים שקיבלו נר באצווה הזו
+        n_symbols = len(self.symbols)
+        high, low, volume = np.zeros(n_symbols), np.zeros(n_symbols), np.zeros(n_symbols)
+        high[batch.symbols], low[batch.symbols], volume[batch.symbols] = batch.high, batch.low, batch.volume
+        fills = simulator.process_bar(self._price, high, low, volume, cash=self.balance, holdings=self.shares_held,
+                                      fee=fee)
+        for symbol, side, quantity, fill_price in zip(fills['symbol'].tolist(), fills['side'].tolist(),
+                                                      fills['quantity'].tolist(), fills['price'].tolist()):
+            self._apply_fill(symbol, side, int(quantity), fill_price)
+
+    def _apply_fill(self, symbol, side, quantity, price):
+        fee = self.transaction_fee_percent
+        if side > 0:
+            quantity = min(quantity, int(self.balance[symbol] / (price * (1 + fee))))
+            if quantity <= 0:
+                return
+            self.balance[symbol] -= quantity * price * (1 + fee)
+            self.shares_held[symbol] += quantity
+        else:
+            quantity = min(quantity, int(self.shares_held[symbol]))
+            if quantity <= 0:
+                return
+            self.balance[symbol] += quantity * price * (1 - fee)
+            self.shares_held[symbol] -= quantity
+        self.n_trades += 1
+
+    # --- דיווח --- #
+
+    def report(self):
+        """
+        סטטיסטיקת השהיה (אלפיות שנייה) ותפוקה
+        """
+        def percentiles(values):
+            values = np.frombuffer(values, dtype=np.float64) * 1000
+            if len(values) == 0:
+                return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            return {'p50': float(p50), 'p95': float(p95), 'p99': float(p99), 'max': float(values.max())}
+
+        wall = getattr(self, 'wall_seconds', 0.0)
+        updates = int(np.frombuffer(self._batch_symbols, dtype=np.int64).sum())
+        return {
+            'batches': len(self._latency),
+            'symbol_updates': updates,
+            'stale_batches': self.stale_batches,
+            'trades': self.n_trades,
+            'wall_seconds': wall,
+            'batches_per_second': len(self._latency) / wall if wall else 0.0,
+            'updates_per_second': updates / wall if wall else 0.0,
+            'feed_lag_ms': percentiles(self._feed_lag),
+            'queue_wait_ms': percentiles(self._queue_wait),
+            'processing_ms': percentiles(self._processing),
+            'latency_ms': percentiles(self._latency),
+        }
+
+    def format_report(self, report=None):
+        report = report or self.report()
+        lines = [f"{report['batches']} bars, {report['symbol_updates']} symbol updates in "
+                 f"{report['wall_seconds']:.2f}s ({report['updates_per_second']:.0f} updates/s), "
+                 f"{report['trades']} trades, {report['stale_batches']} stale bars"]
+        for name in ('feed_lag_ms', 'queue_wait_ms', 'processing_ms', 'latency_ms'):
+            stats = report[name]
+            lines.append(f"  {name:<14} p50 {stats['p50']:8.3f}  p95 {stats['p95']:8.3f}  "
+                         f"p99 {stats['p99']:8.3f}  max {stats['max']:8.3f}")
+        return '\n'.join(lines)
+
+
+# --- Main Execution --- #
+if __name__ == '__main__':
+    import sys
+    from market_data import load_processed_frame
+    from trading_env import TradingEnvironment
+    from rl_agent import RLTradingAgent
+
+    # שימוש: python paper_trading.py [copies] [bar_seconds]
+    # copies משכפל את היקום כדי לדמות אלפי סמלים
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    bar_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+
+    data_dir = os.path.join('rl_trading_system', 'data', 'processed')
+    model_file = os.path.join('rl_trading_system', 'results', 'AAPL_q_table.npz')
+    frames = {symbol: load_processed_frame(os.path.join(data_dir, f'{symbol}_processed_prices.csv'))
+              for symbol in ['AAPL', 'GOOG', 'NVDA', '^GSPC']}
+    frames = {f'{symbol}_{i}' if copies > 1 else symbol: df for i in range(copies) for symbol, df in frames.items()}
+
+    agent = RLTradingAgent(TradingEnvironment(next(iter(frames.values()))), exploration_rate=0.0)
+    if os.path.exists(model_file):
+        agent.load(model_file)
+    else:
+        print(f'טבלת Q לא נמצאה ב-{model_file}, מריץ עם טבלה ריקה')
+
+    runtime = PaperTradingRuntime(agent, ReplayFeed(frames, bar_seconds=bar_seconds))
+    asyncio.run(runtime.run())
+    print(runtime.format_report())
@@ -0,0 +1,145 @@
+import numpy as np
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+class StreamingMetrics:
+    """
+    מדדי ביצוע וסיכון מצטברים בעדכון O(1) לכל צעד
+    תשואה ממוצעת ושונות (Welford), שארפ, סורטינו, משיכה מקסימלית, מחזור וחשיפה.
+    עובד על סביבה בודדת (n_envs=None) או על מערך של סביבות וקטוריות
+    """
+
+    def __init__(self, n_envs=None, periods_per_year=TRADING_DAYS_PER_YEAR):
+        self.n_envs = n_envs
+        self.periods_per_year = periods_per_year
+        size = 1 if n_envs is None else n_envs
+
+        self.count = np.zeros(size, dtype=np.int64)
+        self.mean = np.zeros(size)
+        self.m2 = np.zeros(size)
+        self.downside_sq = np.zeros(size)
+        self.prev_value = np.full(size, np.nan)
+        self.peak = np.full(size, np.nan)
+        self.max_drawdown = np.zeros(size)
+        self.traded = np.zeros(size)
+        self.value_sum = np.zeros(size)
+        self.exposure_sum = np.zeros(size)
+        self.steps = np.zeros(size, dtype=np.int64)
+
+    def reset(self, mask=None):
+        """
+        איפוס כל הסביבות, או רק אלו שמסומנות ב-mask (סביבות שהתחילו אפיזודה חדשה)
+        """
+        idx = slice(None) if mask is None else np.asarray(mask, dtype=bool)
+        for name in ('count', 'mean', 'm2', 'downside_sq', 'max_drawdown',
+                     'traded', 'value_sum', 'exposure_sum', 'steps'):
+            getattr(self, name)[idx] = 0
+        self.prev_value[idx] = np.nan
+        self.peak[idx] = np.nan
+
+    def update(self, value, position_value=0.0, traded_notional=0.0, mask=None):
+        """
+        עדכון עם שווי התיק, ערך הפוזיציה והיקף המסחר בצעד הנוכחי
+        mask: רק הסביבות המסומנות מתקדמות צעד (למשל סמלים שקיבלו נר חדש); ערכי השאר לא נקראים
+        """
+        if self.n_envs is None and mask is None:
+            self._update_scalar(float(value), float(position_value), float(traded_notional))
+            return
+        idx = slice(None) if mask is None else np.flatnonzero(mask)
+        value = np.broadcast_to(np.asarray(value, dtype=np.float64).reshape(-1), self.count.shape)[idx]
+        position_value = np.broadcast_to(
+            np.asarray(position_value, dtype=np.float64).reshape(-1), self.count.shape)[idx]
+        traded_notional = np.broadcast_to(
+            np.asarray(traded_notional, dtype=np.float64).reshape(-1), self.count.shape)[idx]
+
+        # תשואת הצעד - רק כשיש שווי קודם
+        prev_value = self.prev_value[idx]
+        has_prev = np.isfinite(prev_value)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ret = np.where(has_prev & (prev_value != 0), value / prev_value - 1.0, 0.0)
+
+        # Welford לממוצע ולשונות
+        count = self.count[idx] + has_prev
+        mean = self.mean[idx]
+        delta = np.where(has_prev, ret - mean, 0.0)
+        mean = mean + np.where(has_prev, delta / np.maximum(count, 1), 0.0)
+        self.count[idx] = count
+        self.mean[idx] = mean
+        self.m2[idx] += delta * np.where(has_prev, ret - mean, 0.0)
+        self.downside_sq[idx] += np.where(has_prev & (ret < 0), ret * ret, 0.0)
+
+        # משיכה מקסימלית מול השיא המצטבר
+        peak = np.fmax(self.peak[idx], value)
+        self.peak[idx] = peak
+        with np.errstate(divide='ignore', invalid='ignore'):
+            drawdown = np.where(peak > 0, 1.0 - value / peak, 0.0)
+        self.max_drawdown[idx] = np.maximum(self.max_drawdown[idx], drawdown)
+
+        # מחזור וחשיפה
+        self.traded[idx] += np.abs(traded_notional)
+        self.value_sum[idx] += value
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.exposure_sum[idx] += np.where(value != 0, np.abs(position_value) / value, 0.0)
+        self.steps[idx] += 1
+
+        self.prev_value[idx] = value
+
+    def _update_scalar(self, value, position_value, traded_notional):
+        """
+        אותו עדכון לסביבה בודדת בחשבון סקלרי - בלי מערכים זמניים בכל צעד
+        """
+        prev_value = self.prev_value[0]
+        if prev_value == prev_value:
+            ret = value / prev_value - 1.0 if prev_value != 0 else 0.0
+            count = int(self.count[0]) + 1
+            mean = float(self.mean[0])
+            delta = ret - mean
+            mean += delta / count
+            self.count[0] = count
+            self.mean[0] = mean
+            self.m2[0] += delta * (ret - mean)
+            if ret < 0:
+                self.downside_sq[0] += ret * ret
+
+        peak = self.peak[0]
+        if not peak >= value:
+            peak = value
+            self.peak[0] = peak
+        drawdown = 1.0 - value / peak if peak > 0 else 0.0
+        if drawdown > self.max_drawdown[0]:
+            self.max_drawdown[0] = drawdown
+
+        self.traded[0] += abs(traded_notional)
+        self.value_sum[0] += value
+        if value != 0:
+            self.exposure_sum[0] += abs(position_value) / value
+        self.steps[0] += 1
+        self.prev_value[0] = value
+
+    def summary(self):
+        """
+        מחזיר מילון מדדים; ערכים סקלריים עבור סביבה בודדת ומערכים עבור סביבות וקטוריות
+        """
+        annualize = np.sqrt(self.periods_per_year)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std = np.sqrt(np.where(self.count > 1, self.m2 / np.maximum(self.count - 1, 1), 0.0))
+            downside = np.sqrt(np.where(self.count > 0, self.downside_sq / np.maximum(self.count, 1), 0.0))
+            sharpe = np.where(std > 0, self.mean / std * annualize, 0.0)
+            sortino = np.where(downside > 0, self.mean / downside * annualize, 0.0)
+            avg_value = np.where(self.steps > 0, self.value_sum / np.maximum(self.steps, 1), 0.0)
+            turnover = np.where(avg_value > 0, self.traded / avg_value, 0.0)
+            exposure = np.where(self.steps > 0, self.exposure_sum / np.maximum(self.steps, 1), 0.0)
+
+        metrics = {
+            'mean_return': self.mean.copy(),
+            'volatility': std * annualize,
+            'sharpe': sharpe,
+            'sortino': sortino,
+            'max_drawdown': self.max_drawdown.copy(),
+            'turnover': turnover,
+            'exposure': exposure,
+        }
+        if self.n_envs is None:
+            metrics = {name: float(values[0]) for name, values in metrics.items()}
+        return metrics
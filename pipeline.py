@@ -0,0 +1,213 @@
+import os
+import sys
+import shutil
+
+# The fetch and preprocess stages live in rl_trading_system/src
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rl_trading_system', 'src'))
+
+from artifact_cache import ArtifactCache, hash_file, stage_key
+
+# Default pipeline configuration
+config = {
+    'symbols': ['AAPL', 'GOOG', 'NVDA', '^GSPC'],
+    'start': '2015-01-01',
+    'end': '2020-01-01',
+    'interval': '1d',
+    # Optional coarser bar size for preprocessing and training (e.g. '5m' bars from '1m' data)
+    'resample_to': None,
+    # Directory with already downloaded <symbol>_5y_<interval>.json files; None downloads with yfinance
+    'raw_dir': os.path.join('rl_trading_system', 'data'),
+    'indicator_set': 'all',
+    # Quarantine bars failing the data-quality checks before computing indicators
+    'validate': True,
+    # Symbol whose sessions are the exchange calendar for the missing-session check
+    'calendar': '^GSPC',
+    # Benchmark for the cross-asset features (rolling beta/correlation vs the index and the universe); None skips them
+    'cross_asset': '^GSPC',
+    'cross_window': 60,
+    'window_size': 30,
+    'episodes': 100,
+    # Reward scheme for training (see reward_functions.REWARD_FUNCTIONS)
+    'reward': 'cumulative',
+    # Pre-train on synthetic paths built from the symbol's own bars ('bootstrap', 'gbm', 'regime'); None skips it
+    'synthetic': None,
+    'synthetic_paths': 20,
+}
+cache_dir = os.path.join('rl_trading_system', 'cache')
+cache_max_bytes = 2 * 1024 ** 3
+
+
+class PipelineRunner:
+    """
+    Runs fetch -> preprocess -> cross_asset -> train, reusing any stage whose
+    inputs and parameters are unchanged from the artifact cache. Fetch and
+    train run per symbol; preprocess and cross_asset cover the whole universe.
+    """
+
+    def __init__(self, cache, config):
+        self.cache = cache
+        self.config = dict(config)
+        self._hashes = {}
+
+    def _hash(self, path):
+        # Memoized per (path, size, mtime) so unchanged files are hashed once per run
+        stat = os.stat(path)
+        memo_key = (path, stat.st_size, stat.st_mtime_ns)
+        if memo_key not in self._hashes:
+            self._hashes[memo_key] = hash_file(path)
+        return self._hashes[memo_key]
+
+    def fetch(self, symbol):
+        cfg = self.config
+        params = {'symbol': symbol, 'start': cfg['start'], 'end': cfg['end'], 'interval': cfg['interval']}
+        inputs = []
+        local_file = None
+        if cfg.get('raw_dir'):
+            local_file = os.path.join(cfg['raw_dir'], f"{symbol}_5y_{cfg['interval']}.json")
+            if not os.path.exists(local_file):
+                raise FileNotFoundError(f"Raw data not found at {local_file}")
+            inputs = [self._hash(local_file)]
+
+        def produce(output_dir):
+            if local_file:
+                shutil.copy(local_file, output_dir)
+                return
+            from fetch_price_data import fetch_price_data
+            if fetch_price_data(symbol, cfg['start'], cfg['end'], cfg['interval'], output_dir) is None:
+                raise RuntimeError(f"Fetching {symbol} failed")
+
+        paths, hit = self.cache.get_or_create(stage_key('fetch', params, inputs), produce, params)
+        return next(iter(paths.values())), hit
+
+    def preprocess(self, raw_files, calendar_file=None):
+        """
+        Builds the processed files of the whole universe (one cache entry for all
+        symbols), so the data-quality checks run once over every symbol's bars.
+        Returns ({symbol: path}, hit); symbols that failed are left out.
+        """
+        params = {'symbols': list(raw_files), 'indicator_set': self.config['indicator_set'],
+                  'interval': self.config['interval'], 'resample_to': self.config.get('resample_to'),
+                  'validate': self.config.get('validate', True)}
+        inputs = [self._hash(path) for path in raw_files.values()] + \
+            ([self._hash(calendar_file)] if calendar_file else [])
+
+        def produce(output_dir):
+            from preprocess_price_data import process_universe
+            from data_validation import load_calendar
+            calendar = load_calendar(calendar_file) if calendar_file and params['validate'] else None
+            processed = process_universe(raw_files, output_dir=output_dir, indicator_set=params['indicator_set'],
+                                         interval=params['interval'], resample_to=params['resample_to'],
+                                         validate=params['validate'], calendar=calendar)
+            if not processed:
+                raise RuntimeError("Preprocessing failed for every symbol")
+
+        paths, hit = self.cache.get_or_create(stage_key('preprocess', params, inputs), produce, params)
+        from preprocess_price_data import processed_file_name
+        name = {symbol: processed_file_name(symbol, params['resample_to'] or params['interval'])
+                for symbol in raw_files}
+        return {symbol: paths[name[symbol]] for symbol in raw_files if name[symbol] in paths}, hit
+
+    def cross_asset(self, processed_files):
+        """
+        Adds the cross-asset columns to the processed files of the whole universe
+        (one cache entry for all symbols). Returns ({symbol: path}, hit).
+        """
+        params = {'benchmark': self.config['cross_asset'], 'window': self.config.get('cross_window', 60),
+                  'symbols': list(processed_files)}
+        inputs = [self._hash(path) for path in processed_files.values()]
+
+        def produce(output_dir):
+            from market_data import load_processed_frame
+            from cross_asset_features import add_cross_asset_features
+            frames = {symbol: load_processed_frame(path) for symbol, path in processed_files.items()}
+            frames = add_cross_asset_features(frames, params['benchmark'], params['window'])
+            for symbol, df in frames.items():
+                df.to_csv(os.path.join(output_dir, os.path.basename(processed_files[symbol])))
+
+        paths, hit = self.cache.get_or_create(stage_key('cross_asset', params, inputs), produce, params)
+        return {symbol: paths[os.path.basename(path)] for symbol, path in processed_files.items()}, hit
+
+    def train(self, symbol, processed_file):
+        params = {'symbol': symbol, 'window_size': self.config['window_size'],
+                  'episodes': self.config['episodes'],
+                  'interval': self.config.get('resample_to') or self.config['interval'],
+                  'reward': self.config.get('reward', 'cumulative'),
+                  'synthetic': self.config.get('synthetic'),
+                  'synthetic_paths': self.config.get('synthetic_paths', 20)}
+
+        def produce(output_dir):
+            from train_model import train_symbol
+            train_symbol(symbol, processed_file, output_dir, episodes=params['episodes'],
+                         window_size=params['window_size'], record=False, interval=params['interval'],
+                         reward=params['reward'], synthetic=params['synthetic'],
+                         synthetic_paths=params['synthetic_paths'])
+
+        paths, hit = self.cache.get_or_create(
+            stage_key('train', params, [self._hash(processed_file)]), produce, params)
+        return paths, hit
+
+    def run(self, symbols=None):
+        """
+        Runs the pipeline for every symbol. Returns {symbol: {stage: (output, cache_hit)}}.
+        A failing symbol is reported and skipped.
+        """
+        results = {}
+        raw_files = {}
+        for symbol in symbols or self.config['symbols']:
+            try:
+                raw_files[symbol] = self.fetch(symbol)
+            except Exception as e:
+                print(f"Error running pipeline for {symbol}: {e}")
+
+        # Raw bars of the calendar symbol (the index) define the sessions every symbol should have
+        calendar_symbol = self.config.get('calendar')
+        calendar_file = raw_files[calendar_symbol][0] if calendar_symbol in raw_files else None
+
+        processed = {}
+        try:
+            processed, preprocess_hit = self.preprocess(
+                {symbol: raw_file for symbol, (raw_file, _) in raw_files.items()}, calendar_file)
+        except Exception as e:
+            print(f"Error preprocessing the universe: {e}")
+        for symbol, (raw_file, fetch_hit) in raw_files.items():
+            if symbol not in processed:
+                print(f"Error running pipeline for {symbol}: preprocessing failed")
+                continue
+            results[symbol] = {
+                'fetch': (raw_file, fetch_hit),
+                'preprocess': (processed[symbol], preprocess_hit),
+            }
+
+        # Cross-asset features need every symbol's processed bars, so they run between the per-symbol stages
+        benchmark = self.config.get('cross_asset')
+        if benchmark and benchmark in processed:
+            try:
+                cross_files, cross_hit = self.cross_asset(processed)
+                for symbol, path in cross_files.items():
+                    processed[symbol] = path
+                    results[symbol]['cross_asset'] = (path, cross_hit)
+            except Exception as e:
+                print(f"Error computing cross-asset features: {e}")
+        elif benchmark:
+            print(f"Skipping cross-asset features: benchmark {benchmark} was not processed")
+
+        for symbol in list(results):
+            try:
+                outputs, train_hit = self.train(symbol, processed[symbol])
+            except Exception as e:
+                print(f"Error running pipeline for {symbol}: {e}")
+                del results[symbol]
+                continue
+            results[symbol]['train'] = (outputs, train_hit)
+        return results
+
+
+# --- Main Execution --- #
+if __name__ == '__main__':
+    runner = PipelineRunner(ArtifactCache(cache_dir, cache_max_bytes), config)
+    results = runner.run()
+
+    print('\n--- Pipeline Summary ---')
+    for symbol, stages in results.items():
+        status = ', '.join(f"{stage}: {'cached' if hit else 'computed'}" for stage, (_, hit) in stages.items())
+        print(f"{symbol}: {status}")
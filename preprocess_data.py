@@ -2,10 +2,11 @@ import json
 import pandas as pd
 import pandas_ta as ta
 import os
+from data_validation import validate_universe, load_calendar
 
-def preprocess_stock_data(symbol, chart_file, insights_file, output_dir):
-    """Loads, preprocesses, and adds technical indicators to stock data."""
-    print(f"Processing data for {symbol}...")
+def load_chart_data(symbol, chart_file):
+    """Loads a Yahoo chart file into an OHLCV DataFrame (None on failure)."""
+    print(f"Loading data for {symbol}...")
 
     # --- Load Chart Data ---
     try:
@@ -66,7 +67,12 @@ def preprocess_stock_data(symbol, chart_file, insights_file, output_dir):
 
     # Convert timestamp to datetime and set as index
     df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
-    df = df.set_index('timestamp')
+    return df.set_index('timestamp')
+
+
+def preprocess_stock_data(symbol, df, insights_file, output_dir):
+    """Preprocesses validated bars and adds technical indicators."""
+    print(f"Processing data for {symbol}...")
 
     # Handle potential missing values (e.g., forward fill)
     # Check for NaNs introduced by inconsistent lengths or API issues
@@ -113,13 +119,27 @@ output_dir = "/home/ubuntu/processed_data"
 if not os.path.exists(output_dir):
     os.makedirs(output_dir)
 
-processed_files = []
+# The index's sessions are the exchange calendar
+calendar_file = os.path.join(base_dir, "gspc_chart_5y.json")
+calendar = load_calendar(calendar_file) if os.path.exists(calendar_file) else None
+
+frames = {}
 for symbol in symbols:
     safe_symbol_name = symbol.lower().replace('^', '')
-    chart_file = os.path.join(base_dir, f"{safe_symbol_name}_chart_5y.json")
+    df = load_chart_data(symbol, os.path.join(base_dir, f"{safe_symbol_name}_chart_5y.json"))
+    if df is not None:
+        frames[symbol] = df
+
+# Quarantine rows that fail the data-quality checks (bad OHLC ranges, duplicates, bad ticks...)
+# and report sessions missing from the index calendar - one vectorized pass over all symbols
+frames = validate_universe(frames, output_dir, calendar=calendar) if frames else {}
+
+processed_files = []
+for symbol, df in frames.items():
+    safe_symbol_name = symbol.lower().replace('^', '')
     insights_file = os.path.join(base_dir, f"{safe_symbol_name}_insights.json") # Path to insights file
 
-    processed_path = preprocess_stock_data(symbol, chart_file, insights_file, output_dir)
+    processed_path = preprocess_stock_data(symbol, df, insights_file, output_dir)
     if processed_path:
         processed_files.append(processed_path)
 
@@ -0,0 +1,178 @@
+import numpy as np
+
+
+class RewardFunction:
+    """
+    בסיס לפונקציות תגמול עם מצב רץ ועדכון O(1) לכל צעד
+    עובד על סביבה בודדת (n_envs=None, מחזיר סקלר) או על מערך סביבות וקטוריות (מחזיר מערך),
+    באותו קוד ובאותו סדר פעולות. כל החישובים נכתבים למאגרים מוקצים מראש.
+    הקלט הוא שווי התיק אחרי הצעד - העמלות כבר מנוכות ממנו
+    """
+
+    def __init__(self, n_envs=None):
+        self.n_envs = n_envs
+        size = 1 if n_envs is None else n_envs
+        self.initial_value = np.ones(size)
+        self.prev_value = np.ones(size)
+        self._return = np.zeros(size)
+        self._reward = np.zeros(size)
+
+    def reset(self, initial_value, mask=None):
+        """
+        איפוס כל הסביבות, או רק אלו שמסומנות ב-mask, לשווי ההתחלתי
+        """
+        where = True if mask is None else np.asarray(mask, dtype=bool)
+        np.copyto(self.initial_value, initial_value, where=where)
+        np.copyto(self.prev_value, initial_value, where=where)
+        self._reset_state(where)
+
+    def __call__(self, value, mask=None):
+        """
+        התגמול לצעד שבו שווי התיק הגיע ל-value; mask - הסביבות שהתקדמו צעד
+        """
+        where = True if mask is None else np.asarray(mask, dtype=bool)
+        np.divide(value, self.prev_value, out=self._return)
+        self._return -= 1.0
+        self._compute(value, where)
+        np.copyto(self.prev_value, value, where=where)
+        if self.n_envs is None:
+            return float(self._reward[0])
+        return self._reward.copy()
+
+    def _reset_state(self, where):
+        pass
+
+    def _compute(self, value, where):
+        raise NotImplementedError
+
+
+class CumulativeReturn(RewardFunction):
+    """
+    התגמול המקורי: תשואה מצטברת מתחילת האפיזודה (ברירת המחדל לתאימות לאחור)
+    """
+
+    def _compute(self, value, where):
+        np.divide(value, self.initial_value, out=self._reward)
+        self._reward -= 1.0
+
+
+class StepPnL(RewardFunction):
+    """
+    רווח/הפסד של הצעד (אחרי עלויות) ביחס לשווי ההתחלתי
+    """
+
+    def _compute(self, value, where):
+        np.subtract(value, self.prev_value, out=self._reward)
+        self._reward /= self.initial_value
+
+
+class LogReturn(RewardFunction):
+    """
+    תשואה לוגריתמית של הצעד - מצטברת בחיבור לאורך האפיזודה
+    """
+
+    def _compute(self, value, where):
+        np.divide(value, self.prev_value, out=self._reward)
+        np.log(self._reward, out=self._reward)
+
+
+class DifferentialSharpe(RewardFunction):
+    """
+    שארפ דיפרנציאלי (Moody & Saffell): התרומה של תשואת הצעד לשארפ של ממוצעים נעים
+    מעריכיים של התשואה (A) והריבוע שלה (B), עם קצב הסתגלות eta
+    """
+
+    def __init__(self, n_envs=None, eta=0.01):
+        super().__init__(n_envs)
+        self.eta = eta
+        size = self._reward.shape
+        self.mean = np.zeros(size)
+        self.mean_sq = np.zeros(size)
+        self._delta_mean = np.zeros(size)
+        self._delta_sq = np.zeros(size)
+        self._variance = np.zeros(size)
+        self._term = np.zeros(size)
+        self._positive = np.zeros(size, dtype=bool)
+
+    def _reset_state(self, where):
+        np.copyto(self.mean, 0.0, where=where)
+        np.copyto(self.mean_sq, 0.0, where=where)
+
+    def _compute(self, value, where):
+        ret = self._return
+        np.subtract(ret, self.mean, out=self._delta_mean)
+        np.multiply(ret, ret, out=self._delta_sq)
+        self._delta_sq -= self.mean_sq
+
+        # D = (B * dA - A * dB / 2) / (B - A^2)^(3/2); לפני שיש שונות - אפס
+        np.multiply(self.mean, self.mean, out=self._variance)
+        np.subtract(self.mean_sq, self._variance, out=self._variance)
+        np.multiply(self.mean_sq, self._delta_mean, out=self._reward)
+        np.multiply(self.mean, self._delta_sq, out=self._term)
+        self._term *= 0.5
+        self._reward -= self._term
+        positive = np.greater(self._variance, 1e-12, out=self._positive)
+        np.maximum(self._variance, 1e-12, out=self._variance)
+        np.sqrt(self._variance, out=self._term)
+        self._variance *= self._term
+        self._reward /= self._variance
+        self._reward *= positive
+
+        # עדכון הממוצעים המעריכיים
+        self._delta_mean *= self.eta
+        self._delta_sq *= self.eta
+        np.add(self.mean, self._delta_mean, out=self.mean, where=where)
+        np.add(self.mean_sq, self._delta_sq, out=self.mean_sq, where=where)
+
+
+class DrawdownPenalized(RewardFunction):
+    """
+    תשואת הצעד פחות קנס על העמקת המשיכה מהשיא: r - penalty * max(0, dd_t - dd_{t-1})
+    """
+
+    def __init__(self, n_envs=None, penalty=1.0):
+        super().__init__(n_envs)
+        self.penalty = penalty
+        size = self._reward.shape
+        self.peak = np.ones(size)
+        self.drawdown = np.zeros(size)
+        self._new_peak = np.zeros(size)
+        self._new_drawdown = np.zeros(size)
+
+    def _reset_state(self, where):
+        np.copyto(self.peak, self.initial_value, where=where)
+        np.copyto(self.drawdown, 0.0, where=where)
+
+    def _compute(self, value, where):
+        np.maximum(self.peak, value, out=self._new_peak)
+        np.divide(value, self._new_peak, out=self._new_drawdown)
+        np.subtract(1.0, self._new_drawdown, out=self._new_drawdown)
+
+        np.subtract(self._new_drawdown, self.drawdown, out=self._reward)
+        np.maximum(self._reward, 0.0, out=self._reward)
+        self._reward *= -self.penalty
+        self._reward += self._return
+
+        np.copyto(self.peak, self._new_peak, where=where)
+        np.copyto(self.drawdown, self._new_drawdown, where=where)
+
+
+# שמות התגמולים לבחירה מקונפיגורציה
+REWARD_FUNCTIONS = {
+    'cumulative': CumulativeReturn,
+    'step_pnl': StepPnL,
+    'log_return': LogReturn,
+    'differential_sharpe': DifferentialSharpe,
+    'drawdown_penalized': DrawdownPenalized,
+}
+
+
+def make_reward(reward='cumulative', n_envs=None, **kwargs):
+    """
+    יצירת פונקציית תגמול לפי שם (או החזרת מופע קיים כמו שהוא)
+    """
+    if isinstance(reward, RewardFunction):
+        return reward
+    if reward not in REWARD_FUNCTIONS:
+        raise ValueError(f"Unknown reward: {reward}. Expected one of {sorted(REWARD_FUNCTIONS)}")
+    return REWARD_FUNCTIONS[reward](n_envs=n_envs, **kwargs)
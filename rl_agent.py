@@ -1,7 +1,7 @@
+import time
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
 from trading_env import TradingEnvironment
+from state_discretizer import StateDiscretizer
 
 class RLTradingAgent:
     """
@@ -10,7 +10,8 @@ class RLTradingAgent:
     """
     
     def __init__(self, env, learning_rate=0.001, discount_factor=0.95, exploration_rate=1.0, 
-                 exploration_decay=0.995, min_exploration_rate=0.01):
+                 exploration_decay=0.995, min_exploration_rate=0.01, profiler=None,
+                 discretizer=None, recorder=None):
         self.env = env
         self.learning_rate = learning_rate
         self.discount_factor = discount_factor
@@ -18,38 +19,38 @@ class RLTradingAgent:
         self.exploration_decay = exploration_decay
         self.min_exploration_rate = min_exploration_rate
         
+        # דיסקרטיזציה של המצב - התכונות נבחרות לפי שמות העמודות בתצפית
+        self.discretizer = discretizer or StateDiscretizer()
+        self.discretizer.bind(env.feature_names)
+        
         # יצירת טבלת Q פשוטה (נשתמש בגישה מופשטת יותר בהמשך)
         # במקום טבלה מלאה, נשתמש במודל רשת עצבית בגרסה המתקדמת
-        self.q_table = {}
+        # שורה לכל מזהה מצב - מצב שלא נצפה נשאר שורת אפסים (החזקה)
+        self.q_table = np.zeros((self.discretizer.n_states, env.action_space.n))
+        
+        # פרופיילר אופציונלי (StepProfiler) למדידת זמני השלבים החמים
+        self.profiler = profiler
+        if self.profiler is not None:
+            self.profiler.attach(env=self.env, agent=self)
+        
+        # מקליט מסלולים אופציונלי (TrajectoryRecorder) - שומר כל אפיזודה לקובץ עמודות
+        self.recorder = recorder
         
     def _get_state_key(self, state):
         """
         המרת מצב למפתח שניתן להשתמש בו בטבלת Q
         בגרסה מתקדמת יותר נשתמש ברשת עצבית במקום
         """
-        # פישוט המצב למספר קטן של תכונות מרכזיות
-        # במימוש מלא נשתמש בכל המידע מהמצב
-        
-        # לדוגמה: נשתמש רק במחיר הסגירה, RSI, ו-MACD
-        if len(state.shape) > 2:  # אם המצב הוא מערך תלת-ממדי
+        if not isinstance(state, dict) and len(state.shape) > 2:  # אם המצב הוא מערך תלת-ממדי
             state = state[0]  # לקחת רק את החלון האחרון
-            
-        # נניח שהעמודות הרלוונטיות נמצאות במיקומים הבאים
-        # (במימוש אמיתי נצטרך לוודא את המיקומים המדויקים)
-        close_idx = 4  # מחיר סגירה
-        rsi_idx = 20   # RSI (לדוגמה)
-        macd_idx = 25  # MACD (לדוגמה)
-        
-        # לקיחת הערך האחרון בחלון
-        last_idx = -1
-        
-        # דיסקרטיזציה של הערכים
-        close_discrete = int(state[last_idx, close_idx] * 10)
-        rsi_discrete = int(state[last_idx, rsi_idx] * 10) if state.shape[1] > rsi_idx else 0
-        macd_discrete = int(state[last_idx, macd_idx] * 10) if state.shape[1] > macd_idx else 0
-        
-        # יצירת מפתח
-        return (close_discrete, rsi_discrete, macd_discrete)
+        
+        return int(self.discretizer.transform(state))
+    
+    def _get_state_keys(self, states):
+        """
+        המרת אצווה של מצבים (batch, window, features) למערך מזהי מצב
+        """
+        return self.discretizer.transform(states)
     
     def choose_action(self, state):
         """
@@ -62,11 +63,20 @@ class RLTradingAgent:
         # אקספלויטציה - בחירת הפעולה הטובה ביותר לפי טבלת Q
         state_key = self._get_state_key(state)
         
-        if state_key not in self.q_table:
-            self.q_table[state_key] = np.zeros(self.env.action_space.n)
-            
         return np.argmax(self.q_table[state_key])
     
+    def choose_actions(self, states):
+        """
+        בחירת פעולות לאצווה של מצבים (למשל מסביבות וקטוריות)
+        """
+        state_keys = self._get_state_keys(states)
+        actions = np.argmax(self.q_table[state_keys], axis=1)
+        
+        # אקספלורציה - פעולה אקראית לכל מצב בהסתברות שיעור האקספלורציה
+        explore = np.random.random(len(actions)) < self.exploration_rate
+        actions[explore] = np.random.randint(self.env.action_space.n, size=int(explore.sum()))
+        return actions
+    
     def update_q_table(self, state, action, reward, next_state, done):
         """
         עדכון טבלת Q בהתאם לנוסחת Q-Learning
@@ -74,13 +84,6 @@ class RLTradingAgent:
         state_key = self._get_state_key(state)
         next_state_key = self._get_state_key(next_state)
         
-        # יצירת ערכים התחלתיים אם המצב לא קיים בטבלה
-        if state_key not in self.q_table:
-            self.q_table[state_key] = np.zeros(self.env.action_space.n)
-            
-        if next_state_key not in self.q_table:
-            self.q_table[next_state_key] = np.zeros(self.env.action_space.n)
-        
         # חישוב ערך Q חדש
         current_q = self.q_table[state_key][action]
         
@@ -101,18 +104,58 @@ class RLTradingAgent:
             self.exploration_rate = max(self.min_exploration_rate, 
                                        self.exploration_rate * self.exploration_decay)
     
+    def update_q_table_batch(self, states, actions, rewards, next_states, dones):
+        """
+        עדכון Q-Learning לאצווה של מעברים (סביבות וקטוריות או replay)
+        כל העדכונים מחושבים מול אותה טבלה, ומעברים לאותו תא מצטברים
+        """
+        self.update_q_table_keys(self._get_state_keys(states), actions, rewards,
+                                 self._get_state_keys(next_states), dones)
+    
+    def update_q_table_keys(self, state_keys, actions, rewards, next_state_keys, dones,
+                            learning_rate=None, td_clip=None):
+        """
+        אותו עדכון אצווה כשהמעברים כבר מגיעים כמזהי מצב (למשל מעובדי rollout מרוחקים)
+        learning_rate גובר על קצב הלמידה של הסוכן; td_clip חוסם את שגיאת ה-TD (עדכון מקוון)
+        """
+        state_keys = np.asarray(state_keys, dtype=np.int64)
+        next_state_keys = np.asarray(next_state_keys, dtype=np.int64)
+        actions = np.asarray(actions, dtype=np.int64)
+        dones = np.asarray(dones, dtype=bool)
+        
+        max_next_q = np.where(dones, 0.0, self.q_table[next_state_keys].max(axis=1))
+        current_q = self.q_table[state_keys, actions]
+        td_error = np.asarray(rewards) + self.discount_factor * max_next_q - current_q
+        if td_clip is not None:
+            td_error = np.clip(td_error, -td_clip, td_clip)
+        learning_rate = self.learning_rate if learning_rate is None else learning_rate
+        np.add.at(self.q_table, (state_keys, actions), learning_rate * td_error)
+        
+        # עדכון שיעור האקספלורציה פעם אחת לכל אפיזודה שהסתיימה
+        finished = int(dones.sum())
+        if finished:
+            self.exploration_rate = max(self.min_exploration_rate,
+                                        self.exploration_rate * self.exploration_decay ** finished)
+    
     def train(self, episodes=1000, max_steps=None, render_interval=100):
         """
         אימון הסוכן
         """
         episode_rewards = []
         
+        if self.profiler is not None:
+            self.profiler.reset()
+        
         for episode in range(episodes):
+            episode_start = time.perf_counter()
             state, _ = self.env.reset()
             episode_reward = 0
             done = False
             step = 0
             
+            if self.recorder is not None:
+                self.recorder.start_episode(episode, 'train')
+            
             while not done:
                 # בחירת פעולה
                 action = self.choose_action(state)
@@ -123,6 +166,9 @@ class RLTradingAgent:
                 # עדכון טבלת Q
                 self.update_q_table(state, action, reward, next_state, done)
                 
+                if self.recorder is not None:
+                    self.recorder.record(action, reward, info)
+                
                 # עדכון המצב והתגמול המצטבר
                 state = next_state
                 episode_reward += reward
@@ -135,49 +181,101 @@ class RLTradingAgent:
             # שמירת התגמול המצטבר
             episode_rewards.append(episode_reward)
             
+            if self.recorder is not None:
+                self.recorder.end_episode(episode_reward=episode_reward,
+                                          exploration_rate=self.exploration_rate)
+            
+            if self.profiler is not None:
+                self.profiler.record_episode(step, time.perf_counter() - episode_start)
+            
             # הצגת התקדמות
             if episode % render_interval == 0:
                 print(f"אפיזודה {episode}/{episodes}, תגמול: {episode_reward:.2f}, "
                       f"אקספלורציה: {self.exploration_rate:.4f}, רווח: {info['total_profit_percent']:.2f}%")
         
+        if self.profiler is not None:
+            self.profiler.report('train')
+        
         return episode_rewards
     
-    def test(self, episodes=10):
+    def test(self, episodes=1):
         """
         בדיקת ביצועי הסוכן
+        המדיניות החמדנית והנתונים דטרמיניסטיים, כך שאפיזודות חוזרות זהות - אפיזודה אחת מספיקה
+        (השוואה מול אסטרטגיות בסיס ועל פני תקופות: evaluation.evaluate)
         """
         total_profits = []
         
+        if self.profiler is not None:
+            self.profiler.reset()
+        
         for episode in range(episodes):
+            episode_start = time.perf_counter()
             state, _ = self.env.reset()
             done = False
+            step = 0
+            
+            if self.recorder is not None:
+                self.recorder.start_episode(episode, 'test')
             
             while not done:
                 # בחירת הפעולה הטובה ביותר (ללא אקספלורציה)
+                # מצב שלא נצפה הוא שורת אפסים -> החזקה כברירת מחדל
                 state_key = self._get_state_key(state)
-                
-                if state_key in self.q_table:
-                    action = np.argmax(self.q_table[state_key])
-                else:
-                    action = 0  # החזקה כברירת מחדל
+                action = np.argmax(self.q_table[state_key])
                 
                 # ביצוע הפעולה
-                state, _, done, _, info = self.env.step(action)
+                state, reward, done, _, info = self.env.step(action)
+                step += 1
+                
+                if self.recorder is not None:
+                    self.recorder.record(action, reward, info)
+            
+            if self.recorder is not None:
+                self.recorder.end_episode(total_profit_percent=info['total_profit_percent'])
+            
+            if self.profiler is not None:
+                self.profiler.record_episode(step, time.perf_counter() - episode_start)
             
             # הצגת תוצאות
-            print(f"אפיזודה {episode+1}/{episodes}, רווח: {info['total_profit_percent']:.2f}%")
+            print(f"אפיזודה {episode+1}/{episodes}, רווח: {info['total_profit_percent']:.2f}%, "
+                  f"שארפ: {info['sharpe']:.2f}, סורטינו: {info['sortino']:.2f}, "
+                  f"משיכה מקסימלית: {info['max_drawdown'] * 100:.2f}%")
             total_profits.append(info['total_profit_percent'])
         
         # סיכום תוצאות
         avg_profit = np.mean(total_profits)
         print(f"\nרווח ממוצע: {avg_profit:.2f}%")
         
+        if self.profiler is not None:
+            self.profiler.report('test')
+        
         return total_profits
     
+    def save(self, path):
+        """
+        שמירת טבלת ה-Q ושיעור האקספלורציה לקובץ npz
+        """
+        np.savez(path, q_table=self.q_table, exploration_rate=self.exploration_rate,
+                 feature_names=np.array(self.discretizer.feature_names))
+    
+    def load(self, path):
+        """
+        טעינת טבלת Q שנשמרה עם save
+        """
+        with np.load(path) as data:
+            if data['q_table'].shape != self.q_table.shape:
+                raise ValueError(f"Q table shape {data['q_table'].shape} does not match {self.q_table.shape}")
+            self.q_table = data['q_table'].copy()
+            self.exploration_rate = float(data['exploration_rate'])
+    
     def plot_results(self, episode_rewards):
         """
         הצגת תוצאות האימון
         """
+        # ייבוא עצל - matplotlib נטען רק כשמציירים
+        import matplotlib.pyplot as plt
+        
         plt.figure(figsize=(10, 6))
         plt.plot(episode_rewards)
         plt.title('תגמול מצטבר לאורך האימון')
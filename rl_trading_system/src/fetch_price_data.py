@@ -7,18 +7,22 @@ import pandas as pd
 tickers = ['AAPL', 'GOOG', 'NVDA', '^GSPC']
 data_dir = r'C:\Users\Oriel\FinAlgoTrading\FinTech\rl_trading_system\data'
 
-# Create directory if it doesn't exist
-os.makedirs(data_dir, exist_ok=True)
-
-for ticker in tickers:
-    print(f'Fetching 5-year daily data for {ticker}...')
+def fetch_price_data(ticker, start='2015-01-01', end='2020-01-01', interval='1d', output_dir=None):
+    """
+    Downloads OHLCV data for one ticker and saves it as date -> values JSON. Returns the file path.
+    Intraday intervals ('1m', '5m', '1h', ...) are keyed by timestamp; note that yfinance
+    only serves recent intraday history (7 days of 1m bars, 60 days below 1h).
+    """
+    output_dir = output_dir or data_dir
+    os.makedirs(output_dir, exist_ok=True)
+    print(f'Fetching {interval} data for {ticker} from {start} to {end}...')
     try:
         # Download the data
         stock_data = yf.download(
             tickers=ticker,
-            start='2015-01-01',
-            end='2020-01-01',
-            interval='1d'
+            start=start,
+            end=end,
+            interval=interval
         )
         
         # Print the index and column types for debugging
@@ -39,38 +43,48 @@ for ticker in tickers:
             print(f"New column names: {list(stock_data.columns)}")
         
         # Save the data to a JSON file
-        file_path = f'{data_dir}/{ticker}_5y_1d.json'
+        file_path = os.path.join(output_dir, f'{ticker}_5y_{interval}.json')
         
         # Convert to dictionary for JSON serialization
-        stock_dict = {}
-        for date, row in stock_data.iterrows():
-            date_str = date.strftime('%Y-%m-%d')
-            
-            # Create entry with available columns
-            # Remove ticker suffix from column names
-            entry = {}
-            for column in stock_data.columns:
-                # Extract base column name by removing ticker suffix
-                base_column = column.split('_')[0] if '_' in column else column
-                
-                # Get the scalar value properly
-                if 'Volume' in str(column):
-                    entry[base_column] = int(row[column])
-                else:
-                    entry[base_column] = float(row[column])
+        # Intraday bars keep the time of day so bars of the same day stay distinct
+        date_format = '%Y-%m-%d' if interval in ('1d', '5d', '1wk', '1mo', '3mo') else '%Y-%m-%d %H:%M:%S'
+        if getattr(stock_data.index, 'tz', None) is not None:
+            # Exchange-local wall clock, so each session falls on one calendar day
+            stock_data.index = stock_data.index.tz_localize(None)
+        date_strs = stock_data.index.strftime(date_format)
+        
+        # Remove ticker suffix from column names
+        columns = {}
+        for column in stock_data.columns:
+            # Extract base column name by removing ticker suffix
+            base_column = column.split('_')[0] if '_' in column else column
             
-            stock_dict[date_str] = entry
+            # Get the scalar values properly
+            if 'Volume' in str(column):
+                columns[base_column] = stock_data[column].astype('int64').tolist()
+            else:
+                columns[base_column] = stock_data[column].astype(float).tolist()
+        
+        names = list(columns)
+        stock_dict = {date_str: dict(zip(names, values))
+                      for date_str, values in zip(date_strs, zip(*columns.values()))}
         
         # Save the data to a JSON file
         with open(file_path, 'w') as f:
             json.dump(stock_dict, f, indent=2)
             
         print(f'Successfully fetched and saved data for {ticker} to {file_path}')
+        return file_path
     except Exception as e:
         print(f'Error fetching data for {ticker}: {str(e)}')
         # Print more details for debugging
         import traceback
         traceback.print_exc()
+        return None
+
 
-print('Finished fetching stock price data.')
+if __name__ == '__main__':
+    for ticker in tickers:
+        fetch_price_data(ticker)
 
+    print('Finished fetching stock price data.')
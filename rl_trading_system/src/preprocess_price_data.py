@@ -1,9 +1,18 @@
+import numpy as np
 import pandas as pd
 import json
 import os
+import sys
 import ta
 from ta.utils import dropna
 
+# The batch indicators, resampler and data checks live at the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from batch_indicators import compute_indicators
+from data_validation import validate_universe, load_calendar
+from resampler import resample_frame
+
 # Fix the data paths - use absolute path if needed
 # Option 1: Define absolute path
 data_dir = r'C:\Users\Oriel\FinAlgoTrading\FinTech\rl_trading_system\data'
@@ -13,38 +22,119 @@ processed_data_dir = os.path.join(data_dir, 'processed')
 # data_dir = os.path.join('..', 'data')
 # processed_data_dir = os.path.join(data_dir, 'processed')
 
-# Create the processed directory if it doesn't exist
-os.makedirs(processed_data_dir, exist_ok=True)
-
 symbols = ['AAPL', 'GOOG', 'NVDA', '^GSPC']
 
-# Debug statement to check if files exist
-for symbol in symbols:
-    file_path = os.path.join(data_dir, f'{symbol}_5y_1d.json')
-    if os.path.exists(file_path):
-        print(f"Found file: {file_path}")
-    else:
-        print(f"File not found: {file_path}")
+# The index's sessions serve as the exchange calendar for the missing-session check
+calendar_symbol = '^GSPC'
 
-def process_price_data(symbol):
-    file_path = os.path.join(data_dir, f'{symbol}_5y_1d.json')
-    print(f'Processing price data for {symbol} from {file_path}...')
+# Indicator sets: 'all' runs ta.add_all_ta_features, 'core' the batched engine subset
+INDICATOR_SETS = ('all', 'core')
+
+
+def add_indicators(df, indicator_set='all'):
+    """Adds technical indicator columns to an OHLCV DataFrame."""
+    if indicator_set == 'all':
+        return ta.add_all_ta_features(
+            df, open='open', high='high', low='low', close='close', volume='volume', fillna=True
+        )
+    if indicator_set == 'core':
+        indicators = compute_indicators(df['high'].values, df['low'].values, df['close'].values, df['volume'].values)
+        for col, values in indicators.items():
+            df[col] = values[:, 0]
+        return df
+    raise ValueError(f'Unknown indicator set: {indicator_set}')
+
+
+def to_float32(df):
+    """Casts numeric columns to float32; processed files are written and loaded in single precision."""
+    numeric = df.select_dtypes(include='number').columns
+    return df.astype({col: np.float32 for col in numeric})
+
+
+def default_calendar(file_path, interval='1d'):
+    """Session dates of the index file stored next to file_path, or None if there is none."""
+    calendar_file = os.path.join(os.path.dirname(file_path), f'{calendar_symbol}_5y_{interval}.json')
+    return load_calendar(calendar_file) if os.path.exists(calendar_file) else None
+
+
+def resample_to_interval(df, interval):
+    """Aggregates OHLCV bars to a coarser interval (sessions are never merged)."""
+    print(f'Resampling {len(df)} bars to {interval}...')
+    return resample_frame(df, interval)
+
+
+# Running-total indicators: a recomputed tail only matches the full history after re-anchoring
+ADDITIVE_CUMULATIVE = ('volume_adi', 'volume_obv', 'volume_vpt')
+MULTIPLICATIVE_CUMULATIVE = ('volume_nvi',)
+
+
+def extend_processed_frame(df, new_bars, indicator_set='all', lookback=300):
+    """
+    Appends newly arrived OHLCV bars to a processed frame without recomputing the
+    whole history: indicators are computed over the last `lookback` rows plus the
+    new bars (enough for the longest warm-up), and running totals are re-anchored
+    to the stored values. Columns the indicators do not produce are taken from
+    new_bars when present, otherwise carried forward - except cross-asset
+    features, which depend on the rest of the universe and must come with
+    new_bars (see cross_asset_features.CrossAssetStream).
+    """
+    raw_cols = ['open', 'high', 'low', 'close', 'volume', 'adj_close']
+    new_bars = new_bars.rename(columns=str.lower)
+    if 'adj_close' not in new_bars.columns:
+        new_bars = new_bars.assign(adj_close=new_bars['close'])
+    new_bars = new_bars[new_bars.index > df.index[-1]].dropna(subset=raw_cols)
+    if new_bars.empty:
+        return df
+    missing = [col for col in df.columns if col.startswith('cross_') and col not in new_bars.columns]
+    if missing:
+        raise ValueError(f"new_bars lack the cross-asset features {missing}; compute them with CrossAssetStream")
+
+    history = df[raw_cols].iloc[-lookback:]
+    tail = pd.concat([history, new_bars[raw_cols]]).astype(np.float64)
+    tail = add_indicators(tail, indicator_set)
+    anchor, last = tail.iloc[len(history) - 1], df.iloc[-1]
+    new = tail.iloc[len(history):].copy()
+    for col in ADDITIVE_CUMULATIVE:
+        if col in new.columns and col in df.columns:
+            new[col] += float(last[col]) - anchor[col]
+    for col in MULTIPLICATIVE_CUMULATIVE:
+        if col in new.columns and col in df.columns and anchor[col] != 0:
+            new[col] *= float(last[col]) / anchor[col]
+    if 'others_cr' in new.columns and 'others_cr' in df.columns:
+        # Cumulative return since the first bar of the full history, in percent
+        growth = (1 + float(last['others_cr']) / 100) / (1 + anchor['others_cr'] / 100)
+        new['others_cr'] = (growth * (1 + new['others_cr'] / 100) - 1) * 100
+
+    for col in df.columns:
+        if col not in new.columns:
+            new[col] = new_bars[col] if col in new_bars.columns else last[col]
+    new.index.name = df.index.name
+    return pd.concat([df, to_float32(new[df.columns])])
+
+
+def processed_file_name(symbol, interval='1d'):
+    """Daily files keep the original name; other intervals carry the interval."""
+    if interval == '1d':
+        return f'{symbol}_processed_prices.csv'
+    return f'{symbol}_{interval}_processed_prices.csv'
+
+
+def load_raw_bars(symbol, file_path):
+    """
+    Loads one raw price file (a date -> OHLCV dict, or the Yahoo chart format)
+    into an OHLCV DataFrame with an adj_close column. Returns None on failure.
+    """
+    print(f'Loading price data for {symbol} from {file_path}...')
     try:
         with open(file_path, 'r') as f:
             data_dict = json.load(f)
         
         # Check if this is directly a dictionary of date -> OHLCV data
-        if isinstance(data_dict, dict):
-            # Create a DataFrame from the dictionary
-            dates = []
-            price_data = []
-            
-            for date_str, values in data_dict.items():
-                dates.append(date_str)
-                price_data.append(values)
-            
-            df = pd.DataFrame(price_data, index=dates)
+        if isinstance(data_dict, dict) and not ('chart' in data_dict and 'result' in data_dict['chart']):
+            # Create a DataFrame from the dictionary (keys are dates, or timestamps for intraday bars)
+            df = pd.DataFrame.from_dict(data_dict, orient='index')
             df.index = pd.to_datetime(df.index)
+            df.index.name = 'timestamp'
             
             # Rename columns if needed to match expected names
             column_mapping = {
@@ -69,23 +159,6 @@ def process_price_data(symbol):
                 
                 if missing_cols:  # If there are still missing columns
                     return None
-            
-            # Clean data - drop rows with any NaN/None in essential columns
-            df.dropna(subset=required_cols, inplace=True)
-            
-            if df.empty:
-                print(f'Warning: DataFrame empty after dropping NaNs for {symbol}.')
-                return None
-            
-            # Calculate technical indicators
-            df = ta.add_all_ta_features(
-                df, open='open', high='high', low='low', close='close', volume='volume', fillna=True
-            )
-            
-            # Save processed data
-            output_path = os.path.join(processed_data_dir, f'{symbol}_processed_prices.csv')
-            df.to_csv(output_path)
-            print(f'Successfully processed and saved data for {symbol} to {output_path}')
             return df
             
         # If original format was expected (chart -> result structure)
@@ -119,45 +192,112 @@ def process_price_data(symbol):
 
             df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
             df.set_index('timestamp', inplace=True)
-
-            # Clean data - drop rows with any NaN/None in essential columns before calculating indicators
-            essential_cols = ['open', 'high', 'low', 'close', 'volume', 'adj_close'] # Ensure adj_close is included
-            df.dropna(subset=essential_cols, inplace=True)
-
-            if df.empty:
-                print(f'Warning: DataFrame empty after dropping NaNs for {symbol}. Skipping indicator calculation.')
-                return None
-
-            # Calculate technical indicators
-            df = ta.add_all_ta_features(
-                df, open='open', high='high', low='low', close='close', volume='volume', fillna=True
-            )
-
-            # Save processed data
-            output_path = os.path.join(processed_data_dir, f'{symbol}_processed_prices.csv')
-            df.to_csv(output_path)
-            print(f'Successfully processed and saved data for {symbol} to {output_path}')
             return df
             
         else:
             print(f'Warning: Unrecognized data format for {symbol} in {file_path}')
             return None
-            
+
+    except Exception as e:
+        print(f'Error loading price data for {symbol}: {e}')
+        return None
+
+
+def finish_processed_frame(symbol, df, output_dir, indicator_set='all', interval='1d', resample_to=None):
+    """
+    Drops incomplete rows, optionally resamples, adds the indicators and writes
+    the processed file. Returns the processed DataFrame, or None on failure.
+    """
+    try:
+        # Clean data - drop rows with any NaN/None in essential columns before calculating indicators
+        essential_cols = ['open', 'high', 'low', 'close', 'volume', 'adj_close']
+        df = df.dropna(subset=essential_cols)
+
+        if df.empty:
+            print(f'Warning: DataFrame empty after dropping NaNs for {symbol}. Skipping indicator calculation.')
+            return None
+
+        if resample_to:
+            df = resample_to_interval(df, resample_to)
+
+        # Calculate technical indicators
+        df = to_float32(add_indicators(df, indicator_set))
+
+        # Save processed data
+        output_path = os.path.join(output_dir, processed_file_name(symbol, resample_to or interval))
+        df.to_csv(output_path)
+        print(f'Successfully processed and saved data for {symbol} to {output_path}')
+        return df
+
     except Exception as e:
         print(f'Error processing price data for {symbol}: {e}')
         return None
 
-# Process data for all symbols
-processed_dfs = {}
-for symbol in symbols:
-    processed_df = process_price_data(symbol)
-    if processed_df is not None:
-        processed_dfs[symbol] = processed_df
 
-print('\nFinished processing all price data.')
+def process_universe(file_paths, output_dir=None, indicator_set='all', interval='1d', resample_to=None,
+                     validate=True, calendar=None):
+    """
+    Builds the processed price files of {symbol: raw file} together.
+    With validate, the loaded bars of all symbols go through one vectorized
+    validate_universe call: bad rows (inconsistent OHLC, negative volume,
+    duplicate or out-of-order timestamps, bad ticks) are quarantined to
+    {symbol}_quarantine.csv, and sessions missing from calendar (default: the
+    dates of the index file next to the raw files) are reported.
+    Returns {symbol: processed DataFrame} for the symbols that succeeded.
+    """
+    output_dir = output_dir or processed_data_dir
+    os.makedirs(output_dir, exist_ok=True)
+
+    frames = {}
+    for symbol, file_path in file_paths.items():
+        df = load_raw_bars(symbol, file_path)
+        if df is not None:
+            frames[symbol] = df
+    if not frames:
+        return {}
+
+    if validate:
+        if calendar is None:
+            calendar = default_calendar(file_paths[next(iter(frames))], interval)
+        frames = validate_universe(frames, output_dir, calendar=calendar)
+
+    processed = {}
+    for symbol, df in frames.items():
+        df = finish_processed_frame(symbol, df, output_dir, indicator_set, interval, resample_to)
+        if df is not None:
+            processed[symbol] = df
+    return processed
+
+
+def process_price_data(symbol, file_path=None, output_dir=None, indicator_set='all',
+                       interval='1d', resample_to=None, validate=True, calendar=None):
+    """
+    Builds the processed price file for one symbol from raw {interval} bars
+    (see process_universe; prefer it for several symbols, so validation runs once).
+    resample_to (e.g. '5m', '1h', '1d') aggregates the bars with the session-aware
+    resampler before indicators are computed. For very long intraday histories
+    the 'core' indicator set is much faster than 'all'.
+    """
+    file_path = file_path or os.path.join(data_dir, f'{symbol}_5y_{interval}.json')
+    print(f'Processing price data for {symbol} from {file_path}...')
+    return process_universe({symbol: file_path}, output_dir, indicator_set, interval, resample_to,
+                            validate, calendar).get(symbol)
+
+if __name__ == '__main__':
+    # Debug statement to check if files exist
+    for symbol in symbols:
+        file_path = os.path.join(data_dir, f'{symbol}_5y_1d.json')
+        if os.path.exists(file_path):
+            print(f"Found file: {file_path}")
+        else:
+            print(f"File not found: {file_path}")
+
+    # Process data for all symbols (validated together)
+    processed_dfs = process_universe({symbol: os.path.join(data_dir, f'{symbol}_5y_1d.json') for symbol in symbols})
 
-# Example: Display head of processed AAPL data
-if 'AAPL' in processed_dfs:
-    print('\nSample processed data for AAPL:')
-    print(processed_dfs['AAPL'].head())
+    print('\nFinished processing all price data.')
 
+    # Example: Display head of processed AAPL data
+    if 'AAPL' in processed_dfs:
+        print('\nSample processed data for AAPL:')
+        print(processed_dfs['AAPL'].head())
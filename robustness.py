@@ -0,0 +1,164 @@
+import os
+import numpy as np
+
+from trading_env import PORTFOLIO_FEATURES
+from synthetic_data import PRICE_COLUMNS, FEATURE_COLUMNS, SyntheticMarketGenerator, adjusted_history, to_feature_tensor
+from evaluation import normalized_last_rows, market_state_ids, simulate_policy
+
+# המדדים שההתפלגות שלהם מדווחת
+DISTRIBUTION_METRICS = ['total_return_pct', 'sharpe', 'sortino', 'max_drawdown', 'turnover', 'exposure']
+
+
+def make_scenarios(n_scenarios, fee_range=(0.0005, 0.003), slippage_range=(0.0, 0.002), max_start_shift=252,
+                   historical_fraction=0.1, seed=0):
+    """
+    הגרלת פרמטרי התרחישים: מסלול (היסטורי או bootstrap בבלוקים), היסט תאריך ההתחלה,
+    עמלה והחלקה (התפלגות אחידה בטווחים). מחזיר מילון של מערכים באורך n_scenarios
+    """
+    rng = np.random.default_rng(seed)
+    return {
+        'bootstrap': rng.random(n_scenarios) >= historical_fraction,
+        'start': rng.integers(0, max_start_shift + 1, size=n_scenarios),
+        'fee': rng.uniform(*fee_range, size=n_scenarios),
+        'slippage': rng.uniform(*slippage_range, size=n_scenarios),
+        'seed': rng.integers(0, 2 ** 31, size=n_scenarios),
+    }
+
+
+def _scenario_features(history, shapes, scenarios, block_size):
+    """
+    טנזור תכונות (תרחיש, נר, FEATURE_COLUMNS) לאצוות תרחישים: המסלול ההיסטורי כמו שהוא,
+    או bootstrap בבלוקים של נרות אמיתיים מאותה סדרה; כל מסלול נדגם מהזרע של התרחיש שלו,
+    כך שהתוצאה לא תלויה בחלוקה לאצוות. האינדיקטורים מחושבים לכולם יחד
+    """
+    n, n_bars = len(scenarios['start']), len(history['close'])
+    bars = {col: np.repeat(history[col][None], n, axis=0) for col in PRICE_COLUMNS}
+    for i in np.flatnonzero(scenarios['bootstrap']):
+        generator = SyntheticMarketGenerator(shapes, initial_price=history['close'][0], seed=int(scenarios['seed'][i]))
+        sampled = generator.block_bootstrap(1, n_bars, block_size=block_size)
+        for col in PRICE_COLUMNS:
+            bars[col][i] = sampled[col][0]
+    return to_feature_tensor(bars)
+
+
+def _run_batch(q_table, discretizer, history, shapes, scenarios, episode_length, window_size, initial_balance,
+               interval, block_size):
+    """
+    הרצת המדיניות החמדנית על אצוות תרחישים בליבה הווקטורית של evaluation (simulate_policy)
+    """
+    features = _scenario_features(history, shapes, scenarios, block_size)
+    n = len(features)
+
+    market_names = [name for name in discretizer.feature_names if name not in PORTFOLIO_FEATURES]
+    missing = [name for name in market_names if name not in FEATURE_COLUMNS]
+    if missing:
+        raise ValueError(f"Features not available on perturbed paths: {missing}")
+
+    # נרמול החלון לכל (נר, תרחיש) בקריאה אחת - התרחישים הופכים לעמודות
+    columns = [FEATURE_COLUMNS.index(name) for name in market_names]
+    market = features[:, :, columns].transpose(1, 0, 2).reshape(features.shape[1], -1)
+    normalized = normalized_last_rows(market, window_size).reshape(features.shape[1], n, len(columns))
+
+    # הצעדים של כל תרחיש: מ-start + window_size עד סוף הפרק (כמו current_step בסביבה)
+    n_steps = episode_length - window_size - 1
+    rows = scenarios['start'][None, :] + window_size + np.arange(n_steps)[:, None]
+    paths = np.arange(n)[None, :]
+    prices = features[paths, rows, FEATURE_COLUMNS.index('adj_close')].astype(np.float64)
+    market_ids = market_state_ids(discretizer, normalized[rows, paths], market_names)
+
+    results = simulate_policy(q_table, discretizer, prices, market_ids, initial_balance=initial_balance,
+                              fee=scenarios['fee'], slippage=scenarios['slippage'], interval=interval)
+    return results
+
+
+def run_scenarios(agent, df, n_scenarios=10000, batch_size=500, n_workers=None, block_size=20,
+                  fee_range=(0.0005, 0.003), slippage_range=(0.0, 0.002), max_start_shift=252,
+                  historical_fraction=0.1, window_size=30, initial_balance=10000, interval='1d', seed=0):
+    """
+    בדיקת עמידות מונטה קרלו של סוכן מאומן על סדרה מעובדת אחת
+    כל תרחיש: מסלול שוק (ההיסטוריה, או bootstrap בבלוקים של הנרות שלה), היסט התחלה
+    עד max_start_shift נרות, עמלה והחלקה אקראיות; כל התרחישים באורך פרק זהה
+    האצוות רצות במקביל בתהליכים (ProcessPoolExecutor), ובתוך אצווה - צעדים וקטוריים
+    מחזיר DataFrame עם שורה לכל תרחיש (פרמטרים ומדדים)
+    """
+    import pandas as pd
+    from concurrent.futures import ProcessPoolExecutor
+
+    history, shapes = adjusted_history(df)
+    episode_length = len(df) - max_start_shift
+    if episode_length < window_size + 2:
+        raise ValueError(f"max_start_shift leaves episodes shorter than window_size + 2 ({window_size + 2})")
+
+    scenarios = make_scenarios(n_scenarios, fee_range, slippage_range, max_start_shift, historical_fraction, seed)
+    batches = [{key: values[start:start + batch_size] for key, values in scenarios.items()}
+               for start in range(0, n_scenarios, batch_size)]
+    args = (agent.q_table, agent.discretizer, history, shapes)
+    kwargs = dict(episode_length=episode_length, window_size=window_size, initial_balance=initial_balance,
+                  interval=interval, block_size=block_size)
+
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers == 1 or len(batches) == 1:
+        outputs = [_run_batch(*args, batch, **kwargs) for batch in batches]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = [executor.submit(_run_batch, *args, batch, **kwargs) for batch in batches]
+            outputs = [future.result() for future in futures]
+
+    results = pd.DataFrame({
+        'scenario': np.arange(n_scenarios),
+        'path': np.where(scenarios['bootstrap'], 'bootstrap', 'historical'),
+        'start': scenarios['start'], 'fee': scenarios['fee'], 'slippage': scenarios['slippage'],
+    })
+    for metric in DISTRIBUTION_METRICS:
+        results[metric] = np.concatenate([output[metric] for output in outputs])
+    return results
+
+
+def distribution_summary(results, metrics=('total_return_pct', 'sharpe', 'max_drawdown'),
+                         quantiles=(0.05, 0.25, 0.5, 0.75, 0.95)):
+    """
+    סיכום ההתפלגויות: ממוצע, סטיית תקן ואחוזונים לכל מדד, לפי סוג המסלול ובסך הכל
+    """
+    import pandas as pd
+
+    rows = {}
+    for name, group in [('all', results)] + list(results.groupby('path')):
+        for metric in metrics:
+            values = group[metric]
+            row = {'mean': values.mean(), 'std': values.std()}
+            row.update({f'p{int(q * 100)}': values.quantile(q) for q in quantiles})
+            if metric == 'total_return_pct':
+                row['p_loss'] = (values < 0).mean()
+            rows[(name, metric)] = row
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+# --- Main Execution --- #
+if __name__ == '__main__':
+    import sys
+    import time
+    from market_data import load_processed_frame
+    from trading_env import TradingEnvironment
+    from rl_agent import RLTradingAgent
+
+    symbol = 'AAPL'
+    n_scenarios = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    data_dir = os.path.join('rl_trading_system', 'data', 'processed')
+    results_dir = os.path.join('rl_trading_system', 'results')
+    df = load_processed_frame(os.path.join(data_dir, f'{symbol}_processed_prices.csv'))
+
+    agent = RLTradingAgent(TradingEnvironment(df), exploration_rate=0.0)
+    model_file = os.path.join(results_dir, f'{symbol}_q_table.npz')
+    if os.path.exists(model_file):
+        agent.load(model_file)
+    else:
+        print(f"טבלת Q לא נמצאה ב-{model_file}, מריץ עם טבלה ריקה")
+
+    start_time = time.perf_counter()
+    results = run_scenarios(agent, df, n_scenarios=n_scenarios)
+    elapsed = time.perf_counter() - start_time
+    print(f"{n_scenarios} תרחישים ב-{elapsed:.1f} שניות ({os.cpu_count()} מעבדים)\n")
+    print(distribution_summary(results).round(3).to_string())
+
+    os.makedirs(results_dir, exist_ok=True)
+    results.to_csv(os.path.join(results_dir, f'{symbol}_robustness.csv'), index=False)
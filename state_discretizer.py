@@ -0,0 +1,98 @@
+import numpy as np
+
+
+# תכונות ברירת המחדל: מחיר סגירה מתואם, RSI ו-MACD (מנורמלים ל-[0, 1] בחלון)
+DEFAULT_FEATURES = ['adj_close', 'momentum_rsi', 'trend_macd']
+
+# עשרה גבולות -> 11 תאים, כמו int(x * 10) עבור ערכים מנורמלים
+DEFAULT_BIN_EDGES = np.linspace(0.1, 1.0, 10)
+
+
+class StateDiscretizer:
+    """
+    מיפוי אצווה של תצפיות למזהי מצב שלמים
+    כל תכונה נבחרת לפי שם עמודה, מחולקת לתאים עם np.digitize,
+    והקודים משולבים למזהה יחיד בקידוד בסיס מעורב
+    """
+
+    def __init__(self, feature_names=None, bin_edges=None, column_names=None):
+        self.feature_names = list(feature_names or DEFAULT_FEATURES)
+
+        # גבולות תאים: מערך אחד לכל התכונות, או מילון/רשימה לפי תכונה
+        if bin_edges is None:
+            bin_edges = DEFAULT_BIN_EDGES
+        if isinstance(bin_edges, dict):
+            edges = [bin_edges[name] for name in self.feature_names]
+        elif np.ndim(bin_edges[0]) == 0:
+            edges = [bin_edges] * len(self.feature_names)
+        else:
+            edges = list(bin_edges)
+        if len(edges) != len(self.feature_names):
+            raise ValueError("Expected one set of bin edges per feature")
+        self.bin_edges = [np.asarray(e, dtype=np.float64) for e in edges]
+
+        # בסיס מעורב: מספר התאים של כל תכונה ומשקל הספרה שלה
+        self.n_bins = np.array([len(e) + 1 for e in self.bin_edges], dtype=np.int64)
+        self.radix = np.concatenate([np.cumprod(self.n_bins[::-1])[::-1][1:], [1]]).astype(np.int64)
+        self.n_states = int(np.prod(self.n_bins))
+
+        self.feature_indices = None
+        if column_names is not None:
+            self.bind(column_names)
+
+    def bind(self, column_names):
+        """
+        מציאת מיקומי התכונות לפי שמות העמודות של התצפית
+        """
+        column_names = list(column_names)
+        missing = [name for name in self.feature_names if name not in column_names]
+        if missing:
+            raise ValueError(f"Features not found in observation columns: {missing}")
+        self.feature_indices = np.array([column_names.index(name) for name in self.feature_names])
+        return self
+
+    def codes(self, observations):
+        """
+        מחזיר את קוד התא של כל תכונה, בצורה (..., n_features)
+        observations: חלון בודד (window, n_columns) או אצווה (batch, window, n_columns),
+        או תצפית מילון {'market': (..., window, n_market), 'portfolio': (..., n_portfolio)}
+        שבה עמודות התיק באות אחרי עמודות השוק, כמו בשמות שהדיסקרטייזר קשור אליהם
+        """
+        if self.feature_indices is None:
+            raise ValueError("StateDiscretizer is not bound to observation columns")
+
+        # הערך האחרון בחלון הוא המצב הנוכחי
+        if isinstance(observations, dict):
+            values = self._dict_values(observations)
+        else:
+            values = np.asarray(observations)[..., -1, self.feature_indices]
+        codes = np.empty(values.shape, dtype=np.int64)
+        for j, edges in enumerate(self.bin_edges):
+            codes[..., j] = np.digitize(values[..., j], edges)
+        return codes
+
+    def _dict_values(self, observations):
+        """
+        ערכי התכונות מתצפית מילון: עמודות שוק מהשורה האחרונה בחלון, עמודות תיק מהווקטור
+        """
+        market = np.asarray(observations['market'])
+        portfolio = np.asarray(observations['portfolio'])
+        n_market = market.shape[-1]
+        in_market = self.feature_indices < n_market
+        values = np.empty(market.shape[:-2] + (len(self.feature_indices),), dtype=market.dtype)
+        values[..., in_market] = market[..., -1, self.feature_indices[in_market]]
+        values[..., ~in_market] = portfolio[..., self.feature_indices[~in_market] - n_market]
+        return values
+
+    def transform(self, observations):
+        """
+        מזהה מצב שלם לכל תצפית (סקלר עבור חלון בודד, מערך עבור אצווה)
+        """
+        return self.codes(observations) @ self.radix
+
+    def decode(self, state_ids):
+        """
+        פירוק מזהי מצב בחזרה לקודי התאים
+        """
+        state_ids = np.asarray(state_ids, dtype=np.int64)
+        return (state_ids[..., None] // self.radix) % self.n_bins
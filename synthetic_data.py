@@ -0,0 +1,268 @@
+import os
+import numpy as np
+from batch_indicators import INDICATOR_COLUMNS, compute_indicators
+
+# Columns produced for every synthetic bar, in the same names used by the
+# processed price CSVs so the frames can be fed to TradingEnvironment as-is.
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'adj_close']
+FEATURE_COLUMNS = PRICE_COLUMNS + INDICATOR_COLUMNS
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+def load_bar_shapes(csv_files):
+    """
+    Loads processed price CSVs and converts every bar to a scale-free "shape" row:
+    [close-to-close log return, open gap, upper wick, lower wick, log volume].
+    Only the OHLCV columns are read.
+    """
+    import pandas as pd
+
+    shapes = []
+    for csv_file in csv_files:
+        if not os.path.exists(csv_file):
+            print(f"Warning: Processed file not found at {csv_file}")
+            continue
+        df = pd.read_csv(csv_file, usecols=['open', 'high', 'low', 'close', 'volume'])
+        df = df.dropna()
+        if len(df) < 2:
+            print(f"Warning: Not enough rows in {csv_file} to extract bar shapes")
+            continue
+        shapes.append(bars_to_shapes(
+            df['open'].values, df['high'].values, df['low'].values,
+            df['close'].values, df['volume'].values
+        ))
+
+    if not shapes:
+        raise ValueError("No usable bar data found in the given CSV files")
+    return np.concatenate(shapes, axis=0)
+
+
+def bars_to_shapes(open_, high, low, close, volume):
+    """
+    Converts one OHLCV series to shape rows (see load_bar_shapes).
+    The first bar is dropped because it has no previous close.
+    """
+    open_, high, low, close = (np.asarray(a, dtype=np.float64) for a in (open_, high, low, close))
+    volume = np.asarray(volume, dtype=np.float64)
+
+    prev_close = close[:-1]
+    body_high = np.maximum(open_[1:], close[1:])
+    body_low = np.minimum(open_[1:], close[1:])
+
+    shapes = np.empty((len(close) - 1, 5))
+    shapes[:, 0] = np.log(close[1:] / prev_close)
+    shapes[:, 1] = np.log(open_[1:] / prev_close)
+    shapes[:, 2] = np.log(np.maximum(high[1:], body_high) / body_high)
+    shapes[:, 3] = np.log(body_low / np.minimum(low[1:], body_low))
+    shapes[:, 4] = np.log(np.maximum(volume[1:], 1.0))
+    return shapes[np.isfinite(shapes).all(axis=1)]
+
+
+def adjusted_history(df):
+    """
+    OHLCV arrays of one processed frame on the adj_close scale, plus their shape
+    rows. Open, high and low are multiplied by adj_close / close first, so gaps
+    and wicks are not shifted by the adjustment factor; close becomes adj_close.
+    Returns (bars, shapes) with bars keyed by PRICE_COLUMNS.
+    """
+    close = df['close'].to_numpy(dtype=np.float64)
+    adj_close = df['adj_close'].to_numpy(dtype=np.float64) if 'adj_close' in df.columns else close
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factor = np.where(close > 0, adj_close / close, 1.0)
+
+    bars = {col: df[col].to_numpy(dtype=np.float64) * factor for col in ('open', 'high', 'low')}
+    bars['close'] = adj_close.copy()
+    bars['volume'] = df['volume'].to_numpy(dtype=np.float64)
+    bars['adj_close'] = adj_close.copy()
+    shapes = bars_to_shapes(bars['open'], bars['high'], bars['low'], bars['close'], bars['volume'])
+    return {col: bars[col] for col in PRICE_COLUMNS}, shapes
+
+
+class SyntheticMarketGenerator:
+    """
+    Vectorized generator of synthetic OHLCV paths.
+
+    Three return models are supported: circular block bootstrap of real bars,
+    geometric Brownian motion and a Markov regime-switching model. Every method
+    returns a dict of (n_paths, n_bars) float arrays keyed by PRICE_COLUMNS.
+    """
+
+    def __init__(self, shapes=None, initial_price=100.0, seed=None):
+        self.shapes = None if shapes is None else np.asarray(shapes, dtype=np.float64)
+        self.initial_price = initial_price
+        self.rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_processed_csvs(cls, csv_files, initial_price=100.0, seed=None):
+        return cls(load_bar_shapes(csv_files), initial_price=initial_price, seed=seed)
+
+    # --- Return models --- #
+
+    def block_bootstrap(self, n_paths, n_bars, block_size=20):
+        """
+        Circular block bootstrap of whole bars (return, gap, wicks and volume together),
+        which keeps short-range autocorrelation and volatility clustering.
+        """
+        if self.shapes is None:
+            raise ValueError("block_bootstrap requires real bar shapes (use from_processed_csvs)")
+
+        n_source = len(self.shapes)
+        block_size = max(1, min(block_size, n_source))
+        n_blocks = -(-n_bars // block_size)
+
+        starts = self.rng.integers(0, n_source, size=(n_paths, n_blocks))
+        idx = (starts[:, :, None] + np.arange(block_size)).reshape(n_paths, -1)[:, :n_bars]
+        idx %= n_source
+
+        sampled = self.shapes[idx]
+        return self._build_bars(sampled[..., 0], sampled[..., 1:])
+
+    def gbm(self, n_paths, n_bars, mu=0.08, sigma=0.2, periods_per_year=TRADING_DAYS_PER_YEAR):
+        """
+        Geometric Brownian motion with annualized drift mu and volatility sigma.
+        """
+        dt = 1.0 / periods_per_year
+        log_returns = self.rng.standard_normal((n_paths, n_bars))
+        log_returns *= sigma * np.sqrt(dt)
+        log_returns += (mu - 0.5 * sigma ** 2) * dt
+        return self._build_bars(log_returns, self._sample_wicks(n_paths, n_bars, sigma * np.sqrt(dt)))
+
+    def regime_switching(self, n_paths, n_bars, mus=(0.15, -0.25), sigmas=(0.12, 0.35),
+                         transition=((0.99, 0.01), (0.03, 0.97)),
+                         periods_per_year=TRADING_DAYS_PER_YEAR):
+        """
+        Markov regime-switching GBM. transition[i][j] is the per-bar probability
+        of moving from regime i to regime j.
+        """
+        mus = np.asarray(mus, dtype=np.float64)
+        sigmas = np.asarray(sigmas, dtype=np.float64)
+        cumulative = np.cumsum(np.asarray(transition, dtype=np.float64), axis=1)
+        if mus.shape != sigmas.shape or cumulative.shape != (len(mus), len(mus)):
+            raise ValueError("mus, sigmas and transition must describe the same number of regimes")
+
+        # Regime sequence: one vectorized draw per bar across all paths
+        regimes = np.empty((n_paths, n_bars), dtype=np.int64)
+        regimes[:, 0] = self.rng.integers(0, len(mus), size=n_paths)
+        uniforms = self.rng.random((n_paths, n_bars))
+        for t in range(1, n_bars):
+            rows = cumulative[regimes[:, t - 1]]
+            regimes[:, t] = np.minimum((uniforms[:, t, None] > rows).sum(axis=1), len(mus) - 1)
+
+        dt = 1.0 / periods_per_year
+        bar_sigma = sigmas[regimes] * np.sqrt(dt)
+        log_returns = self.rng.standard_normal((n_paths, n_bars)) * bar_sigma
+        log_returns += (mus[regimes] - 0.5 * sigmas[regimes] ** 2) * dt
+        return self._build_bars(log_returns, self._sample_wicks(n_paths, n_bars, bar_sigma))
+
+    def generate(self, method, n_paths, n_bars, **kwargs):
+        """
+        Dispatches to one of 'bootstrap', 'gbm' or 'regime'.
+        """
+        if method == 'bootstrap':
+            return self.block_bootstrap(n_paths, n_bars, **kwargs)
+        if method == 'gbm':
+            return self.gbm(n_paths, n_bars, **kwargs)
+        if method == 'regime':
+            return self.regime_switching(n_paths, n_bars, **kwargs)
+        raise ValueError(f"Unknown synthetic method: {method}")
+
+    def iter_feature_batches(self, method, n_paths, n_bars, batch_size=1000, **kwargs):
+        """
+        Yields (features, FEATURE_COLUMNS) in batches of at most batch_size paths,
+        so very large path counts never have to be held in memory at once.
+        """
+        remaining = n_paths
+        while remaining > 0:
+            size = min(batch_size, remaining)
+            yield to_feature_tensor(self.generate(method, size, n_bars, **kwargs)), FEATURE_COLUMNS
+            remaining -= size
+
+    # --- Helpers --- #
+
+    def _sample_wicks(self, n_paths, n_bars, bar_sigma):
+        """
+        Returns (gap, upper wick, lower wick, log volume) for the parametric models.
+        Real bar shapes are resampled when available, otherwise simple
+        volatility-scaled half-normal wicks with a constant volume are used.
+        """
+        if self.shapes is not None:
+            idx = self.rng.integers(0, len(self.shapes), size=(n_paths, n_bars))
+            return self.shapes[idx, 1:]
+
+        extra = np.empty((n_paths, n_bars, 4))
+        extra[..., 0] = 0.0
+        extra[..., 1] = np.abs(self.rng.standard_normal((n_paths, n_bars))) * bar_sigma * 0.5
+        extra[..., 2] = np.abs(self.rng.standard_normal((n_paths, n_bars))) * bar_sigma * 0.5
+        extra[..., 3] = np.log(1e6) + 0.3 * self.rng.standard_normal((n_paths, n_bars))
+        return extra
+
+    def _build_bars(self, log_returns, extra):
+        """
+        Rebuilds OHLCV prices from log returns plus (gap, upper wick, lower wick, log volume).
+        """
+        log_close = np.cumsum(log_returns, axis=1)
+        close = self.initial_price * np.exp(log_close)
+
+        prev_close = np.empty_like(close)
+        prev_close[:, 0] = self.initial_price
+        prev_close[:, 1:] = close[:, :-1]
+
+        open_ = prev_close * np.exp(extra[..., 0])
+        high = np.maximum(open_, close) * np.exp(extra[..., 1])
+        low = np.minimum(open_, close) * np.exp(-extra[..., 2])
+        volume = np.round(np.exp(extra[..., 3]))
+
+        return {
+            'open': open_, 'high': high, 'low': low, 'close': close,
+            'volume': volume, 'adj_close': close.copy()
+        }
+
+
+def to_feature_tensor(bars):
+    """
+    Computes indicators for every path at once and stacks everything into a
+    (n_paths, n_bars, len(FEATURE_COLUMNS)) float32 tensor.
+    """
+    # The indicator engine works on (time, symbol) arrays, so paths become symbols
+    columns = {col: np.ascontiguousarray(bars[col].T) for col in PRICE_COLUMNS}
+    indicators = compute_indicators(columns['high'], columns['low'], columns['adj_close'], columns['volume'])
+
+    n_paths, n_bars = bars['adj_close'].shape
+    tensor = np.empty((n_paths, n_bars, len(FEATURE_COLUMNS)), dtype=np.float32)
+    for i, column in enumerate(FEATURE_COLUMNS):
+        values = columns[column] if column in columns else indicators[column]
+        tensor[:, :, i] = values.T
+    return tensor
+
+
+def tensor_to_frame(tensor, path_index, start_date='2015-01-02'):
+    """
+    Converts one synthetic path to a DataFrame indexed by business days,
+    in the layout TradingEnvironment expects.
+    """
+    import pandas as pd
+
+    values = tensor[path_index]
+    index = pd.bdate_range(start=start_date, periods=len(values), name='timestamp')
+    return pd.DataFrame(values, index=index, columns=FEATURE_COLUMNS)
+
+
+# --- Main Execution --- #
+if __name__ == '__main__':
+    import time
+
+    processed_data_dir = os.path.join('rl_trading_system', 'data', 'processed')
+    symbols = ['AAPL', 'GOOG', 'NVDA', '^GSPC']
+    csv_files = [os.path.join(processed_data_dir, f'{symbol}_processed_prices.csv') for symbol in symbols]
+
+    generator = SyntheticMarketGenerator.from_processed_csvs(csv_files, seed=42)
+    n_paths, n_bars = 10000, 2500
+
+    for method in ['bootstrap', 'gbm', 'regime']:
+        start = time.perf_counter()
+        total = 0
+        for features, _ in generator.iter_feature_batches(method, n_paths, n_bars, batch_size=1000):
+            total += features.shape[0]
+        elapsed = time.perf_counter() - start
+        print(f"{method}: generated {total} paths x {n_bars} bars in {elapsed:.2f}s")
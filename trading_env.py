@@ -1,15 +1,25 @@
 import numpy as np
-import pandas as pd
 import gymnasium as gym
 from gymnasium import spaces
-import matplotlib.pyplot as plt
+from performance_metrics import StreamingMetrics
+from resampler import periods_per_year, session_starts
+from reward_functions import make_reward
+
+# עמודות המחיר והקידומות של האינדיקטורים הטכניים שנכנסים לתצפית
+PRICE_FEATURES = ['open', 'high', 'low', 'close', 'adj_close', 'volume']
+INDICATOR_PREFIXES = ('momentum_', 'trend_', 'volatility_', 'volume_', 'cross_')
+
+# תכונות מצב התיק: מזומן, ערך המניות המוחזקות, שווי כולל
+PORTFOLIO_FEATURES = ['portfolio_cash', 'portfolio_holdings', 'portfolio_value']
 
 class TradingEnvironment(gym.Env):
     """
     סביבת מסחר מבוססת RL לטווחי זמן של ימים עד חודשים
+    interval קובע את אורך הנר ('1d', '1h', '5m', '1m' ...) לצורך חישוב שנתי של המדדים
     """
     
-    def __init__(self, df, initial_balance=10000, transaction_fee_percent=0.001, window_size=30):
+    def __init__(self, df, initial_balance=10000, transaction_fee_percent=0.001, window_size=30,
+                 fill_model=None, interval='1d', reward_fn='cumulative', observation_mode='array'):
         super(TradingEnvironment, self).__init__()
         
         # נתוני המחירים והאינדיקטורים
@@ -17,6 +27,13 @@ class TradingEnvironment(gym.Env):
         self.initial_balance = initial_balance
         self.transaction_fee_percent = transaction_fee_percent
         self.window_size = window_size
+        self.interval = interval
+        
+        # מודל מילוי אופציונלי (למשל SimulatedFillModel); ללא מודל - מילוי מלא במחיר הסגירה
+        self.fill_model = fill_model
+        
+        # פונקציית התגמול (שם או מופע של RewardFunction); ברירת המחדל - תשואה מצטברת כמו במקור
+        self.reward_fn = make_reward(reward_fn)
         
         # מרחב הפעולות: 0 (החזקה), 1 (קנייה), 2 (מכירה)
         self.action_space = spaces.Discrete(3)
@@ -24,8 +41,37 @@ class TradingEnvironment(gym.Env):
         # מרחב המצבים: מערך של אינדיקטורים טכניים + מצב התיק הנוכחי
         # נשתמש באינדיקטורים הטכניים שחישבנו בשלב הקודם
         # בנוסף למידע על מצב התיק (מזומן, מניות, שווי כולל)
-        obs_shape = (self.window_size, self._get_observation_dimension())
-        self.observation_space = spaces.Box(low=-np.inf, high=np.inf, shape=obs_shape, dtype=np.float32)
+        self.market_features = self._get_market_features(self.df.columns)
+        self.feature_names = self.market_features + PORTFOLIO_FEATURES
+        
+        # מערכי float32 רציפים לנתוני השוק ומחירי הסגירה - מחושבים פעם אחת
+        self._market = np.ascontiguousarray(self.df[self.market_features].to_numpy(dtype=np.float32))
+        self._market_has_nan = bool(np.isnan(self._market).any())
+        self._prices = self.df['adj_close'].to_numpy(dtype=np.float64)
+        
+        # סימון הנר הראשון בכל יום מסחר - שם נופלים פערי הלילה וסופי השבוע בנתונים תוך-יומיים
+        self._session_start = session_starts(self.df.index.values)
+        
+        # מצב התצפית: 'array' - חלון אחד שבו מצב התיק משוכפל לכל שורה (המקורי),
+        # 'dict' - חלון השוק ווקטור התיק בנפרד, נכתבים למאגרים מוקצים מראש
+        self.observation_mode = observation_mode
+        if observation_mode == 'array':
+            obs_shape = (self.window_size, len(self.feature_names))
+            self.observation_space = spaces.Box(low=-np.inf, high=np.inf, shape=obs_shape, dtype=np.float32)
+        elif observation_mode == 'dict':
+            market_shape = (self.window_size, len(self.market_features))
+            self.observation_space = spaces.Dict({
+                'market': spaces.Box(low=-np.inf, high=np.inf, shape=market_shape, dtype=np.float32),
+                'portfolio': spaces.Box(low=-np.inf, high=np.inf, shape=(len(PORTFOLIO_FEATURES),), dtype=np.float32),
+            })
+            # שני מאגרים מתחלפים: התצפית הקודמת נשארת תקפה לעדכון (state, next_state);
+            # מי ששומר תצפיות לאורך זמן (replay) צריך להעתיק אותן
+            self._obs_buffers = [{'market': np.empty(market_shape, dtype=np.float32),
+                                  'portfolio': np.empty(len(PORTFOLIO_FEATURES), dtype=np.float32)}
+                                 for _ in range(2)]
+            self._obs_index = 0
+        else:
+            raise ValueError(f"Unknown observation_mode: {observation_mode}. Expected 'array' or 'dict'")
         
         # משתנים פנימיים
         self.current_step = None
@@ -38,32 +84,18 @@ class TradingEnvironment(gym.Env):
         self.total_profit = None
         self.current_value = None
         
-    def _get_observation_dimension(self):
+        # מדדי ביצוע מצטברים (שארפ, סורטינו, משיכה, מחזור, חשיפה) בעדכון O(1)
+        self.metrics = StreamingMetrics(periods_per_year=periods_per_year(interval))
+        
+    def _get_market_features(self, columns):
         """
-        מחזיר את מספר התכונות במרחב המצבים
+        מחזיר את שמות עמודות השוק שנכנסות לתצפית, לפי הסדר בדאטאפריים
         """
-        # נבחר תכונות רלוונטיות מהדאטאפריים
-        # מחירים
-        price_features = ['open', 'high', 'low', 'close', 'adj_close', 'volume']
+        technical_indicators = [col for col in columns if col.startswith(INDICATOR_PREFIXES)]
+        selected_features = PRICE_FEATURES + technical_indicators
         
-        # אינדיקטורים טכניים נבחרים
-        technical_indicators = [
-            # מומנטום
-            'momentum_rsi', 'momentum_stoch', 'momentum_stoch_signal', 'momentum_tsi',
-            # מגמה
-            'trend_macd', 'trend_macd_signal', 'trend_ema_fast', 'trend_ema_slow',
-            'trend_adx', 'trend_ichimoku_a', 'trend_ichimoku_b',
-            # תנודתיות
-            'volatility_bbm', 'volatility_bbh', 'volatility_bbl', 'volatility_atr',
-            # נפח
-            'volume_obv', 'volume_cmf'
-        ]
-        
-        # תכונות נוספות למצב התיק
-        portfolio_features = 3  # מזומן, מניות מוחזקות, שווי כולל
-        
-        # סך כל התכונות
-        return len(price_features) + len(technical_indicators) + portfolio_features
+        # בדיקה שהעמודות קיימות
+        return [f for f in selected_features if f in columns]
     
     def reset(self, seed=None):
         """
@@ -83,71 +115,103 @@ class TradingEnvironment(gym.Env):
         self.total_cost_basis = 0
         self.total_profit = 0
         
+        if self.fill_model is not None:
+            self.fill_model.reset(self)
+        
         # חישוב ערך נוכחי
         self.current_value = self.balance + self.shares_held * self._get_current_price()
         
+        self.metrics.reset()
+        self.metrics.update(self.current_value)
+        self.reward_fn.reset(self.current_value)
+        
         return self._get_observation(), {}
     
     def _get_current_price(self):
         """
         מחזיר את מחיר הסגירה הנוכחי
         """
-        return self.df.iloc[self.current_step]['adj_close']
+        return self._prices[self.current_step]
     
     def _get_observation(self):
         """
         מחזיר את המצב הנוכחי כמערך של תכונות
         """
-        # חלון של נתונים היסטוריים
-        frame = self.df.iloc[self.current_step - self.window_size:self.current_step]
-        
-        # נרמול הנתונים
-        obs = self._normalize_frame(frame)
-        
-        # הוספת מידע על מצב התיק
-        portfolio_info = np.array([
-            self.balance / self.initial_balance,  # מזומן מנורמל
-            self.shares_held * self._get_current_price() / self.initial_balance,  # ערך המניות המוחזקות מנורמל
-            self.current_value / self.initial_balance  # שווי כולל מנורמל
-        ])
-        
-        # שכפול מידע התיק לכל נקודת זמן בחלון
-        portfolio_info = np.tile(portfolio_info, (self.window_size, 1))
-        
-        # שילוב הנתונים
-        obs_with_portfolio = np.hstack([obs, portfolio_info])
-        
-        return obs_with_portfolio.astype(np.float32)
+        # חלון של נתונים היסטוריים (מערך float32, ללא העתקה)
+        frame = self._market[self.current_step - self.window_size:self.current_step]
+        
+        if self.observation_mode == 'dict':
+            self._obs_index ^= 1
+            obs = self._obs_buffers[self._obs_index]
+            self._normalize_frame(frame, out=obs['market'])
+            portfolio = obs['portfolio']
+            portfolio[0] = self.balance / self.initial_balance
+            portfolio[1] = self.shares_held * self._get_current_price() / self.initial_balance
+            portfolio[2] = self.current_value / self.initial_balance
+            return obs
+        
+        # נרמול הנתונים ישירות לתוך מערך התצפית
+        obs = np.empty((self.window_size, len(self.feature_names)), dtype=np.float32)
+        n_market = len(self.market_features)
+        self._normalize_frame(frame, out=obs[:, :n_market])
+        
+        # הוספת מידע על מצב התיק - משוכפל לכל נקודת זמן בחלון
+        obs[:, n_market] = self.balance / self.initial_balance  # מזומן מנורמל
+        obs[:, n_market + 1] = self.shares_held * self._get_current_price() / self.initial_balance  # ערך המניות המוחזקות מנורמל
+        obs[:, n_market + 2] = self.current_value / self.initial_balance  # שווי כולל מנורמל
+        
+        return obs
     
-    def _normalize_frame(self, frame):
+    def _normalize_frame(self, frame, out=None):
         """
         נרמול הנתונים בחלון הנוכחי
         """
-        # בחירת העמודות הרלוונטיות
-        price_features = ['open', 'high', 'low', 'close', 'adj_close', 'volume']
-        
-        technical_indicators = [col for col in frame.columns if 
-                               col.startswith(('momentum_', 'trend_', 'volatility_', 'volume_'))]
-        
-        selected_features = price_features + technical_indicators
-        
-        # בדיקה שהעמודות קיימות
-        available_features = [f for f in selected_features if f in frame.columns]
-        
-        # נרמול פשוט - חלוקה בערך המקסימלי בחלון
-        normalized_frame = frame[available_features].copy()
-        
-        for feature in available_features:
-            max_value = normalized_frame[feature].max()
-            min_value = normalized_frame[feature].min()
-            
-            # הימנעות מחלוקה באפס
-            if max_value == min_value:
-                normalized_frame[feature] = 0
+        # נרמול פשוט - מינימום-מקסימום לכל עמודה בחלון
+        if self._market_has_nan:
+            min_value = np.nanmin(frame, axis=0)
+            value_range = np.nanmax(frame, axis=0)
+        else:
+            min_value = frame.min(axis=0)
+            value_range = frame.max(axis=0)
+        value_range -= min_value
+        
+        if out is None:
+            out = np.empty_like(frame)
+        np.subtract(frame, min_value, out=out)
+        
+        # הימנעות מחלוקה באפס
+        constant = value_range == 0
+        value_range[constant] = 1
+        out /= value_range
+        out[:, constant] = 0
+        
+        return out
+    
+    def _apply_fills(self, fills):
+        """
+        עדכון מצב התיק לפי מילויים (כיוון, כמות, מחיר) שהחזיר מודל המילוי
+        """
+        for side, quantity, price in fills:
+            quantity = int(quantity)
+            if side > 0:
+                # קנייה - לא יותר ממה שהמזומן מאפשר
+                quantity = min(quantity, int(self.balance / (price * (1 + self.transaction_fee_percent))))
+                if quantity <= 0:
+                    continue
+                cost = quantity * price * (1 + self.transaction_fee_percent)
+                self.balance -= cost
+                self.shares_held += quantity
+                self.total_shares_bought += quantity
+                self.total_cost_basis += cost
             else:
-                normalized_frame[feature] = (normalized_frame[feature] - min_value) / (max_value - min_value)
-        
-        return normalized_frame.values
+                quantity = min(quantity, self.shares_held)
+                if quantity <= 0:
+                    continue
+                sales_value = quantity * price * (1 - self.transaction_fee_percent)
+                self.balance += sales_value
+                self.total_shares_sold += quantity
+                self.total_sales_value += sales_value
+                self.shares_held -= quantity
     
     def step(self, action):
         """
@@ -155,9 +219,14 @@ class TradingEnvironment(gym.Env):
         """
         # קבלת המחיר הנוכחי
         current_price = self._get_current_price()
+        shares_before = self.shares_held
         
         # ביצוע הפעולה
-        if action == 0:  # החזקה
+        if self.fill_model is not None:
+            # מודל מילוי חיצוני: פקודות ממתינות, החלקה ומילוי חלקי
+            self._apply_fills(self.fill_model.on_step(self, action, current_price))
+        
+        elif action == 0:  # החזקה
             pass
         
         elif action == 1:  # קנייה
@@ -194,8 +263,8 @@ class TradingEnvironment(gym.Env):
         # חישוב רווח כולל
         self.total_profit = self.current_value - self.initial_balance
         
-        # חישוב התגמול - שינוי באחוזים בשווי התיק
-        reward = (self.current_value - self.initial_balance) / self.initial_balance
+        # חישוב התגמול לפי פונקציית התגמול שנבחרה
+        reward = self.reward_fn(self.current_value)
         
         # מידע נוסף
         info = {
@@ -205,11 +274,25 @@ class TradingEnvironment(gym.Env):
             'shares_held': self.shares_held,
             'current_value': self.current_value,
             'total_profit': self.total_profit,
-            'total_profit_percent': (self.total_profit / self.initial_balance) * 100
+            'total_profit_percent': (self.total_profit / self.initial_balance) * 100,
+            'session_start': bool(self._session_start[self.current_step])
         }
         
+        # עדכון מדדי הביצוע; הסיכום מחושב רק בסוף האפיזודה (או לפי בקשה ב-performance)
+        position_value = self.shares_held * current_price
+        traded_notional = abs(self.shares_held - shares_before) * current_price
+        self.metrics.update(self.current_value, position_value, traded_notional)
+        if done:
+            info.update(self.metrics.summary())
+        
         return self._get_observation(), reward, done, False, info
     
+    def performance(self):
+        """
+        מדדי הביצוע המצטברים של האפיזודה עד הצעד הנוכחי (שארפ, סורטינו, משיכה, מחזור, חשיפה)
+        """
+        return self.metrics.summary()
+    
     def render(self):
         """
         הצגה ויזואלית של מצב הסביבה
@@ -1,6 +1,5 @@
-import pandas as pd
+import copy
 import numpy as np
-import matplotlib.pyplot as plt
 import os
 import sys
 
@@ -8,27 +7,75 @@ import sys
 sys.path.append('/home/ubuntu/rl_trading_system/src')
 
 # ייבוא הסביבה והסוכן
-from trading_env import TradingEnvironment
+from trading_env import TradingEnvironment, PORTFOLIO_FEATURES
 from rl_agent import RLTradingAgent
+from instrumentation import StepProfiler
+from trajectory_recorder import TrajectoryRecorder
+from market_data import load_processed_frame, memory_footprint, format_footprint
+from evaluation import evaluate, comparison_table
+from synthetic_data import FEATURE_COLUMNS, SyntheticMarketGenerator, adjusted_history, to_feature_tensor, \
+    tensor_to_frame
 
 # הגדרת נתיבים
 data_dir = '/home/ubuntu/rl_trading_system/data/processed'
 results_dir = '/home/ubuntu/rl_trading_system/results'
-os.makedirs(results_dir, exist_ok=True)
 
-# טעינת נתוני AAPL מעובדים
-symbol = 'AAPL'
-price_file = os.path.join(data_dir, f'{symbol}_processed_prices.csv')
-print(f'טוען נתונים מעובדים מ-{price_file}...')
+# מדידת זמני שלבים (אופציונלי) - הפעלה עם משתנה הסביבה RL_PROFILE=1
+profile = os.environ.get('RL_PROFILE') == '1'
 
-try:
-    # טעינת הנתונים
-    df = pd.read_csv(price_file, index_col='timestamp', parse_dates=True)
+# אימון מקדים על מסלולים סינתטיים (אופציונלי) - RL_SYNTHETIC=bootstrap / gbm / regime
+synthetic = os.environ.get('RL_SYNTHETIC') or None
+
+
+def pretrain_synthetic(agent, df, method='bootstrap', n_paths=20, seed=0, render_interval=10, **env_kwargs):
+    """
+    אימון מקדים על מסלולים סינתטיים (SyntheticMarketGenerator) שנבנו מצורות הנרות של הסדרה עצמה,
+    באורך הסדרה: אפיזודה אחת לכל מסלול על אותה טבלת Q, עם דעיכת האקספלורציה הרגילה
+    האימון על הנתונים האמיתיים ממשיך מהטבלה ומשיעור האקספלורציה שנשארו
+    מחזיר את תגמולי האפיזודות
+    """
+    missing = [name for name in agent.discretizer.feature_names if name not in FEATURE_COLUMNS + PORTFOLIO_FEATURES]
+    if missing:
+        raise ValueError(f"Features not available on synthetic paths: {missing}")
+
+    history, shapes = adjusted_history(df)
+    generator = SyntheticMarketGenerator(shapes, initial_price=history['close'][0], seed=seed)
+    tensor = to_feature_tensor(generator.generate(method, n_paths, len(df)))
+
+    episode_rewards = []
+    for i in range(n_paths):
+        # סוכן זמני על המסלול, בלי מקליט ופרופיילר, שחולק את טבלת ה-Q של הסוכן
+        env = TradingEnvironment(tensor_to_frame(tensor, i, start_date=df.index[0]), **env_kwargs)
+        learner = RLTradingAgent(env, agent.learning_rate, agent.discount_factor, agent.exploration_rate,
+                                 agent.exploration_decay, agent.min_exploration_rate,
+                                 discretizer=copy.deepcopy(agent.discretizer))
+        learner.q_table = agent.q_table
+        episode_rewards += learner.train(episodes=1, render_interval=render_interval)
+        agent.exploration_rate = learner.exploration_rate
+    return episode_rewards
+
+
+def train_symbol(symbol, price_file, output_dir, episodes=100, window_size=30, max_steps=None,
+                 render_interval=10, test_episodes=1, record=True, interval='1d',
+                 reward='cumulative', synthetic=None, synthetic_paths=20):
+    """
+    אימון ובדיקה של סוכן עבור סמל אחד
+    synthetic: שיטת מסלולים סינתטיים ('bootstrap', 'gbm', 'regime') לאימון מקדים על synthetic_paths
+    מסלולים לפני האימון על הנתונים האמיתיים (ראו pretrain_synthetic)
+    מחזיר מילון עם נתיבי קובץ התוצאות וטבלת ה-Q השמורה
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    print(f'טוען נתונים מעובדים מ-{price_file}...')
+
+    # טעינת הנתונים כ-float32 (עמודת האינדקס היא חותמת הזמן)
+    df = load_processed_frame(price_file)
     print(f'נטענו {len(df)} רשומות של נתוני {symbol}')
-    
+    print(format_footprint(symbol, memory_footprint(df)))
+
     # יצירת סביבת המסחר
-    env = TradingEnvironment(df, initial_balance=10000, window_size=30)
-    
+    env = TradingEnvironment(df, initial_balance=10000, window_size=window_size, interval=interval,
+                             reward_fn=reward)
+
     # יצירת סוכן ה-RL
     agent = RLTradingAgent(
         env=env,
@@ -36,43 +83,66 @@ try:
         discount_factor=0.95,
         exploration_rate=1.0,
         exploration_decay=0.995,
-        min_exploration_rate=0.01
+        min_exploration_rate=0.01,
+        profiler=StepProfiler(os.path.join(output_dir, f'{symbol}_profile_{{label}}.json')) if profile else None,
+        recorder=TrajectoryRecorder(os.path.join(output_dir, 'trajectories', symbol)) if record else None
     )
-    
-    # הגדרת פרמטרים לאימון
-    episodes = 100  # מספר אפיזודות לאימון
-    max_steps = None  # מגבלת צעדים לאפיזודה (None = ללא הגבלה)
-    render_interval = 10  # תדירות הצגת התקדמות
-    
+
+    if synthetic:
+        print(f'\nאימון מקדים על {synthetic_paths} מסלולים סינתטיים ({synthetic})...')
+        pretrain_synthetic(agent, df, synthetic, synthetic_paths, render_interval=render_interval,
+                           initial_balance=10000, window_size=window_size, interval=interval, reward_fn=reward)
+
     print(f'\nמתחיל אימון למשך {episodes} אפיזודות...')
-    
+
     # אימון הסוכן
     episode_rewards = agent.train(
         episodes=episodes,
         max_steps=max_steps,
         render_interval=render_interval
     )
-    
-    # הצגת תוצאות האימון
-    agent.plot_results(episode_rewards)
-    
+
     print('\nהאימון הושלם בהצלחה!')
-    
+
     # בדיקת ביצועי הסוכן
     print('\nבודק ביצועים על סט הבדיקה...')
-    test_profits = agent.test(episodes=5)
+    test_profits = agent.test(episodes=test_episodes)
     
-    # שמירת תוצאות
-    results_file = os.path.join(results_dir, f'{symbol}_rl_results.txt')
+    # השוואה מול אסטרטגיות הבסיס (קנייה והחזקה, חציית ממוצעים, אקראי)
+    comparison = evaluate(agent, {symbol: df}, window_size=window_size, interval=interval)
+    print(comparison_table(comparison).round(2).to_string())
+
+    # שמירת טבלת ה-Q ותוצאות
+    model_file = os.path.join(output_dir, f'{symbol}_q_table.npz')
+    agent.save(model_file)
+
+    results_file = os.path.join(output_dir, f'{symbol}_rl_results.txt')
     with open(results_file, 'w') as f:
         f.write(f'סיכום תוצאות אימון עבור {symbol}:\n')
         f.write(f'מספר אפיזודות: {episodes}\n')
         f.write(f'תגמול ממוצע: {np.mean(episode_rewards):.2f}\n')
         f.write(f'רווח ממוצע בבדיקה: {np.mean(test_profits):.2f}%\n')
-    
+        f.write('\nהשוואה מול אסטרטגיות בסיס:\n')
+        f.write(comparison.drop(columns=['symbol']).to_string(index=False, float_format='{:.4f}'.format))
+        f.write('\n')
+
     print(f'\nהתוצאות נשמרו ב-{results_file}')
-    
-except FileNotFoundError:
-    print(f'שגיאה: קובץ הנתונים לא נמצא ב-{price_file}')
-except Exception as e:
-    print(f'שגיאה במהלך האימון: {e}')
+    return {'agent': agent, 'episode_rewards': episode_rewards,
+            'results_file': results_file, 'model_file': model_file}
+
+
+if __name__ == '__main__':
+    # טעינת נתוני AAPL מעובדים
+    symbol = 'AAPL'
+    price_file = os.path.join(data_dir, f'{symbol}_processed_prices.csv')
+
+    try:
+        result = train_symbol(symbol, price_file, results_dir, synthetic=synthetic)
+
+        # הצגת תוצאות האימון
+        result['agent'].plot_results(result['episode_rewards'])
+
+    except FileNotFoundError:
+        print(f'שגיאה: קובץ הנתונים לא נמצא ב-{price_file}')
+    except Exception as e:
+        print(f'שגיאה במהלך האימון: {e}')
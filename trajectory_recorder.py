@@ -0,0 +1,87 @@
+import os
+import numpy as np
+
+
+class TrajectoryRecorder:
+    """
+    הקלטת מסלולי אפיזודות למערכים מוקצים מראש עם טיפוסים קבועים
+    בסוף כל אפיזודה העמודות נשמרות כקובץ npz דחוס (עמודה לכל מערך),
+    כך שאפשר לנתח ריצות בדיעבד בלי להריץ את הסימולציה מחדש
+    """
+
+    # עמודות וטיפוסים: (שם, dtype, מפתח ב-info של הסביבה)
+    COLUMNS = [
+        ('step', np.int32, 'current_step'),
+        ('action', np.int8, None),
+        ('reward', np.float32, None),
+        ('price', np.float32, 'current_price'),
+        ('balance', np.float64, 'balance'),
+        ('shares_held', np.float64, 'shares_held'),
+        ('current_value', np.float64, 'current_value'),
+    ]
+
+    def __init__(self, output_dir, capacity=4096, compress=True):
+        self.output_dir = output_dir
+        self.compress = compress
+        os.makedirs(output_dir, exist_ok=True)
+
+        self._buffers = {name: np.zeros(capacity, dtype=dtype) for name, dtype, _ in self.COLUMNS}
+        self._info_keys = [(name, key) for name, _, key in self.COLUMNS if key is not None]
+        self._n = 0
+        self._label = None
+        self._episode = None
+
+    def start_episode(self, episode, label='train'):
+        """
+        תחילת הקלטה של אפיזודה חדשה (המאגרים ממוחזרים)
+        """
+        self._n = 0
+        self._episode = episode
+        self._label = label
+
+    def record(self, action, reward, info):
+        """
+        רישום צעד אחד
+        """
+        i = self._n
+        if i == len(self._buffers['step']):
+            self._grow()
+
+        buffers = self._buffers
+        buffers['action'][i] = action
+        buffers['reward'][i] = reward
+        for name, key in self._info_keys:
+            buffers[name][i] = info[key]
+        self._n = i + 1
+
+    def end_episode(self, **metadata):
+        """
+        כתיבת האפיזודה לקובץ. מחזיר את נתיב הקובץ
+        """
+        if self._episode is None:
+            return None
+
+        path = os.path.join(self.output_dir, f'{self._label}_episode_{self._episode:05d}.npz')
+        columns = {name: buffer[:self._n] for name, buffer in self._buffers.items()}
+        for key, value in metadata.items():
+            columns[f'meta_{key}'] = np.asarray(value)
+
+        save = np.savez_compressed if self.compress else np.savez
+        save(path, **columns)
+
+        self._episode = None
+        return path
+
+    def _grow(self):
+        for name, buffer in self._buffers.items():
+            grown = np.zeros(len(buffer) * 2, dtype=buffer.dtype)
+            grown[:len(buffer)] = buffer
+            self._buffers[name] = grown
+
+    @staticmethod
+    def load(path):
+        """
+        טעינת אפיזודה מוקלטת למילון של עמודות
+        """
+        with np.load(path) as data:
+            return {name: data[name] for name in data.files}